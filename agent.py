@@ -0,0 +1,227 @@
+"""
+    Unlock agent, in the spirit of ssh-agent.
+
+    Unlocks once, keeps the KeySession and Vault in memory and answers
+    newline-delimited JSON requests over a Unix domain socket:
+        {"op": "get", "query": "github"}  ->  {"ok": true, "result": {...}}
+    ops: ping, get, list, add, lock. The agent locks itself and exits after
+    idle_timeout seconds without a request.
+"""
+
+import os
+import json
+import stat
+import time
+import socket
+import getpass
+
+DEFAULT_IDLE_TIMEOUT = 15 * 60
+SOCKET_ENV = 'PM_AGENT_SOCK'
+
+
+def default_socket_path() -> str:
+    """$XDG_RUNTIME_DIR/pm-agent/agent.sock, or a per-user directory under the temp dir"""
+    runtime = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime:
+        directory = os.path.join(runtime, 'pm-agent')
+    else:
+        import tempfile
+        directory = os.path.join(tempfile.gettempdir(), f'pm-agent-{getpass.getuser()}')
+    return os.path.join(directory, 'agent.sock')
+
+def socket_path() -> str:
+    return os.environ.get(SOCKET_ENV) or default_socket_path()
+
+
+class AgentError(Exception):
+    pass
+
+
+def check_private_dir(directory: str):
+    """Raise AgentError unless directory is a real directory of ours that nobody else can enter.
+
+    The default path is predictable, so another local user could create it
+    first and catch the unlocked socket.
+    """
+    try:
+        st = os.lstat(directory)
+    except FileNotFoundError:
+        raise AgentError(f"{directory} does not exist") from None
+    if stat.S_ISLNK(st.st_mode) or not stat.S_ISDIR(st.st_mode):
+        raise AgentError(f"{directory} is not a directory")
+    if hasattr(os, 'getuid') and st.st_uid != os.getuid():
+        raise AgentError(f"{directory} belongs to another user")
+    if stat.S_IMODE(st.st_mode) != 0o700:
+        raise AgentError(f"{directory} must have mode 0700")
+
+
+def prepare_socket_dir(path: str):
+    directory = os.path.dirname(path)
+    os.makedirs(directory, mode=0o700, exist_ok=True)
+    check_private_dir(directory)
+
+
+"""     CLIENT BELOW       """
+def agent_available(path: str = None) -> bool:
+    """True if an agent answers at path. A socket left by an agent that died is removed"""
+    path = path or socket_path()
+    if not hasattr(socket, 'AF_UNIX') or not os.path.exists(path):
+        return False
+    try:
+        check_private_dir(os.path.dirname(path))
+    except AgentError:
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(1.0)
+        try:
+            sock.connect(path)
+        except (ConnectionRefusedError, FileNotFoundError):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return False
+        except OSError:
+            return False
+    return True
+
+def agent_call(request: dict, path: str = None, timeout: float = 5.0):
+    """Send one request to the agent and return its result (raises AgentError on failure)"""
+    path = path or socket_path()
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(timeout)
+        try:
+            sock.connect(path)
+        except OSError as e:
+            raise AgentError(f"Agent not reachable at {path}: {e}") from e
+        sock.sendall(json.dumps(request).encode() + b'\n')
+        with sock.makefile('rb') as f:
+            line = f.readline()
+    if not line:
+        raise AgentError("Agent closed the connection")
+    response = json.loads(line)
+    if not response.get('ok'):
+        raise AgentError(response.get('error', 'agent error'))
+    return response.get('result')
+
+
+"""     SERVER BELOW       """
+class Agent:
+    def __init__(self, session, vault, path: str, idle_timeout: float = DEFAULT_IDLE_TIMEOUT):
+        self.session = session
+        self.vault = vault
+        self.path = path
+        self.idle_timeout = idle_timeout
+        self._loop = None
+        self._last_used = 0.0
+        self._stopped = None
+
+    def handle(self, request: dict):
+        """Run one request against the unlocked vault, return the result"""
+        from vault import new_entry
+
+        op = request.get('op')
+        self.vault.refresh()
+        if op == 'ping':
+            return {'entries': len(self.vault)}
+        if op == 'list':
+            return [e.metadata() for e in self.vault]
+        if op == 'get':
+            entry = self.vault.find(request.get('query'), request.get('id'))
+            password = entry.decrypt(self.session)
+            if password is None:
+                raise AgentError("Could not decrypt entry")
+            record = entry.metadata()
+            record['password'] = password
+            return record
+        if op == 'add':
+            service, username, password = (request.get(k) for k in ('service', 'username', 'password'))
+            if not service or not username or not password:
+                raise AgentError("Service, username and password are all required")
+            entry = self.vault.add(new_entry(service, username, password, self.session))
+            self.vault.flush()
+            return entry.metadata()
+        if op == 'lock':
+            self._stopped.set()
+            return 'locked'
+        raise AgentError(f"Unknown op: {op}")
+
+    async def _client(self, reader, writer):
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                self._last_used = self._loop.time()
+                try:
+                    response = {'ok': True, 'result': self.handle(json.loads(line))}
+                except (AgentError, LookupError, ValueError) as e:
+                    response = {'ok': False, 'error': str(e)}
+                except Exception as e:
+                    # anything else still gets an answer, or the client waits for one forever
+                    response = {'ok': False, 'error': f"{type(e).__name__}: {e}"}
+                writer.write(json.dumps(response).encode() + b'\n')
+                await writer.drain()
+        finally:
+            writer.close()
+
+    async def _watchdog(self):
+        import asyncio
+
+        while not self._stopped.is_set():
+            remaining = self._last_used + self.idle_timeout - self._loop.time()
+            if remaining <= 0:
+                self._stopped.set()
+                break
+            try:
+                await asyncio.wait_for(self._stopped.wait(), remaining)
+            except asyncio.TimeoutError:
+                pass
+
+    async def serve(self):
+        import asyncio
+
+        self._loop = asyncio.get_running_loop()
+        self._last_used = self._loop.time()
+        self._stopped = asyncio.Event()
+
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        old_umask = os.umask(0o177)
+        try:
+            server = await asyncio.start_unix_server(self._client, path=self.path)
+        finally:
+            os.umask(old_umask)
+
+        try:
+            async with server:
+                await self._watchdog()
+        finally:
+            self.session.lock()
+            self.vault.close()
+            if os.path.exists(self.path):
+                os.remove(self.path)
+
+
+def start_agent(session, vault, path: str = None, idle_timeout: float = DEFAULT_IDLE_TIMEOUT,
+                daemon: bool = True):
+    """Serve until locked or idle. With daemon=True the caller returns right away"""
+    import asyncio  # server only, keeps client calls cheap to start
+
+    path = path or socket_path()
+    prepare_socket_dir(path)  # before forking, a daemon's errors go to /dev/null
+    if daemon and hasattr(os, 'fork'):
+        if os.fork() > 0:
+            # don't hand the socket path to scripts before the child is listening
+            for _ in range(200):
+                if os.path.exists(path):
+                    break
+                time.sleep(0.01)
+            return
+        os.setsid()
+        devnull = os.open(os.devnull, os.O_RDWR)
+        for fd in (0, 1, 2):
+            os.dup2(devnull, fd)
+    asyncio.run(Agent(session, vault, path, idle_timeout).serve())
+    if daemon:
+        os._exit(0)
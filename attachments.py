@@ -0,0 +1,218 @@
+"""
+    Encrypted attachments and secure notes (SSH keys, certificates, documents),
+    stored as raw binary files in attachments/ next to the vault.
+
+    Files are sealed with a chunked AEAD stream, so encrypting and decrypting
+    run in constant memory whatever the file size, with no base64 overhead.
+    Each file has its own random 256-bit key. The entry keeps a reference
+    {'id', 'name', 'size', 'cipher', 'key'}, where 'key' is that file key
+    encrypted like a password, so a re-key only rotates the small token and
+    never rewrites the files.
+
+    File layout:
+        magic (5 bytes) | cipher (1 byte) | chunk size (4 bytes, little endian) | nonce prefix (7 bytes)
+        chunks: ciphertext + 16-byte tag. Every chunk holds chunk size bytes of
+                plaintext except the last, which may be shorter (or empty)
+
+    Chunk i is sealed with nonce = prefix | i (4 bytes, big endian) | last flag
+    and the header as associated data. Chunks can't be reordered, dropped or
+    swapped between files, and a file cut off at a chunk boundary fails to
+    decrypt instead of coming back short.
+"""
+
+import os
+import base64
+import secrets
+
+from cryptography.exceptions import InvalidTag
+from cryptography.hazmat.primitives.ciphers.aead import AESGCM, ChaCha20Poly1305
+
+ATTACHMENTS_DIR = 'attachments'
+MAGIC = b'PMAT\x01'
+CHUNK_SIZE = 64 * 1024
+TAG_SIZE = 16
+PREFIX_SIZE = 7
+HEADER_SIZE = len(MAGIC) + 1 + 4 + PREFIX_SIZE
+MAX_CHUNKS = 1 << 32
+
+CIPHERS = {
+    'aesgcm': (1, AESGCM),
+    'chacha20': (2, ChaCha20Poly1305),
+}
+CIPHER_IDS = {cid: (name, cls) for name, (cid, cls) in CIPHERS.items()}
+DEFAULT_CIPHER = 'aesgcm'
+
+
+def _nonce(prefix: bytes, index: int, last: bool) -> bytes:
+    if index >= MAX_CHUNKS:
+        raise ValueError("Attachment is too large")
+    return prefix + index.to_bytes(4, 'big') + (b'\x01' if last else b'\x00')
+
+def _read_full(src, size: int) -> bytes:
+    """Read exactly size bytes unless EOF comes first (pipes return short reads)"""
+    data = src.read(size)
+    while data and len(data) < size:
+        more = src.read(size - len(data))
+        if not more:
+            break
+        data += more
+    return data
+
+
+"""     STREAM FORMAT BELOW       """
+def encrypt_stream(src, dst, key: bytes, cipher: str = DEFAULT_CIPHER, chunk_size: int = CHUNK_SIZE) -> int:
+    """Encrypt binary file object src into dst, returns the plaintext size"""
+    if cipher not in CIPHERS:
+        raise ValueError(f"Unknown cipher: {cipher}")
+    cipher_id, cipher_cls = CIPHERS[cipher]
+    aead = cipher_cls(key)
+    prefix = secrets.token_bytes(PREFIX_SIZE)
+    header = MAGIC + bytes([cipher_id]) + chunk_size.to_bytes(4, 'little') + prefix
+    dst.write(header)
+
+    total = 0
+    index = 0
+    chunk = _read_full(src, chunk_size)
+    while True:
+        # read one chunk ahead so the last one can be flagged
+        following = _read_full(src, chunk_size) if len(chunk) == chunk_size else b''
+        last = not following
+        dst.write(aead.encrypt(_nonce(prefix, index, last), chunk, header))
+        total += len(chunk)
+        if last:
+            return total
+        chunk = following
+        index += 1
+
+def read_header(src):
+    """(cipher name, chunk size, header bytes) from the start of an attachment file"""
+    header = _read_full(src, HEADER_SIZE)
+    if len(header) != HEADER_SIZE or not header.startswith(MAGIC):
+        raise ValueError("Not an attachment file")
+    cipher_id = header[len(MAGIC)]
+    if cipher_id not in CIPHER_IDS:
+        raise ValueError(f"Unknown attachment cipher {cipher_id}")
+    chunk_size = int.from_bytes(header[len(MAGIC) + 1:len(MAGIC) + 5], 'little')
+    if not 0 < chunk_size <= 64 * 1024 * 1024:
+        raise ValueError("Corrupt attachment header")
+    return CIPHER_IDS[cipher_id][0], chunk_size, header
+
+def decrypt_stream(src, dst, key: bytes) -> int:
+    """Decrypt src into dst chunk by chunk, returns the plaintext size.
+
+    Every chunk is authenticated before it is written. Raises ValueError if
+    any chunk was tampered with or the file is truncated; dst may already
+    hold the chunks before that point.
+    """
+    cipher, chunk_size, header = read_header(src)
+    aead = CIPHERS[cipher][1](key)
+    prefix = header[-PREFIX_SIZE:]
+    block = chunk_size + TAG_SIZE
+
+    total = 0
+    index = 0
+    sealed = _read_full(src, block)
+    while True:
+        following = _read_full(src, block) if len(sealed) == block else b''
+        last = not following
+        try:
+            chunk = aead.decrypt(_nonce(prefix, index, last), sealed, header)
+        except InvalidTag:
+            raise ValueError("Attachment is corrupt, truncated or was encrypted with another key") from None
+        dst.write(chunk)
+        total += len(chunk)
+        if last:
+            return total
+        sealed = following
+        index += 1
+
+
+"""     VAULT ATTACHMENTS BELOW       """
+def attachment_path(file_id: str) -> str:
+    if not file_id.isalnum():
+        raise ValueError(f"Bad attachment id: {file_id!r}")
+    return os.path.join(ATTACHMENTS_DIR, file_id + '.bin')
+
+def list_attachments(entry) -> list:
+    return list(entry.get('attachments') or ())
+
+def find_attachment(entry, name: str) -> dict:
+    for ref in list_attachments(entry):
+        if ref['name'] == name or ref['id'] == name:
+            return ref
+    raise LookupError(f"No attachment '{name}' on {entry['service']}")
+
+def _file_key(ref: dict, session) -> bytes:
+    from crypto import decrypt_pass
+    key = decrypt_pass(ref['key'], session)
+    if key is None:
+        raise ValueError(f"Could not decrypt the key for attachment '{ref['name']}'")
+    return base64.urlsafe_b64decode(key)
+
+def add_attachment(entry, src, name: str, session, cipher: str = DEFAULT_CIPHER) -> dict:
+    """Encrypt binary file object src into attachments/ and reference it from entry.
+
+    The entry still has to be saved (vault.update + flush) for the reference to stick.
+    """
+    from crypto import encrypt_pass
+    from storage import atomic_file
+
+    if any(ref['name'] == name for ref in list_attachments(entry)):
+        raise ValueError(f"{entry['service']} already has an attachment called '{name}'")
+    key = secrets.token_bytes(32)
+    file_id = secrets.token_hex(16)
+    os.makedirs(ATTACHMENTS_DIR, mode=0o700, exist_ok=True)
+    with atomic_file(attachment_path(file_id)) as f:
+        size = encrypt_stream(src, f, key, cipher)
+    ref = {
+        'id': file_id,
+        'name': name,
+        'size': size,
+        'cipher': cipher,
+        'key': encrypt_pass(base64.urlsafe_b64encode(key).decode(), session),
+    }
+    entry['attachments'] = list_attachments(entry) + [ref]
+    return ref
+
+def extract_attachment(ref: dict, session, dst) -> int:
+    """Decrypt an attachment into binary file object dst"""
+    key = _file_key(ref, session)
+    with open(attachment_path(ref['id']), 'rb') as f:
+        return decrypt_stream(f, dst, key)
+
+def extract_to_file(ref: dict, session, path: str) -> int:
+    """Decrypt to path; the file only appears if every chunk checked out"""
+    from storage import atomic_file
+    with atomic_file(path) as f:
+        return extract_attachment(ref, session, f)
+
+def remove_attachment(entry, name: str) -> dict:
+    """Drop the reference from entry; the file goes once the change is flushed.
+
+    The last one leaves an empty list behind: an entry without the field
+    means "keep whatever it had" to Vault.update.
+    """
+    ref = find_attachment(entry, name)
+    entry['attachments'] = [r for r in list_attachments(entry) if r is not ref]
+    return ref
+
+def delete_unreferenced(before, after):
+    """Delete the files of attachments that before had and after (None if deleted) doesn't"""
+    keep = {ref['id'] for ref in list_attachments(after)} if after is not None else set()
+    for ref in list_attachments(before):
+        if ref['id'] not in keep:
+            try:
+                os.remove(attachment_path(ref['id']))
+            except FileNotFoundError:
+                pass
+
+def rotate_keys(entry, new_session, old_session=None):
+    """Re-wrap the file keys of entry's attachments under new_session's current key (the files stay as they are).
+
+    entry gets new ref dicts; the old ones may be shared with a copy of the
+    entry (a vault's record of what is on disk), so they're left alone.
+    """
+    from crypto import rotate_token
+    refs = [dict(ref, key=rotate_token(ref['key'], new_session, old_session)) for ref in list_attachments(entry)]
+    if refs:
+        entry['attachments'] = refs
@@ -0,0 +1,116 @@
+"""
+    Vault-wide health audit: weak, common/breached and reused passwords.
+
+    Entries are decrypted and scored in worker processes that share one
+    derived key. Plaintexts never leave the workers. Reuse is detected by
+    comparing HMAC-SHA256 fingerprints keyed from the session key, so the
+    report can't be used to brute-force passwords offline.
+"""
+
+import hmac
+import hashlib
+from collections import defaultdict
+
+from cryptography.fernet import Fernet, MultiFernet
+
+from storage import get_backend
+from transfer import batched, run_pipeline
+
+BATCH_SIZE = 200
+WEAK_SCORE = 40
+
+_worker_fernet = None
+_worker_reuse_key = None
+
+def reuse_key(key: bytes) -> bytes:
+    """Separate HMAC key for reuse fingerprints, derived from the vault key"""
+    return hmac.new(key, b'password-manager/audit-reuse', hashlib.sha256).digest()
+
+def _init_audit_worker(keys: tuple):
+    global _worker_fernet, _worker_reuse_key
+    _worker_fernet = MultiFernet([Fernet(key) for key in keys])
+    _worker_reuse_key = reuse_key(keys[0])
+
+def _audit_batch(entries: list) -> list:
+    from password_analyzer import calculate_strength
+
+    results = []
+    for entry in entries:
+        try:
+            password = _worker_fernet.decrypt(entry['password'].encode()).decode()
+        except Exception:
+            results.append({'id': entry['id'], 'service': entry['service'],
+                            'username': entry['username'], 'error': 'cannot decrypt'})
+            continue
+        strength = calculate_strength(password)
+        results.append({
+            'id': entry['id'],
+            'service': entry['service'],
+            'username': entry['username'],
+            'score': strength['score'],
+            'rating': strength['rating'],
+            'is_common': strength['is_common'],
+            'fingerprint': hmac.new(_worker_reuse_key, password.encode(), hashlib.sha256).hexdigest(),
+        })
+    return results
+
+
+def audit_vault(session, workers: int = None, entries: list = None) -> dict:
+    """Audit every entry and return a report dict"""
+    if entries is None:
+        entries = get_backend().load_all()
+    batches = batched(({k: e[k] for k in ('id', 'service', 'username', 'password')} for e in entries), BATCH_SIZE)
+
+    items = []
+    by_fingerprint = defaultdict(list)
+    for results in run_pipeline(batches, _audit_batch, session.keys, workers, initializer=_init_audit_worker):
+        for item in results:
+            fingerprint = item.pop('fingerprint', None)
+            if fingerprint:
+                by_fingerprint[fingerprint].append(item['id'])
+            items.append(item)
+
+    reused_groups = [ids for ids in by_fingerprint.values() if len(ids) > 1]
+    reused_ids = {entry_id for ids in reused_groups for entry_id in ids}
+    for item in items:
+        item['reused'] = item['id'] in reused_ids
+
+    return {
+        'total': len(items),
+        'weak': sum(1 for i in items if 'score' in i and i['score'] < WEAK_SCORE),
+        'common': sum(1 for i in items if i.get('is_common')),
+        'reused': len(reused_ids),
+        'reused_groups': reused_groups,
+        'errors': sum(1 for i in items if 'error' in i),
+        'entries': items,
+    }
+
+
+def format_report(report: dict) -> str:
+    lines = [
+        "VAULT AUDIT",
+        "=" * 50,
+        f"Entries:            {report['total']}",
+        f"Weak (<{WEAK_SCORE}/100):     {report['weak']}",
+        f"Common/breached:    {report['common']}",
+        f"Reused:             {report['reused']} in {len(report['reused_groups'])} groups",
+    ]
+    if report['errors']:
+        lines.append(f"Undecryptable:      {report['errors']}")
+
+    flagged = [i for i in report['entries']
+               if 'error' in i or i['is_common'] or i['reused'] or i['score'] < WEAK_SCORE]
+    if flagged:
+        lines.append("")
+        lines.append("Needs attention:")
+        for item in flagged:
+            if 'error' in item:
+                problems = [item['error']]
+            else:
+                problems = [item['rating']]
+                if item['is_common']:
+                    problems.append('common/breached')
+                if item['reused']:
+                    problems.append('reused')
+            lines.append(f"  #{item['id']} {item['service']} ({item['username']}): {', '.join(problems)}")
+    return '\n'.join(lines)
@@ -0,0 +1,394 @@
+"""
+    Benchmarks for the hot paths: key derivation, encrypt/decrypt, vault
+    load/save, strength scoring, common password lookup and the entry list.
+
+        python benchmark.py                                  # sizes 10,1000,100000
+        python benchmark.py --sizes 10,1000000 --cases load_entries,save_entries
+        python benchmark.py --save-baseline bench_baseline.json
+        python benchmark.py --baseline bench_baseline.json   # exit 1 on a regression
+
+    Synthetic vaults are generated from a fixed seed in a temp directory, so the
+    real data.json and config.json are never touched. Every case runs in a fresh
+    process, which keeps caches from leaking between cases and makes the peak
+    RSS reported for a case its own.
+"""
+
+import os
+import gc
+import sys
+import json
+import math
+import time
+import random
+import shutil
+import argparse
+import platform
+import tempfile
+import multiprocessing
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows: no getrusage, peak RSS is reported as null
+    resource = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_SIZES = (10, 1000, 100000)
+DEFAULT_THRESHOLD = 0.25  # fail when p50 or peak RSS grows by more than 25%
+SEED = 1234
+MASTER_PASSWORD = 'benchmark-master-password'
+ENTRIES_PER_CASE = 20000  # load/save at least this many entries in total per case
+TOKEN_POOL = 256  # distinct ciphertexts cycled through the synthetic vault
+
+SERVICES = ('github', 'gmail', 'netflix', 'amazon', 'bank', 'spotify', 'discord', 'steam',
+            'reddit', 'dropbox', 'slack', 'twitter', 'paypal', 'work-vpn', 'router', 'icloud')
+WORDS = ('password', 'dragon', 'monkey', 'sunshine', 'football', 'letmein', 'shadow', 'qwerty',
+         'purple', 'orange', 'summer', 'winter', 'coffee', 'tiger', 'rocket', 'cabin')
+RATINGS = ('very weak', 'weak', 'medium', 'strong', 'very strong')
+
+# name: (runs against a vault of each size, default repeats, unit counted per call)
+CASES = {
+    'generatekey':           (False, 5, 'keys'),
+    'encrypt_pass':          (False, 2000, 'passwords'),
+    'decrypt_pass':          (False, 2000, 'passwords'),
+    'calculate_strength':    (False, 1000, 'passwords'),
+    'score_many':            (False, 20, 'passwords'),
+    'is_password_common':    (False, 20000, 'passwords'),
+    'load_entries':          (True, 5, 'entries'),
+    'save_entries':          (True, 5, 'entries'),
+    'open_vault':            (True, 5, 'entries'),
+    'display_password_list': (True, 50, 'pages'),
+}
+
+
+"""     SYNTHETIC DATA BELOW       """
+def sample_passwords(rng: random.Random, count: int) -> list:
+    """Mix of weak, patterned and random passwords, like a real vault"""
+    alphabet = 'abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789!@#$%^&*'
+    out = []
+    for i in range(count):
+        kind = i % 4
+        if kind == 0:
+            out.append(rng.choice(WORDS))
+        elif kind == 1:
+            out.append(rng.choice(WORDS).capitalize() + str(rng.randrange(1950, 2030)) + rng.choice('!?#'))
+        elif kind == 2:
+            out.append('-'.join(rng.choice(WORDS) for _ in range(4)))
+        else:
+            out.append(''.join(rng.choice(alphabet) for _ in range(rng.randrange(12, 24))))
+    return out
+
+def bench_session():
+    """Session with a cheap KDF, only used to encrypt the synthetic vault"""
+    from crypto import KeySession, new_kdf_header
+    return KeySession(MASTER_PASSWORD, new_kdf_header('pbkdf2', {'iterations': 1000}))
+
+def make_vault(workdir: str, size: int, backend: str, seed: int = SEED):
+    """Write config.json and a vault of size entries into workdir"""
+    import storage
+    from crypto import encrypt_pass
+
+    rng = random.Random(seed)
+    session = bench_session()
+    tokens = [encrypt_pass(p, session) for p in sample_passwords(rng, TOKEN_POOL)]
+    entries = [{
+        'id': i,
+        'service': f"{rng.choice(SERVICES)}-{i}",
+        'username': f"user{rng.randrange(10000)}@example.com",
+        'password': tokens[i % TOKEN_POOL],
+        'created': f"20{rng.randrange(18, 26)}-{rng.randrange(1, 13):02d}-{rng.randrange(1, 29):02d}",
+        'strength': rng.choice(RATINGS),
+    } for i in range(1, size + 1)]
+
+    os.makedirs(workdir, exist_ok=True)
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    try:
+        storage.save_config({'storage_backend': backend})
+        vault_backend = storage.BACKENDS[backend]()
+        vault_backend.replace_all(entries, next_id=size + 1)
+        if hasattr(vault_backend, 'close'):
+            vault_backend.close()
+    finally:
+        os.chdir(cwd)
+
+
+"""     CASES BELOW       """
+# each setup returns (op, items per call); op runs once per timed repeat
+def setup_generatekey(size, rng, kdf_name):
+    from crypto import generatekey, new_kdf_header
+    kdf = new_kdf_header(kdf_name)
+    return (lambda: generatekey(MASTER_PASSWORD, kdf)), 1
+
+def setup_encrypt_pass(size, rng, kdf_name):
+    from crypto import encrypt_pass
+    session = bench_session()
+    passwords = sample_passwords(rng, 512)
+    it = iter(range(1 << 62))
+    return (lambda: encrypt_pass(passwords[next(it) % 512], session)), 1
+
+def setup_decrypt_pass(size, rng, kdf_name):
+    from crypto import encrypt_pass, decrypt_pass
+    session = bench_session()
+    tokens = [encrypt_pass(p, session) for p in sample_passwords(rng, 512)]
+    it = iter(range(1 << 62))
+    return (lambda: decrypt_pass(tokens[next(it) % 512], session)), 1
+
+def setup_calculate_strength(size, rng, kdf_name):
+    from password_analyzer import calculate_strength
+    passwords = sample_passwords(rng, 512)
+    it = iter(range(1 << 62))
+    return (lambda: calculate_strength(passwords[next(it) % 512])), 1
+
+def setup_score_many(size, rng, kdf_name):
+    """The batch scorer over 10k passwords per call, compare its throughput with calculate_strength's"""
+    from password_analyzer import score_many, get_common_index
+    get_common_index()
+    passwords = sample_passwords(rng, 10000)
+    return (lambda: score_many(passwords)), len(passwords)
+
+def setup_is_password_common(size, rng, kdf_name):
+    from password_analyzer import is_password_common, get_common_index
+    get_common_index()  # one-off load, not what we're timing
+    passwords = sample_passwords(rng, 512)
+    it = iter(range(1 << 62))
+    return (lambda: is_password_common(passwords[next(it) % 512])), 1
+
+def setup_load_entries(size, rng, kdf_name):
+    from storage import load_entries
+    return load_entries, size
+
+def setup_save_entries(size, rng, kdf_name):
+    from storage import load_entries, save_entries
+    entries = load_entries()
+    return (lambda: save_entries(entries)), size
+
+def setup_open_vault(size, rng, kdf_name):
+    """load_entries plus building the in-memory Vault, what every session starts with"""
+    from vault import Vault
+    return Vault, size
+
+def setup_display_password_list(size, rng, kdf_name):
+    """What the menu does per keypress: build the paged view and draw one page"""
+    import ui
+    from rich.console import Console
+    from storage import load_entries
+    ui.console = Console(file=open(os.devnull, 'w'), width=100, force_terminal=True)
+    entries = load_entries()
+    return (lambda: ui.ListView(entries).render()), 1
+
+
+"""     MEASUREMENT BELOW       """
+def peak_rss_kb():
+    # ru_maxrss survives exec on Linux, so a spawned child would report the
+    # parent's peak; VmHWM belongs to the new address space
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    if resource is None:
+        return None
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss // 1024 if sys.platform == 'darwin' else rss  # macOS reports bytes
+
+def percentile(sorted_values: list, pct: float) -> float:
+    """Nearest-rank percentile"""
+    rank = max(1, math.ceil(pct / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+def run_case(name: str, size: int, repeats: int, workdir: str, kdf_name: str, seed: int) -> dict:
+    """Time one case in this process and summarize it"""
+    import password_analyzer
+    # data files the analyzer looks up relative to the project, not the temp vault
+    password_analyzer.COMMON_PASSWORDS_FILE = os.path.join(HERE, password_analyzer.COMMON_PASSWORDS_FILE)
+    password_analyzer.COMMON_INDEX_FILE = os.path.join(HERE, password_analyzer.COMMON_INDEX_FILE)
+    password_analyzer.BREACH_CORPUS_FILE = os.path.join(HERE, password_analyzer.BREACH_CORPUS_FILE)
+    os.chdir(workdir)
+
+    sized, _, unit = CASES[name]
+    op, items = globals()['setup_' + name](size, random.Random(seed), kdf_name)
+    if repeats >= 20:
+        op()  # warm up caches and lazy imports
+
+    timings = []
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(repeats):
+            start = time.perf_counter_ns()
+            op()
+            timings.append(time.perf_counter_ns() - start)
+    finally:
+        gc.enable()
+
+    timings.sort()
+    total = sum(timings)
+    return {
+        'case': name,
+        'size': size if sized else None,
+        'repeats': repeats,
+        'unit': unit,
+        'mean_ms': total / repeats / 1e6,
+        'min_ms': timings[0] / 1e6,
+        'p50_ms': percentile(timings, 50) / 1e6,
+        'p90_ms': percentile(timings, 90) / 1e6,
+        'p99_ms': percentile(timings, 99) / 1e6,
+        'max_ms': timings[-1] / 1e6,
+        'throughput': items * repeats / (total / 1e9) if total else None,
+        'peak_rss_kb': peak_rss_kb(),
+    }
+
+def _child(queue, *args):
+    try:
+        queue.put(run_case(*args))
+    except BaseException as e:
+        queue.put({'error': f"{type(e).__name__}: {e}"})
+        raise
+
+def run_isolated(*args) -> dict:
+    """run_case in a freshly spawned process"""
+    ctx = multiprocessing.get_context('spawn')
+    queue = ctx.Queue()
+    proc = ctx.Process(target=_child, args=(queue,) + args)
+    proc.start()
+    result = queue.get()
+    proc.join()
+    if 'error' in result:
+        raise RuntimeError(f"{args[0]} failed: {result['error']}")
+    return result
+
+
+def run_suite(cases, sizes, backend: str = 'json', repeats: int = None,
+              kdf_name: str = 'pbkdf2', seed: int = SEED, log=print) -> dict:
+    results = []
+    root = tempfile.mkdtemp(prefix='pm-bench-')
+    try:
+        unsized = os.path.join(root, 'empty')
+        make_vault(unsized, 0, backend, seed)
+        for name in cases:
+            sized, default_repeats, _ = CASES[name]
+            for size in (sizes if sized else (None,)):
+                workdir = unsized
+                if sized:
+                    workdir = os.path.join(root, str(size))
+                    if not os.path.isdir(workdir):
+                        log(f"generating {size} entries...")
+                        make_vault(workdir, size, backend, seed)
+                if not repeats and sized:
+                    # small vaults are fast and noisy, give them enough calls to settle
+                    default_repeats = max(default_repeats, min(1000, ENTRIES_PER_CASE // max(size, 1)))
+                result = run_isolated(name, size, repeats or default_repeats, workdir, kdf_name, seed)
+                log(format_result(result))
+                results.append(result)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+    return {
+        'meta': {
+            'created': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+            'cpus': os.cpu_count(),
+            'backend': backend,
+            'kdf': kdf_name,
+            'seed': seed,
+        },
+        'results': results,
+    }
+
+
+"""     REPORTING BELOW       """
+def format_result(r: dict) -> str:
+    label = r['case'] + (f"[{r['size']}]" if r['size'] is not None else '')
+    rss = f"{r['peak_rss_kb'] / 1024:8.1f} MB" if r['peak_rss_kb'] is not None else '       n/a'
+    return (f"{label:<32} p50 {r['p50_ms']:10.3f} ms  p90 {r['p90_ms']:10.3f} ms  "
+            f"p99 {r['p99_ms']:10.3f} ms  {r['throughput']:12.0f} {r['unit']}/s  rss {rss}")
+
+# runs that differ in these measured different things, comparing them means nothing
+COMPARABLE_META = ('backend', 'kdf', 'seed')
+
+def meta_mismatches(current_meta: dict, baseline_meta: dict) -> list:
+    """'key: baseline -> current' for each COMPARABLE_META setting the two runs disagree on"""
+    return [f"{key}: {baseline_meta.get(key)} -> {current_meta.get(key)}" for key in COMPARABLE_META
+            if baseline_meta.get(key) != current_meta.get(key)]
+
+def compare(current: dict, baseline: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """Regressions as (label, metric, baseline, current, ratio) for cases present in both runs.
+
+    Raises ValueError if the runs used a different backend, KDF or seed.
+    """
+    mismatches = meta_mismatches(current.get('meta', {}), baseline.get('meta', {}))
+    if mismatches:
+        raise ValueError(f"baseline was run with different settings ({', '.join(mismatches)})")
+    before = {(r['case'], r['size']): r for r in baseline['results']}
+    regressions = []
+    for r in current['results']:
+        old = before.get((r['case'], r['size']))
+        if old is None:
+            continue
+        label = r['case'] + (f"[{r['size']}]" if r['size'] is not None else '')
+        for metric in ('p50_ms', 'peak_rss_kb'):
+            if not old.get(metric) or r.get(metric) is None:
+                continue
+            ratio = r[metric] / old[metric]
+            if ratio > 1 + threshold:
+                regressions.append((label, metric, old[metric], r[metric], ratio))
+    return regressions
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Benchmark the password manager's hot paths")
+    parser.add_argument('--cases', default=','.join(CASES), help="comma separated, default: all")
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help="vault sizes for the load/save/list cases (10 to 1000000)")
+    parser.add_argument('--backend', choices=('json', 'sqlite', 'binary'), default='json')
+    parser.add_argument('--kdf', choices=('pbkdf2', 'scrypt', 'argon2id'), default='pbkdf2',
+                        help="KDF timed by generatekey, with its default parameters")
+    parser.add_argument('--repeats', type=int, help="override every case's repeat count")
+    parser.add_argument('--seed', type=int, default=SEED)
+    parser.add_argument('--output', default='bench_results.json', help="where to write the JSON results")
+    parser.add_argument('--baseline', help="compare against this results file, exit 1 on a regression")
+    parser.add_argument('--save-baseline', metavar='PATH', help="also write the results here as the new baseline")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                        help="allowed growth in p50 latency or peak RSS, 0.25 = 25%%")
+    args = parser.parse_args(argv)
+
+    cases = [c.strip() for c in args.cases.split(',') if c.strip()]
+    unknown = [c for c in cases if c not in CASES]
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(unknown)}")
+    sizes = [int(s) for s in args.sizes.split(',') if s.strip()]
+
+    baseline = None
+    if args.baseline:
+        # check before spending minutes on a run that can't be compared
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        mismatches = meta_mismatches({'backend': args.backend, 'kdf': args.kdf, 'seed': args.seed},
+                                     baseline.get('meta', {}))
+        if mismatches:
+            parser.error(f"{args.baseline} was run with different settings ({', '.join(mismatches)}), "
+                         "rerun it with the same --backend/--kdf/--seed")
+
+    report = run_suite(cases, sizes, args.backend, args.repeats, args.kdf, args.seed)
+    for path in filter(None, (args.output, args.save_baseline)):
+        with open(path, 'w') as f:
+            json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+    if baseline is not None:
+        regressions = compare(report, baseline, args.threshold)
+        for label, metric, old, new, ratio in regressions:
+            print(f"REGRESSION {label} {metric}: {old:.3f} -> {new:.3f} ({(ratio - 1) * 100:+.0f}%)")
+        if regressions:
+            return 1
+        print(f"No regressions beyond {args.threshold:.0%} against {args.baseline}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,157 @@
+"""
+    On-disk breach corpus: a sorted table of SHA-1 digests with a 16-bit prefix
+    fan-out, memory-mapped so lookups stay fast without loading the list into RAM.
+
+    File layout:
+        magic (5 bytes) | record count (8 bytes, little endian)
+        fan-out table: 65537 x uint64, index of the first record for each 2-byte prefix
+        records: count x 20-byte SHA-1 digests, sorted
+"""
+
+import os
+import sys
+import mmap
+import heapq
+import hashlib
+import tempfile
+from array import array
+
+CORPUS_MAGIC = b'PMBC\x01'
+DIGEST_SIZE = 20
+FANOUT_SIZE = 65537
+HEADER_SIZE = len(CORPUS_MAGIC) + 8 + FANOUT_SIZE * 8
+RUN_SIZE = 2_000_000  # digests per sorted run while building (~40MB)
+
+
+def _digest_line(line: str) -> bytes:
+    """Accepts plain passwords or HIBP-style 'SHA1HEX[:count]' lines"""
+    hex_part = line.split(':', 1)[0]
+    if len(hex_part) == 40:
+        try:
+            return bytes.fromhex(hex_part)
+        except ValueError:
+            pass
+    return hashlib.sha1(line.lower().encode()).digest()
+
+
+def _write_run(digests: list, directory: str) -> str:
+    digests.sort()
+    fd, path = tempfile.mkstemp(dir=directory, suffix='.run')
+    with os.fdopen(fd, 'wb') as f:
+        f.write(b''.join(digests))
+    return path
+
+
+def _read_run(path: str):
+    with open(path, 'rb') as f:
+        while True:
+            chunk = f.read(DIGEST_SIZE * 4096)
+            if not chunk:
+                return
+            for i in range(0, len(chunk), DIGEST_SIZE):
+                yield chunk[i:i + DIGEST_SIZE]
+
+
+def build_corpus(src: str, dest: str, run_size: int = RUN_SIZE) -> int:
+    """Build a corpus file from a wordlist with an external merge sort.
+
+    Memory use is bounded by run_size regardless of how large the source is.
+    """
+    runs = []
+    directory = os.path.dirname(os.path.abspath(dest))
+    try:
+        digests = []
+        with open(src, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                digests.append(_digest_line(line))
+                if len(digests) >= run_size:
+                    runs.append(_write_run(digests, directory))
+                    digests = []
+        if digests:
+            runs.append(_write_run(digests, directory))
+
+        fanout = array('Q', [0]) * FANOUT_SIZE
+        count = 0
+        previous = None
+        with open(dest, 'wb') as out:
+            out.write(b'\0' * HEADER_SIZE)
+            for digest in heapq.merge(*(_read_run(path) for path in runs)):
+                if digest == previous:
+                    continue
+                out.write(digest)
+                fanout[int.from_bytes(digest[:2], 'big') + 1] += 1
+                previous = digest
+                count += 1
+
+            for i in range(1, FANOUT_SIZE):
+                fanout[i] += fanout[i - 1]
+            if sys.byteorder != 'little':
+                fanout.byteswap()
+            out.seek(0)
+            out.write(CORPUS_MAGIC)
+            out.write(count.to_bytes(8, 'little'))
+            fanout.tofile(out)
+        return count
+    finally:
+        for path in runs:
+            os.remove(path)
+
+
+class BreachCorpus:
+    """Read-only, memory-mapped view of a corpus built by build_corpus()"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._mm[:len(CORPUS_MAGIC)] != CORPUS_MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a breach corpus file")
+        offset = len(CORPUS_MAGIC)
+        self.count = int.from_bytes(self._mm[offset:offset + 8], 'little')
+        self._fanout = array('Q')
+        self._fanout.frombytes(self._mm[offset + 8:HEADER_SIZE])
+        if sys.byteorder != 'little':
+            self._fanout.byteswap()
+
+    def __len__(self):
+        return self.count
+
+    def contains_digest(self, digest: bytes) -> bool:
+        prefix = int.from_bytes(digest[:2], 'big')
+        lo, hi = self._fanout[prefix], self._fanout[prefix + 1]
+        mm = self._mm
+        while lo < hi:
+            mid = (lo + hi) // 2
+            start = HEADER_SIZE + mid * DIGEST_SIZE
+            record = mm[start:start + DIGEST_SIZE]
+            if record < digest:
+                lo = mid + 1
+            elif record > digest:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def __contains__(self, password: str) -> bool:
+        # Plaintext lists are stored lowercased, HIBP hashes are case-sensitive
+        if self.contains_digest(hashlib.sha1(password.lower().encode()).digest()):
+            return True
+        return self.contains_digest(hashlib.sha1(password.encode()).digest())
+
+    def close(self):
+        self._mm.close()
+        self._file.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Build a memory-mapped breach corpus")
+    parser.add_argument("source", help="wordlist with one password or SHA-1 hash per line")
+    parser.add_argument("dest", nargs="?", default="breach_corpus.bin")
+    args = parser.parse_args()
+    print(f"Wrote {build_corpus(args.source, args.dest)} digests to {args.dest}")
@@ -0,0 +1,465 @@
+"""
+    Non-interactive subcommands, e.g.
+        python main.py get github --field password
+        python main.py list --json
+        python main.py add GitHub me@example.com --generate
+        python main.py generate --count 1000 --mode diceware
+        python main.py import passwords.csv
+        python main.py --password-stdin export backup.jsonl < master.txt
+        python main.py audit
+        python main.py attach github ~/.ssh/id_ed25519
+        python main.py extract github id_ed25519 -o - | ssh-add -
+        python main.py passwd
+        python main.py --profile get github
+
+    Only what a command needs is imported, so a single lookup never loads
+    rich, pyperclip or the strength analyzer (--profile does, to hook them).
+"""
+
+import os
+import sys
+import getpass
+import argparse
+
+
+
+class CLIError(Exception):
+    pass
+
+
+def read_master_password(args) -> str:
+    if args.password_stdin:
+        # binary readline: the text layer would buffer past the line, and
+        # 'attach -' reads the rest of stdin as bytes
+        return sys.stdin.buffer.readline().decode().rstrip('\r\n')
+    return getpass.getpass("Master password: ", stream=sys.stderr)
+
+def unlock(args):
+    """Prompt for (or read) the master password and return a KeySession"""
+    return unlock_with(read_master_password(args))
+
+def unlock_with(password: str):
+    from storage import has_master_password
+    from vault import open_session
+
+    if not has_master_password():
+        raise CLIError("No master password set, run 'python main.py' first")
+    session = open_session(password)
+    if session is None:
+        raise CLIError("Incorrect master password")
+    return session
+
+
+def use_agent(args) -> bool:
+    if args.no_agent:
+        return False
+    from agent import agent_available
+    return agent_available()
+
+def call_agent(request: dict):
+    from agent import agent_call, AgentError
+    try:
+        return agent_call(request)
+    except AgentError as e:
+        raise CLIError(str(e)) from e
+
+
+def cmd_get(args) -> int:
+    if use_agent(args):
+        record = call_agent({'op': 'get', 'query': args.query, 'id': args.id})
+    else:
+        from vault import find_entry
+
+        # unlock first: it may re-key the vault
+        with unlock(args) as session:
+            entry = find_entry(args.query, args.id)
+            password = entry.decrypt(session)
+        if password is None:
+            raise CLIError("Could not decrypt entry")
+        record = entry.metadata()
+        record['password'] = password
+
+    if args.field == 'all':
+        import json
+        value = json.dumps(record)
+    elif args.json:
+        import json
+        value = json.dumps(record.get(args.field))
+    else:
+        value = str(record.get(args.field) or '')
+
+    if args.copy:
+        import pyperclip
+        pyperclip.copy(value)
+        print("Copied to clipboard", file=sys.stderr)
+    else:
+        print(value)
+    return 0
+
+
+def cmd_list(args) -> int:
+    fields = ('id', 'service', 'username', 'created', 'strength')
+    if use_agent(args):
+        entries = call_agent({'op': 'list'})
+    else:
+        from storage import get_backend
+        entries = get_backend().list_metadata()
+    if args.json:
+        import json
+        print(json.dumps([{k: e.get(k) for k in fields} for e in entries]))
+    else:
+        for e in entries:
+            print(f"{e['id']}\t{e['service']}\t{e['username']}\t{e.get('strength', 'unknown')}")
+    return 0
+
+
+def cmd_attach(args) -> int:
+    from vault import Vault
+    from entry import Entry
+    from attachments import add_attachment, DEFAULT_CIPHER
+
+    name = args.name or ('note' if args.file == '-' else os.path.basename(args.file))
+    with unlock(args) as session:
+        vault = Vault(session=session)
+        # work on a copy so the vault still knows what the entry looked like on disk
+        entry = Entry.from_dict(vault.find(args.query, args.id).to_dict())
+        if args.file == '-':
+            ref = add_attachment(entry, sys.stdin.buffer, name, session, args.cipher or DEFAULT_CIPHER)
+        else:
+            with open(args.file, 'rb') as f:
+                ref = add_attachment(entry, f, name, session, args.cipher or DEFAULT_CIPHER)
+        vault.update(entry)
+        vault.flush()
+    print(f"Attached '{ref['name']}' ({ref['size']} bytes) to #{entry['id']} {entry['service']}", file=sys.stderr)
+    return 0
+
+def cmd_extract(args) -> int:
+    from vault import Vault
+    from attachments import list_attachments, find_attachment, extract_attachment, extract_to_file
+
+    if args.id is not None and args.name is None:
+        # "extract --id 3 id_rsa": the one positional is the attachment name
+        args.name, args.query = args.query, None
+    if args.name is None:
+        # no name: list what's attached (no master password needed)
+        entry = Vault().find(args.query, args.id)
+        for ref in list_attachments(entry):
+            print(f"{ref['name']}\t{ref['size']}")
+        return 0
+
+    with unlock(args) as session:
+        ref = find_attachment(Vault().find(args.query, args.id), args.name)
+        if args.output == '-':
+            extract_attachment(ref, session, sys.stdout.buffer)
+            sys.stdout.flush()
+        else:
+            output = args.output or os.path.basename(ref['name'])
+            if not args.output and os.path.exists(output):
+                raise CLIError(f"{output} already exists, use -o to pick where to write it")
+            size = extract_to_file(ref, session, output)
+            print(f"Wrote {size} bytes to {output}", file=sys.stderr)
+    return 0
+
+def cmd_detach(args) -> int:
+    from vault import Vault
+    from entry import Entry
+    from attachments import remove_attachment
+
+    # deleting the file is as destructive as writing one, so it takes the master password too
+    with unlock(args) as session:
+        vault = Vault(session=session)
+        entry = Entry.from_dict(vault.find(args.query, args.id).to_dict())
+        ref = remove_attachment(entry, args.name)
+        vault.update(entry)
+        vault.flush()
+    print(f"Removed '{ref['name']}' from #{entry['id']} {entry['service']}", file=sys.stderr)
+    return 0
+
+
+def read_entry_password(args) -> str:
+    if args.generate:
+        from crypto import generate_password
+        return generate_password(args.length, not args.no_symbols)
+    if args.password_stdin:
+        return sys.stdin.readline().rstrip('\n')
+    return getpass.getpass("Password for entry: ", stream=sys.stderr)
+
+def cmd_add(args) -> int:
+    # the first stdin line is the master password whether or not the agent answers
+    master = read_master_password(args) if args.password_stdin else None
+    if use_agent(args):
+        password = read_entry_password(args)
+        entry = call_agent({'op': 'add', 'service': args.service, 'username': args.username,
+                            'password': password})
+    else:
+        from vault import Vault, new_entry
+
+        with unlock_with(master if master is not None else read_master_password(args)) as session:
+            password = read_entry_password(args)
+            if not args.service or not args.username or not password:
+                raise CLIError("Service, username and password are all required")
+            vault = Vault(session=session)
+            entry = vault.add(new_entry(args.service, args.username, password, session))
+            vault.flush()
+
+    print(f"Added #{entry['id']} {entry['service']} ({entry['strength']})", file=sys.stderr)
+    if args.generate:
+        print(password)
+    return 0
+
+
+def cmd_generate(args) -> int:
+    from password_generator import generate_many, load_wordlist
+
+    if args.mode == 'random':
+        classes = ('lower', 'upper', 'digit') if args.no_symbols else ('lower', 'upper', 'digit', 'symbol')
+        options = {'length': args.length, 'classes': classes}
+    elif args.mode == 'pronounceable':
+        options = {'syllables': args.syllables}
+    else:
+        options = {'words': args.words, 'separator': args.separator}
+        if args.wordlist:
+            options['wordlist'] = load_wordlist(args.wordlist)
+    write = sys.stdout.write
+    for password in generate_many(args.count, args.mode, **options):
+        write(password + '\n')
+    return 0
+
+
+def cmd_agent(args) -> int:
+    from agent import agent_available, agent_call, prepare_socket_dir, socket_path, start_agent, AgentError, SOCKET_ENV
+
+    path = args.socket or socket_path()
+    running = False
+    if agent_available(path):
+        try:
+            agent_call({'op': 'lock' if args.stop else 'ping'}, path)
+            running = True
+        except AgentError:
+            os.remove(path)  # stale socket left by an agent that died
+    if args.stop:
+        if not running:
+            raise CLIError(f"No agent running at {path}")
+        print("Agent stopped", file=sys.stderr)
+        return 0
+    if running:
+        raise CLIError(f"An agent is already running at {path}")
+
+    try:
+        prepare_socket_dir(path)
+    except AgentError as e:
+        raise CLIError(str(e)) from e
+
+    from vault import Vault
+    session = unlock(args)
+    vault = Vault(session=session)
+    print(f"{SOCKET_ENV}={path}; export {SOCKET_ENV};")
+    sys.stdout.flush()
+    try:
+        start_agent(session, vault, path, args.timeout, daemon=not args.foreground)
+    finally:
+        session.lock()
+    return 0
+
+
+def cmd_calibrate(args) -> int:
+    import time
+    from crypto import calibrate_kdf, derive_key, new_kdf_header
+
+    params = calibrate_kdf(args.kdf, args.target_ms / 1000)
+    header = new_kdf_header(args.kdf, params)
+    start = time.perf_counter()
+    derive_key('calibration', header)
+    print(f"{args.kdf} {params}: {(time.perf_counter() - start) * 1000:.0f} ms per unlock")
+
+    if args.apply:
+        from vault import change_master_password
+
+        password = read_master_password(args)
+        with unlock_with(password) as session:
+            change_master_password(session, password, header)
+        print("Vault re-keyed with the new parameters", file=sys.stderr)
+    return 0
+
+
+def cmd_passwd(args) -> int:
+    from vault import change_master_password
+
+    with unlock(args) as session:
+        if args.password_stdin:
+            new_password = confirm = sys.stdin.buffer.readline().decode().rstrip('\r\n')
+        else:
+            new_password = getpass.getpass("New master password: ", stream=sys.stderr)
+            confirm = getpass.getpass("Confirm new master password: ", stream=sys.stderr)
+        if new_password != confirm:
+            raise CLIError("Passwords don't match")
+        if len(new_password) < 8:
+            raise CLIError("Password must be at least 8 characters")
+        change_master_password(session, new_password)
+    print("Master password changed", file=sys.stderr)
+    return 0
+
+def cmd_rotate_key(args) -> int:
+    from storage import load_config
+    from vault import rotate_data_key, reencrypt_vault
+
+    with unlock(args) as session:
+        # a rotation that was interrupted is finished instead of starting another
+        if not load_config().get('reencrypt_pending'):
+            rotate_data_key(session)
+        moved = reencrypt_vault(session)
+    print(f"Re-encrypted {moved} entries under a new data key", file=sys.stderr)
+    return 0
+
+
+def cmd_import(args) -> int:
+    from transfer import import_entries
+    with unlock(args) as session:
+        count = import_entries(args.file, session, args.format, args.workers)
+    print(f"Imported {count} entries from {args.file}", file=sys.stderr)
+    return 0
+
+def cmd_export(args) -> int:
+    from transfer import export_entries
+    with unlock(args) as session:
+        count = export_entries(args.file, session, args.format, args.workers)
+    print(f"Exported {count} entries to {args.file} (plaintext - keep it safe)", file=sys.stderr)
+    return 0
+
+
+def cmd_audit(args) -> int:
+    from audit import audit_vault, format_report
+    with unlock(args) as session:
+        report = audit_vault(session, args.workers)
+    if args.json:
+        import json
+        print(json.dumps(report, indent=2))
+    else:
+        print(format_report(report))
+    return 0
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(prog="main.py", description="Password manager")
+    parser.add_argument("--password-stdin", action="store_true",
+                        help="read the master password from the first line of stdin "
+                             "(for 'add' the entry password, for 'passwd' the new one is the second line)")
+    parser.add_argument("--no-agent", action="store_true", help="ignore a running agent")
+    parser.add_argument("--profile", action="store_true",
+                        help="print where the command spent its time (same as PM_PROFILE=1)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    p = subparsers.add_parser("get", help="print one field of an entry")
+    p.add_argument("query", nargs="?", help="service name (exact match first, then search)")
+    p.add_argument("--id", type=int)
+    p.add_argument("--field", choices=("password", "username", "service", "created", "strength", "all"),
+                   default="password")
+    p.add_argument("--copy", action="store_true", help="copy to clipboard instead of printing")
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(func=cmd_get)
+
+    p = subparsers.add_parser("list", help="list entries (no master password needed)")
+    p.add_argument("--json", action="store_true")
+    p.set_defaults(func=cmd_list)
+
+    p = subparsers.add_parser("add", help="add an entry")
+    p.add_argument("service")
+    p.add_argument("username")
+    p.add_argument("--generate", action="store_true", help="generate the password and print it")
+    p.add_argument("--length", type=int, default=16)
+    p.add_argument("--no-symbols", action="store_true")
+    p.set_defaults(func=cmd_add)
+
+    p = subparsers.add_parser("generate", help="print random passwords or passphrases (no vault needed)")
+    p.add_argument("--count", type=int, default=1)
+    p.add_argument("--mode", choices=("random", "pronounceable", "diceware"), default="random")
+    p.add_argument("--length", type=int, default=16, help="random mode: characters")
+    p.add_argument("--no-symbols", action="store_true", help="random mode: letters and digits only")
+    p.add_argument("--syllables", type=int, default=4, help="pronounceable mode: syllables")
+    p.add_argument("--words", type=int, default=6, help="diceware mode: words")
+    p.add_argument("--separator", default="-", help="diceware mode: word separator")
+    p.add_argument("--wordlist", help="diceware mode: wordlist file (default: $PM_WORDLIST or wordlist.txt)")
+    p.set_defaults(func=cmd_generate)
+
+    p = subparsers.add_parser("attach", help="encrypt a file (or a note from stdin) into an entry")
+    p.add_argument("query", nargs="?", help="service name")
+    p.add_argument("file", help="file to attach, - for a note read from stdin")
+    p.add_argument("--id", type=int)
+    p.add_argument("--name", help="attachment name (default: the file name, or 'note')")
+    p.add_argument("--cipher", choices=("aesgcm", "chacha20"))
+    p.set_defaults(func=cmd_attach)
+
+    p = subparsers.add_parser("extract", help="decrypt an attachment, or list them when no name is given")
+    p.add_argument("query", nargs="?", help="service name")
+    p.add_argument("name", nargs="?", help="attachment name")
+    p.add_argument("--id", type=int)
+    p.add_argument("-o", "--output", help="output file (default: the attachment name), - for stdout")
+    p.set_defaults(func=cmd_extract)
+
+    p = subparsers.add_parser("detach", help="remove an attachment from an entry")
+    p.add_argument("query", nargs="?", help="service name")
+    p.add_argument("name")
+    p.add_argument("--id", type=int)
+    p.set_defaults(func=cmd_detach)
+
+    p = subparsers.add_parser("agent", help="unlock once and serve requests from a background agent")
+    p.add_argument("--timeout", type=float, default=15 * 60, help="lock after this many idle seconds")
+    p.add_argument("--socket", help="socket path (default: $PM_AGENT_SOCK or a per-user temp dir)")
+    p.add_argument("--foreground", action="store_true")
+    p.add_argument("--stop", action="store_true", help="lock and stop the running agent")
+    p.set_defaults(func=cmd_agent)
+
+    p = subparsers.add_parser("calibrate", help="benchmark the KDF and pick parameters for a target unlock time")
+    p.add_argument("--kdf", choices=("pbkdf2", "scrypt", "argon2id"), default="pbkdf2")
+    p.add_argument("--target-ms", type=float, default=500)
+    p.add_argument("--apply", action="store_true", help="re-key the vault with the calibrated parameters")
+    p.set_defaults(func=cmd_calibrate)
+
+    p = subparsers.add_parser("passwd", help="change the master password (the entries aren't re-encrypted)")
+    p.set_defaults(func=cmd_passwd)
+
+    p = subparsers.add_parser("rotate-key", help="re-encrypt every entry under a fresh data key")
+    p.set_defaults(func=cmd_rotate_key)
+
+    p = subparsers.add_parser("import", help="import entries from a CSV/JSON export")
+    p.add_argument("file")
+    p.add_argument("--format", choices=("csv", "json", "jsonl"), help="default: from the file extension")
+    p.add_argument("--workers", type=int, help="encryption processes (default: CPU count)")
+    p.set_defaults(func=cmd_import)
+
+    p = subparsers.add_parser("export", help="export decrypted entries to CSV/JSON")
+    p.add_argument("file")
+    p.add_argument("--format", choices=("csv", "json", "jsonl"), help="default: from the file extension")
+    p.add_argument("--workers", type=int, help="decryption processes (default: CPU count)")
+    p.set_defaults(func=cmd_export)
+
+    p = subparsers.add_parser("audit", help="report weak, common and reused passwords")
+    p.add_argument("--json", action="store_true", help="machine-readable report")
+    p.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    p.set_defaults(func=cmd_audit)
+
+    return parser
+
+
+def run(argv=None) -> int:
+    import instrument
+
+    args = build_parser().parse_args(argv)
+    if args.profile:
+        instrument.install()
+    else:
+        instrument.install_from_env()
+    try:
+        with instrument.action(args.command):
+            return args.func(args)
+    except (CLIError, LookupError, ValueError, OSError) as e:
+        print(f"error: {e}", file=sys.stderr)
+        return 1
+    except EOFError:
+        # stdin closed at a prompt
+        print("error: no input", file=sys.stderr)
+        return 1
+
+
+if __name__ == "__main__":
+    sys.exit(run())
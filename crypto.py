@@ -1,45 +1,295 @@
 import hashlib
+import hmac
+import time
 
-from cryptography.fernet import Fernet
+from cryptography.fernet import Fernet, MultiFernet, InvalidToken
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives.kdf.pbkdf2 import PBKDF2HMAC
+from cryptography.hazmat.primitives.kdf.scrypt import Scrypt
 import base64
 
 import secrets
-import string
+
+KDF_VERSION = 1
+
+# parameters used when no calibration has been done
+KDF_DEFAULTS = {
+    'pbkdf2': {'iterations': 600000},
+    'scrypt': {'n': 2 ** 15, 'r': 8, 'p': 1},
+    'argon2id': {'iterations': 3, 'memory_cost': 64 * 1024, 'lanes': 4},
+}
+
+# what every vault used before headers existed: fixed salt, 100k PBKDF2 rounds
+LEGACY_KDF = {
+    'version': 0,
+    'name': 'pbkdf2',
+    'salt': base64.b64encode(b'password_manager_salt_2025').decode(),
+    'params': {'iterations': 100000},
+}
 
 def hash_password(password: str) -> str:
-    """ Hashes a password using SHA-256"""
+    """ Hashes a password using SHA-256 (legacy vaults only, see LEGACY_KDF)"""
     return hashlib.sha256(password.encode()).hexdigest()
 
 def verify_master_password(entered_pass: str, stored_hash: str) -> bool:
     hashed_input = hash_password(entered_pass)
-    return hashed_input == stored_hash
-
-def generatekey(master_pass: str) -> bytes:
-    salt = b'password_manager_salt_2025'
-    # FOR NOW -- I use a fixed salt, in actual production ima generate a random salt and store it
-
-    kdf = PBKDF2HMAC(
-        algorithm=hashes.SHA256(),
-        length=32,
-        salt=salt,
-        iterations=100000, #Kinda high, ill adjust later
-    )
-    key=base64.urlsafe_b64encode(kdf.derive(master_pass.encode()))
-    return key
-
-def encrypt_pass(norm_pass: str, master_pass: str) -> str:
-    key = generatekey(master_pass)
-    fernet = Fernet(key)
-    encrypted = fernet.encrypt(norm_pass.encode())
+    return hmac.compare_digest(hashed_input, stored_hash)
+
+
+def new_kdf_header(name: str = 'pbkdf2', params: dict = None) -> dict:
+    """Fresh KDF description with a random 16-byte salt"""
+    if name not in KDF_DEFAULTS:
+        raise ValueError(f"Unknown KDF: {name}")
+    return {
+        'version': KDF_VERSION,
+        'name': name,
+        'salt': base64.b64encode(secrets.token_bytes(16)).decode(),
+        'params': dict(params or KDF_DEFAULTS[name]),
+    }
+
+def _argon2id(password: bytes, salt: bytes, params: dict) -> bytes:
+    try:
+        from cryptography.hazmat.primitives.kdf.argon2 import Argon2id
+    except ImportError:  # cryptography < 44
+        try:
+            from argon2.low_level import hash_secret_raw, Type
+        except ImportError:
+            raise ValueError("Argon2id needs cryptography>=44 or argon2-cffi")
+        return hash_secret_raw(password, salt, params['iterations'], params['memory_cost'],
+                               params['lanes'], 32, Type.ID)
+    return Argon2id(salt=salt, length=32, iterations=params['iterations'], lanes=params['lanes'],
+                    memory_cost=params['memory_cost']).derive(password)
+
+def derive_key(master_pass: str, kdf: dict) -> bytes:
+    """Derive a Fernet key as described by a KDF header"""
+    salt = base64.b64decode(kdf['salt'])
+    params = kdf['params']
+    password = master_pass.encode()
+    if kdf['name'] == 'pbkdf2':
+        raw = PBKDF2HMAC(algorithm=hashes.SHA256(), length=32, salt=salt,
+                         iterations=params['iterations']).derive(password)
+    elif kdf['name'] == 'scrypt':
+        raw = Scrypt(salt=salt, length=32, n=params['n'], r=params['r'], p=params['p']).derive(password)
+    elif kdf['name'] == 'argon2id':
+        raw = _argon2id(password, salt, params)
+    else:
+        raise ValueError(f"Unknown KDF: {kdf['name']}")
+    return base64.urlsafe_b64encode(raw)
+
+def generatekey(master_pass: str, kdf: dict = None) -> bytes:
+    return derive_key(master_pass, kdf or LEGACY_KDF)
+
+
+def make_verifier(key: bytes) -> str:
+    """Value stored next to the KDF header to check a master password without a separate hash"""
+    mac = hmac.new(base64.urlsafe_b64decode(key), b'password-manager/verifier', hashlib.sha256)
+    return base64.b64encode(mac.digest()).decode()
+
+def check_verifier(key: bytes, verifier: str) -> bool:
+    return hmac.compare_digest(make_verifier(key), verifier)
+
+
+def key_id(key: bytes) -> str:
+    """Short public name for a data key, so a process can tell whether its key is still current"""
+    mac = hmac.new(base64.urlsafe_b64decode(key), b'password-manager/key-id', hashlib.sha256)
+    return mac.hexdigest()[:16]
+
+
+def calibrate_kdf(name: str = 'pbkdf2', target_seconds: float = 0.5) -> dict:
+    """Pick KDF parameters that take about target_seconds on this machine"""
+    salt = secrets.token_bytes(16)
+
+    def timed(params: dict) -> float:
+        start = time.perf_counter()
+        derive_key('calibration', {'name': name, 'salt': base64.b64encode(salt).decode(), 'params': params})
+        return time.perf_counter() - start
+
+    if name == 'pbkdf2':
+        sample = 50000
+        iterations = int(sample * target_seconds / timed({'iterations': sample}))
+        return {'iterations': max(iterations, 100000)}
+    if name == 'scrypt':
+        params = dict(KDF_DEFAULTS['scrypt'], n=2 ** 14)
+        while timed(params) < target_seconds / 2 and params['n'] < 2 ** 20:
+            params['n'] *= 2
+        return params
+    if name == 'argon2id':
+        params = dict(KDF_DEFAULTS['argon2id'], iterations=1)
+        elapsed = timed(params)
+        params['iterations'] = max(2, round(target_seconds / elapsed))
+        return params
+    raise ValueError(f"Unknown KDF: {name}")
+
+
+class KeySession:
+    """Holds the unlocked keys for one session so the KDF only runs at login.
+
+    The master key comes from the password through the KDF and is only used
+    to wrap the vault's data keys (config 'wrapped_keys', current key first).
+    Entries are encrypted under the current data key; older ones stay around
+    while a rotation is re-encrypting the vault. The master key is tried
+    last, for entries from before envelope encryption.
+    """
+
+    def __init__(self, master_pass: str, kdf: dict = None, wrapped_keys: list = None):
+        self.kdf = kdf or LEGACY_KDF
+        self._master = bytearray(derive_key(master_pass, self.kdf))
+        self._keys = []
+        self._fernets = None
+        if wrapped_keys:
+            self.unwrap(wrapped_keys)
+        else:
+            self._load()
+
+    def _load(self):
+        # the master key itself goes last, so old vaults keep decrypting
+        self._fernets = [Fernet(bytes(key)) for key in self._keys] + [Fernet(bytes(self._master))]
+        self._fernet = self._fernets[0] if len(self._fernets) == 1 else MultiFernet(self._fernets)
+
+    def unwrap(self, wrapped_keys: list):
+        """Decrypt the data keys with the master key, replacing the ones we hold"""
+        wrapper = Fernet(bytes(self._master))
+        try:
+            keys = [bytearray(wrapper.decrypt(token.encode())) for token in wrapped_keys]
+        except InvalidToken:
+            raise ValueError("Could not unwrap the vault keys, wrong master password?") from None
+        self._zero_keys()
+        self._keys = keys
+        self._load()
+
+    def wrapped_keys(self) -> list:
+        """The data keys encrypted under the master key, for the config"""
+        wrapper = Fernet(self.master_key)
+        return [wrapper.encrypt(bytes(key)).decode() for key in self._keys]
+
+    def new_data_key(self):
+        """Make a fresh random data key the current one (the old ones still decrypt)"""
+        self.fernet  # refuse on a locked session
+        self._keys.insert(0, bytearray(Fernet.generate_key()))
+        self._load()
+
+    def retire_old_keys(self):
+        """Drop every data key but the current one, once nothing is encrypted under them"""
+        for key in self._keys[1:]:
+            _zero(key)
+        del self._keys[1:]
+        self._load()
+
+    def copy(self) -> 'KeySession':
+        """Independent session holding the same keys (lock it when done)"""
+        other = KeySession.__new__(KeySession)
+        other.kdf = self.kdf
+        other._master = bytearray(self.master_key)
+        other._keys = [bytearray(key) for key in self._keys]
+        other._load()
+        return other
+
+    def change_master_key(self, master_key: bytes, kdf: dict):
+        """Put the same data keys behind a new master key (from derive_key), in place"""
+        self.fernet  # refuse on a locked session
+        _zero(self._master)
+        self._master = bytearray(master_key)
+        self.kdf = kdf
+        self._load()
+
+    @property
+    def fernet(self):
+        """Fernet (or MultiFernet while several keys are in use): encrypts under the current key"""
+        if self._fernets is None:
+            raise RuntimeError("Session is locked")
+        return self._fernet
+
+    @property
+    def fernets(self) -> list:
+        """One Fernet per key, current data key first"""
+        if self._fernets is None:
+            raise RuntimeError("Session is locked")
+        return list(self._fernets)
+
+    @property
+    def locked(self) -> bool:
+        return self._fernets is None
+
+    @property
+    def enveloped(self) -> bool:
+        """False for vaults that still encrypt entries with the master key directly"""
+        return bool(self._keys)
+
+    @property
+    def master_key(self) -> bytes:
+        """KDF output, for the verifier and wrapping the data keys"""
+        if self._fernets is None:
+            raise RuntimeError("Session is locked")
+        return bytes(self._master)
+
+    @property
+    def key(self) -> bytes:
+        """Current data key"""
+        return self.keys[0]
+
+    @property
+    def key_id(self) -> str:
+        return key_id(self.key)
+
+    @property
+    def keys(self) -> tuple:
+        """Every key that can decrypt entries, current first, for handing to worker processes"""
+        if self._fernets is None:
+            raise RuntimeError("Session is locked")
+        return tuple(bytes(key) for key in self._keys) + (bytes(self._master),)
+
+    def _zero_keys(self):
+        for key in self._keys:
+            _zero(key)
+        self._keys = []
+
+    def lock(self):
+        """Zero the key buffers and drop the ciphers"""
+        _zero(self._master)
+        self._zero_keys()
+        self._fernets = None
+        self._fernet = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.lock()
+
+
+def _zero(buffer: bytearray):
+    for i in range(len(buffer)):
+        buffer[i] = 0
+
+
+def rotate_token(token: str, new_session: KeySession, old_session: KeySession = None) -> str:
+    """Re-encrypt a token under new_session's current key.
+
+    Any key of either session can decrypt it, so tokens that were already
+    rotated are accepted too.
+    """
+    fernets = new_session.fernets + (old_session.fernets if old_session is not None else [])
+    return MultiFernet(fernets).rotate(token.encode()).decode()
+
+def key_index(token: str, session: KeySession) -> int:
+    """Position in session.fernets of the key that decrypts token, None if none does"""
+    data = token.encode()
+    for i, fernet in enumerate(session.fernets):
+        try:
+            fernet.decrypt(data)
+        except InvalidToken:
+            continue
+        return i
+    return None
+
+
+def encrypt_pass(norm_pass: str, session: KeySession) -> str:
+    encrypted = session.fernet.encrypt(norm_pass.encode())
     return encrypted.decode() #to store in json
 
-def decrypt_pass(enc_pass: str, master_pass: str) -> str:
-    key = generatekey(master_pass)
-    fernet = Fernet(key)
+def decrypt_pass(enc_pass: str, session: KeySession) -> str:
     try:
-        decrypted = fernet.decrypt(enc_pass.encode())
+        decrypted = session.fernet.decrypt(enc_pass.encode())
     except Exception as e:
         print(f"Error decrypting password: {e}")
         return
@@ -48,10 +298,9 @@ def decrypt_pass(enc_pass: str, master_pass: str) -> str:
 
 
 def generate_password(length: int=16, use_symbols: bool=True) -> str:
-    """Generate a random password with the length given by the user"""
-    alphabet = string.ascii_lowercase + string.ascii_uppercase + string.digits
-    if use_symbols:
-        alphabet += string.punctuation
+    """Generate a random password with the length given by the user, every character class included"""
+    from password_generator import random_password
 
-    password = ''.join(secrets.choice(alphabet) for i in range(length))
-    return password
+    classes = ('lower', 'upper', 'digit', 'symbol') if use_symbols else ('lower', 'upper', 'digit')
+    # very short passwords can't fit every class, only ask for what fits
+    return random_password(length, classes, required=classes[:length])
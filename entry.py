@@ -0,0 +1,139 @@
+"""
+    Compact in-memory entry record.
+
+    Vaults with many entries used to keep one dict per entry, holding the
+    Fernet token as a base64 string. An Entry uses __slots__, keeps the token
+    as raw bytes (a quarter smaller than its base64 form) and only decodes it
+    when the password is actually needed. Listing and search read the
+    metadata slots and never touch the ciphertext.
+
+    Entries still behave like the old dicts (entry['service'], entry.get(...))
+    so ui.py and the search index keep working unchanged.
+"""
+
+import sys
+import base64
+
+METADATA_FIELDS = ('id', 'service', 'username', 'created', 'strength')
+
+
+class Entry:
+    __slots__ = ('id', 'service', 'username', 'created', 'strength', '_token', 'extra')
+
+    def __init__(self, id: int = None, service: str = '', username: str = '', password: str = None,
+                 created: str = '', strength: str = 'unknown', extra: dict = None):
+        self.id = id
+        self.service = service
+        self.username = username
+        # few distinct dates and ratings, share the strings across entries
+        self.created = sys.intern(created) if created else created
+        self.strength = sys.intern(strength) if strength else strength
+        self._token = None
+        self.extra = extra or None
+        if password is not None:
+            self.password = password
+
+    @classmethod
+    def from_dict(cls, data: dict) -> 'Entry':
+        if isinstance(data, Entry):
+            return data
+        extra = {k: v for k, v in data.items() if k not in METADATA_FIELDS and k != 'password'}
+        return cls(data.get('id'), data.get('service', ''), data.get('username', ''), data.get('password'),
+                   data.get('created', ''), data.get('strength', 'unknown'), extra)
+
+    @classmethod
+    def from_record(cls, id: int, service: str, username: str, created: str, strength: str,
+                    token, extra: dict = None) -> 'Entry':
+        """Build from already decoded fields, token as raw bytes (the binary vault's layout)"""
+        entry = cls.__new__(cls)
+        entry.id = id
+        entry.service = service
+        entry.username = username
+        entry.created = sys.intern(created) if created else created
+        entry.strength = sys.intern(strength) if strength else strength
+        entry._token = token
+        entry.extra = extra or None
+        return entry
+
+    def to_dict(self) -> dict:
+        data = {field: getattr(self, field) for field in METADATA_FIELDS}
+        data['password'] = self.password
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def metadata(self) -> dict:
+        return {field: getattr(self, field) for field in METADATA_FIELDS}
+
+    @property
+    def password(self) -> str:
+        """The Fernet token as stored on disk (still encrypted)"""
+        if isinstance(self._token, bytes):
+            return base64.urlsafe_b64encode(self._token).decode()
+        return self._token
+
+    @password.setter
+    def password(self, token: str):
+        try:
+            raw = base64.urlsafe_b64decode(token) if token is not None else None
+        except (ValueError, TypeError):
+            raw = None
+        # anything that doesn't round-trip exactly is kept as-is, decrypt will report it
+        if raw is not None and base64.urlsafe_b64encode(raw).decode() == token:
+            self._token = raw
+        else:
+            self._token = token
+
+    @property
+    def token(self) -> bytes:
+        """Raw Fernet token bytes"""
+        return self._token
+
+    def decrypt(self, session) -> str:
+        """Decrypt the password, returns None if it can't be decrypted"""
+        from crypto import decrypt_pass
+        return decrypt_pass(self.password, session)
+
+    """     DICT COMPATIBILITY BELOW       """
+    def __getitem__(self, key: str):
+        if key in METADATA_FIELDS or key == 'password':
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key: str, value):
+        if key in METADATA_FIELDS or key == 'password':
+            setattr(self, key, value)
+        else:
+            self.extra = self.extra or {}
+            self.extra[key] = value
+
+    def __contains__(self, key: str) -> bool:
+        return key in METADATA_FIELDS or key == 'password' or bool(self.extra and key in self.extra)
+
+    def get(self, key: str, default=None):
+        try:
+            value = self[key]
+        except KeyError:
+            return default
+        return default if value is None else value
+
+    def pop(self, key: str, *default):
+        """Remove an extra field (the fixed fields can't be removed)"""
+        if self.extra and key in self.extra:
+            value = self.extra.pop(key)
+            self.extra = self.extra or None
+            return value
+        if default and key not in METADATA_FIELDS and key != 'password':
+            return default[0]
+        raise KeyError(key)
+
+    def keys(self):
+        return list(METADATA_FIELDS) + ['password'] + list(self.extra or ())
+
+    def items(self):
+        return self.to_dict().items()
+
+    def __repr__(self):
+        return f"Entry(id={self.id!r}, service={self.service!r}, username={self.username!r})"
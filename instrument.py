@@ -0,0 +1,239 @@
+"""
+    Opt-in timing for menu actions and CLI commands.
+
+        PM_PROFILE=1 python main.py          (or: python main.py --profile)
+        PM_PROFILE=1 PM_PROFILE_DIR=prof python main.py list
+
+    install() wraps the crypto, storage, analyzer and ui entry points listed
+    in HOOKS with a timer and a call counter. Storage hooks also record the
+    bytes read and written (from /proc/self/io, Linux only). After every
+    action a breakdown is printed to stderr, so a slow action shows whether
+    the KDF, JSON I/O, the analyzer or rich is to blame.
+
+    With PM_PROFILE_DIR set, each action also runs under cProfile and leaves
+    NNN-action.prof (pstats/snakeviz) and NNN-action.folded (collapsed hook
+    stacks for flamegraph.pl or speedscope) in that directory.
+
+    Nothing is wrapped unless profiling is switched on, so the normal cost is
+    zero.
+"""
+
+import os
+import sys
+import time
+import threading
+import functools
+from contextlib import contextmanager
+
+PROFILE_ENV = 'PM_PROFILE'
+PROFILE_DIR_ENV = 'PM_PROFILE_DIR'
+
+# module: functions or Class.method names to wrap
+HOOKS = {
+    'crypto': ('derive_key', 'encrypt_pass', 'decrypt_pass', 'rotate_token'),
+    'storage': ('load_config', 'save_config', 'atomic_write',
+                'JSONStorage.snapshot', 'JSONStorage.load_all', 'JSONStorage.replace_all',
+                'JSONStorage.apply', 'JSONStorage.checkpoint',
+                'SQLiteStorage.snapshot', 'SQLiteStorage.load_all', 'SQLiteStorage.replace_all',
+                'SQLiteStorage.apply'),
+    'attachments': ('encrypt_stream', 'decrypt_stream'),
+    'password_analyzer': ('analyze_password', 'is_password_common', 'get_common_index', 'score_many'),
+    'strength_estimator': ('estimate_guesses',),
+    'ui': ('display_password_list', 'ListView.render', 'display_password_info',
+           'display_strength_bar', 'display_feedback', 'display_main_menu'),
+}
+IO_MODULES = ('storage', 'attachments')  # hooks that also record bytes read/written
+
+_installed = False
+_local = threading.local()
+_sequence = 0
+
+
+def enabled() -> bool:
+    return os.environ.get(PROFILE_ENV, '') not in ('', '0')
+
+
+def _io_counters():
+    """(bytes read, bytes written) by this process so far, None off Linux"""
+    try:
+        with open('/proc/self/io', 'rb') as f:
+            fields = dict(line.split(b':') for line in f.read().splitlines())
+        return int(fields[b'rchar']), int(fields[b'wchar'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+class Frame:
+    """One open hook or action on the call stack"""
+    __slots__ = ('label', 'start', 'child')
+
+    def __init__(self, label: str):
+        self.label = label
+        self.start = time.perf_counter()
+        self.child = 0.0
+
+
+class Action:
+    """Counters for one menu action or CLI command"""
+
+    def __init__(self, name: str):
+        self.name = name
+        self.stats = {}    # label -> [calls, seconds, bytes read, bytes written]
+        self.folded = {}   # 'action;hook;hook' -> self time in microseconds
+        self.stack = [Frame(name)]
+        self.elapsed = 0.0
+
+    def record(self, frame: Frame, elapsed: float, io=None):
+        stat = self.stats.setdefault(frame.label, [0, 0.0, 0, 0])
+        stat[0] += 1
+        stat[1] += elapsed
+        if io:
+            stat[2] += io[0]
+            stat[3] += io[1]
+        path = ';'.join(f.label for f in self.stack)
+        self.folded[path] = self.folded.get(path, 0) + int((elapsed - frame.child) * 1e6)
+
+    def report(self) -> str:
+        total = self.elapsed or 1e-9
+        lines = [f"[profile] {self.name}: {self.elapsed * 1000:.1f} ms"]
+        for label, (calls, seconds, read, written) in sorted(self.stats.items(), key=lambda kv: -kv[1][1]):
+            io = f"  read {_size(read)} written {_size(written)}" if read or written else ''
+            lines.append(f"  {label:<34} {calls:>7} calls {seconds * 1000:10.2f} ms "
+                         f"{seconds / total * 100:5.1f}%{io}")
+        # time not spent under any hook: our own code, and waiting for input
+        other = max(self.elapsed - self.stack[0].child, 0.0)
+        lines.append(f"  {'other (incl. waiting for input)':<34} {'':>13} {other * 1000:10.2f} ms "
+                     f"{other / total * 100:5.1f}%")
+        return '\n'.join(lines)
+
+
+def _size(n: int) -> str:
+    for unit in ('B', 'KB', 'MB'):
+        if n < 1024:
+            return f"{n:.0f} {unit}"
+        n /= 1024
+    return f"{n:.1f} GB"
+
+
+def _current() -> Action:
+    action = getattr(_local, 'action', None)
+    if action is None:
+        # calls outside any action (startup, drawing the menu) get their own bucket
+        action = _local.action = Action('outside actions')
+        _local.implicit = True
+    return action
+
+
+def _wrap(label: str, func, track_io: bool):
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        action = _current()
+        frame = Frame(label)
+        action.stack.append(frame)
+        before = _io_counters() if track_io else None
+        try:
+            return func(*args, **kwargs)
+        finally:
+            elapsed = time.perf_counter() - frame.start
+            io = None
+            if before is not None:
+                after = _io_counters()
+                io = (after[0] - before[0], after[1] - before[1])
+            action.record(frame, elapsed, io)
+            action.stack.pop()
+            action.stack[-1].child += elapsed
+    wrapper.__wrapped_by_instrument__ = True
+    return wrapper
+
+
+def install():
+    """Wrap every hook, including names other modules already imported with from-imports"""
+    global _installed
+    if _installed:
+        return
+    _installed = True
+    import importlib
+
+    replaced = {}
+    for module_name, names in HOOKS.items():
+        module = importlib.import_module(module_name)
+        for name in names:
+            owner, _, attr = name.rpartition('.')
+            target = getattr(module, owner) if owner else module
+            func = getattr(target, attr, None)
+            if func is None or getattr(func, '__wrapped_by_instrument__', False):
+                continue
+            wrapper = _wrap(f"{module_name}.{name}", func, module_name in IO_MODULES)
+            setattr(target, attr, wrapper)
+            if not owner:
+                replaced[id(func)] = (func, wrapper)
+
+    # main.py does "from crypto import encrypt_pass", rebind those copies too
+    for module in list(sys.modules.values()):
+        namespace = getattr(module, '__dict__', None)
+        if not namespace:
+            continue
+        for key, value in list(namespace.items()):
+            hit = replaced.get(id(value))
+            if hit is not None and hit[0] is value:
+                namespace[key] = hit[1]
+    _local.action = None
+
+
+def install_from_env() -> bool:
+    if enabled():
+        install()
+    return _installed
+
+
+@contextmanager
+def action(name: str):
+    """Time everything under one menu action / command and print the breakdown"""
+    nested = getattr(_local, 'action', None) is not None and not getattr(_local, 'implicit', False)
+    if not _installed or nested:
+        yield
+        return
+    _flush_implicit()
+    global _sequence
+    _sequence += 1
+    current = _local.action = Action(name)
+    _local.implicit = False
+    profile_dir = os.environ.get(PROFILE_DIR_ENV)
+    profiler = None
+    if profile_dir:
+        import cProfile
+        profiler = cProfile.Profile()
+        profiler.enable()
+    try:
+        yield current
+    finally:
+        if profiler is not None:
+            profiler.disable()
+        current.elapsed = time.perf_counter() - current.stack[0].start
+        root = current.stack[0]
+        current.folded[root.label] = current.folded.get(root.label, 0) + \
+            int((current.elapsed - root.child) * 1e6)
+        _local.action = None
+        print(current.report(), file=sys.stderr)
+        if profile_dir:
+            _dump(current, profiler, profile_dir)
+
+
+def _flush_implicit():
+    """Print what ran outside any action before the next action starts"""
+    pending = getattr(_local, 'action', None)
+    if pending is not None and getattr(_local, 'implicit', False) and pending.stats:
+        pending.elapsed = time.perf_counter() - pending.stack[0].start
+        print(pending.report(), file=sys.stderr)
+    _local.action = None
+
+
+def _dump(current: Action, profiler, directory: str):
+    os.makedirs(directory, exist_ok=True)
+    stem = os.path.join(directory, f"{_sequence:03d}-{''.join(c if c.isalnum() else '_' for c in current.name)}")
+    profiler.dump_stats(stem + '.prof')
+    with open(stem + '.folded', 'w') as f:
+        for path, micros in sorted(current.folded.items()):
+            if micros > 0:
+                f.write(f"{path} {micros}\n")
+    print(f"[profile] wrote {stem}.prof and {stem}.folded", file=sys.stderr)
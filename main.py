@@ -1,7 +1,23 @@
+import os
+import sys
+
+if __name__ == "__main__" and sys.argv[1:] == ['--profile']:
+    # no subcommand: profile the interactive menu (cli.py handles --profile otherwise)
+    sys.argv.pop()
+    os.environ['PM_PROFILE'] = os.environ.get('PM_PROFILE') or '1'
+
+if __name__ == "__main__" and len(sys.argv) > 1:
+    # subcommands go straight to the CLI without importing rich/pyperclip/ui
+    from cli import run
+    sys.exit(run(sys.argv[1:]))
+
 import getpass
 from datetime import datetime
-from crypto import hash_password, verify_master_password, encrypt_pass, decrypt_pass, generate_password
-from storage import save_master_password_hash, load_master_password_hash, load_entries, save_entries
+from crypto import KeySession, encrypt_pass, decrypt_pass, generate_password, derive_key, check_verifier
+from storage import has_master_password, load_config, VaultConflictError
+from entry import Entry
+from vault import (Vault, init_master_password, open_session, change_master_password,
+                   reencrypt_in_background)
 from password_analyzer import calculate_strength, display_strength_analysis, get_feedback
 from ui import (
     console, 
@@ -9,13 +25,16 @@ from ui import (
     print_success, 
     print_error, 
     print_warning,
-    display_password_list,
+    browse_entries,
     display_password_info,
     display_strength_bar,
     display_feedback,
     display_main_menu
 )
 import pyperclip
+import instrument
+
+instrument.install_from_env()
 
 
 def setup_master_password():
@@ -31,8 +50,7 @@ def setup_master_password():
             if len(input_password) < 8:
                 print_error("Password must be at least 8 characters")
                 continue
-            hashed_input = hash_password(input_password)
-            save_master_password_hash(hashed_input)
+            init_master_password(input_password).lock()
             print_success("Master password created successfully")
             return True
         else:
@@ -40,16 +58,16 @@ def setup_master_password():
 
 
 def login():
-    stored_hash = load_master_password_hash()
     att = 4
 
     while att > 0:
         print_header("LOGIN")
         password = getpass.getpass("Enter master password:  ")
 
-        if verify_master_password(password, stored_hash):
+        session = open_session(password)
+        if session is not None:
             print_success("Access Granted!")
-            return password
+            return session
         else:
             att -= 1
             if att > 0:
@@ -81,33 +99,30 @@ def generate_password_menu():
 
 
 
-def search_for_service(master_pass):
-    entries = load_entries()
-
+def search_for_service(session: KeySession, vault: Vault):
     print_header("SEARCH FOR PASSWORD")
 
-    search_term = input("Enter a service name (E.G., git, youtube, gmail):  ").strip().lower()
-    matches = []
+    search_term = input("Enter a service or username (E.G., git, youtube, gmail):  ").strip()
+    matches = vault.search(search_term)
 
-    for entry in entries:
-        if search_term in entry['service'].strip().lower():
-            matches.append(entry)
-    
-    for i, entry in enumerate(matches, 1):
-        print(f"{i}. {entry['service']} ({entry['username']})")
+    if not matches:
+        print_warning("No matching entries")
+        return
+
+    for entry in matches:
+        print(f"#{entry['id']}. {entry['service']} ({entry['username']})")
     
     try:
-        choice = int(input("\nEnter your choice here: "))
+        choice = int(input("\nEnter the id here: "))
     except ValueError:
         print_error("Please enter a valid number")
         return
 
-    if choice < 1 or choice > len(matches):
+    selected = vault.get(choice)
+    if selected is None or selected not in matches:
         print_error("Invalid choice")
         return
-
-    selected = matches[choice-1]
-    decrypted_pass = decrypt_pass(selected['password'], master_pass)
+    decrypted_pass = decrypt_pass(selected['password'], session)
 
     result = calculate_strength(decrypted_pass)
     display_password_info(selected, decrypted_pass, result)
@@ -125,7 +140,7 @@ def search_for_service(master_pass):
 
 
 
-def add_password(master_pass: str):
+def add_password(session: KeySession, vault: Vault):
     print_header("ADD NEW PASSWORD")
     site = input("Service name (e.g., YouTube, Gmail, GitHub):  ").strip()
     username = input("Enter username/email: ").strip()
@@ -178,13 +193,9 @@ def add_password(master_pass: str):
         print_error("All fields must be completed")
         return
     
-    encrypted_password = encrypt_pass(password, master_pass)
-
-    entries = load_entries()
-    next_id_num = len(entries)+1
+    encrypted_password = encrypt_pass(password, session)
 
     new_entry = {
-        'id': next_id_num,
         'service': site,
         'username': username,
         'password': encrypted_password,
@@ -192,12 +203,12 @@ def add_password(master_pass: str):
         'strength': result['rating']
     }
 
-    entries.append(new_entry)
-    save_entries(entries)
+    vault.add(new_entry)
+    vault.flush()
     print_success(f"Password added for '{site}' successfully")
 
-def get_password(master_pass: str):
-    entries = load_entries()
+def get_password(session: KeySession, vault: Vault):
+    entries = vault.entries()
 
     if len(entries) < 1:
         print_warning("No entries available")
@@ -207,23 +218,13 @@ def get_password(master_pass: str):
     view_type = console.input("[cyan]Search(1) or list all services(2)?[/cyan] ").strip()
 
     if view_type == "1":
-        search_for_service(master_pass)
+        search_for_service(session, vault)
         return
 
-    display_password_list(entries)
-
-    try:
-        choice = int(console.input("\n[cyan]Enter your choice:[/cyan] "))
-    except ValueError:
-        print_error("Please enter a valid number")
+    selected = browse_entries(entries, vault.index.prefix)
+    if selected is None:
         return
-
-    if choice < 1 or choice > len(entries):
-        print_error("Invalid choice")
-        return
-
-    selected = entries[choice-1]
-    decrypted_pass = decrypt_pass(selected['password'], master_pass)
+    decrypted_pass = decrypt_pass(selected['password'], session)
 
     result = calculate_strength(decrypted_pass)
     display_password_info(selected, decrypted_pass, result)
@@ -239,57 +240,38 @@ def get_password(master_pass: str):
     pyperclip.copy(decrypted_pass)
     print_success("Password copied to clipboard!")
 
-def delete_password():
-    entries = load_entries()
+def delete_password(vault: Vault):
+    entries = vault.entries()
 
     if len(entries) < 1:
         print_warning("No entries available")
         return
     
     print_header("DELETE PASSWORD")
-    display_password_list(entries)
-
-    try:
-        choice = int(input("\nEnter your choice here: "))
-    except ValueError:
-        print_error("Please enter a valid number")
+    selected = browse_entries(entries, vault.index.prefix)
+    if selected is None:
         return
-
-    if choice < 1 or choice > len(entries):
-        print_error("Invalid choice")
-        return
-
-    service_name = entries[choice-1]['service']
+    service_name = selected['service']
     confirm = console.input("[cyan]CONFIRM DELETE (y/n):[/cyan] ").lower()
 
     if confirm == "y":
-        del entries[choice-1]
-        save_entries(entries)
+        vault.delete(selected['id'])
+        vault.flush()
         print_success(f"Password for '{service_name}' deleted successfully!")
 
-def update_password(master_pass: str):
+def update_password(session: KeySession, vault: Vault):
     """Updates password"""
-    entries = load_entries()
+    entries = vault.entries()
 
     if len(entries) < 1:
         print_warning("No entries available")
         return
     
     print_header("UPDATE PASSWORD")
-    display_password_list(entries)
-
-    try:
-        choice = int(input("\nEnter your choice here: "))
-    except ValueError:
-        print_error("Please enter a valid number")
-        return
-
-    if choice < 1 or choice > len(entries):
-        print_error("Invalid choice")
+    selected = browse_entries(entries, vault.index.prefix)
+    if selected is None:
         return
-
-    selected = entries[choice-1]
-    decrypted_pass = decrypt_pass(selected['password'], master_pass)
+    decrypted_pass = decrypt_pass(selected['password'], session)
 
     result = calculate_strength(decrypted_pass)
     display_password_info(selected, decrypted_pass, result)
@@ -310,7 +292,7 @@ def update_password(master_pass: str):
         if not password:
             print_error("Password cannot be empty")
             return
-        new_password = encrypt_pass(password, master_pass)
+        new_password = encrypt_pass(password, session)
         strength_result = calculate_strength(password)
         new_strength = strength_result['rating']
         
@@ -330,7 +312,7 @@ def update_password(master_pass: str):
             print_error("Fields cannot be empty")
             return
         new_username = username
-        new_password = encrypt_pass(password, master_pass)
+        new_password = encrypt_pass(password, session)
         strength_result = calculate_strength(password)
         new_strength = strength_result['rating']
         
@@ -338,17 +320,14 @@ def update_password(master_pass: str):
         print_error("Invalid choice")
         return
 
-    # Update the entry
-    entries[choice - 1] = {
-        'id': selected['id'],
-        'service': selected['service'],
-        'username': new_username,
-        'password': new_password,
-        'created': selected['created'],
-        'strength': new_strength
-    }
+    # Update a copy of the entry, so attachments and other extra fields come along
+    updated = Entry.from_dict(selected.to_dict())
+    updated['username'] = new_username
+    updated['password'] = new_password
+    updated['strength'] = new_strength
 
-    save_entries(entries)
+    vault.update(updated)
+    vault.flush()
     print_success(f"Password for '{selected['service']}' updated successfully!")
 
 
@@ -367,44 +346,112 @@ def analyze_password_standalone():
 
 
 
-def main_menu(master_pass: str):
+def change_master_password_menu(session: KeySession, background):
+    print_header("CHANGE MASTER PASSWORD")
+    current = getpass.getpass("Current master password:  ")
+    if not check_verifier(derive_key(current, session.kdf), load_config().get('verifier', '')):
+        print_error("Incorrect password")
+        return
+    new_password = getpass.getpass("New master password:  ")
+    if new_password != getpass.getpass("Confirm new master password:  "):
+        print_error("Passwords don't match")
+        return
+    if len(new_password) < 8:
+        print_error("Password must be at least 8 characters")
+        return
+
+    # the re-encryption pass has to finish first, don't run it twice
+    background.stop()
+    try:
+        change_master_password(session, new_password)
+    except ValueError as e:
+        print_error(str(e))
+        return
+    print_success("Master password changed")
+
+
+class BackgroundReencrypt:
+    """Finishes an interrupted data key rotation while the menu is in use"""
+
+    def __init__(self, session: KeySession):
+        self.thread = self.event = None
+        if load_config().get('reencrypt_pending'):
+            self.thread, self.event = reencrypt_in_background(session)
+
+    def stop(self):
+        if self.thread is not None:
+            self.event.set()
+            self.thread.join()
+            self.thread = None
+
+
+def main_menu(session: KeySession):
+    try:
+        with instrument.action("open vault"):
+            vault = Vault(session=session)
+    except ValueError as e:
+        print_error(f"Could not open vault: {e}")
+        return
+    background = BackgroundReencrypt(session)
+    try:
+        run_menu(session, vault, background)
+    finally:
+        background.stop()
+        vault.close()
+
+
+MENU_ACTIONS = {"1": "add", "2": "get", "3": "update", "4": "delete", "5": "analyze",
+                "6": "change master password", "7": "exit"}
+
+def run_menu(session: KeySession, vault: Vault, background):
     running = True
     while running:
         display_main_menu()
         
         choice = console.input("\n[bold cyan]Enter choice:[/bold cyan] ").strip()
 
-        if choice == "1":
-            add_password(master_pass)
-        elif choice == "2":
-            get_password(master_pass)
-        elif choice == "3":
-            update_password(master_pass)
-        elif choice == "4":
-            delete_password()
-        elif choice == "5":
-            analyze_password_standalone()
-        elif choice == "6":
-            print_success("Goodbye! 👋")
-            running = False
-        else:
-            print_error("Invalid choice - please enter 1-6")
+        try:
+            with instrument.action(MENU_ACTIONS.get(choice, "invalid choice")):
+                # pick up changes made by another instance since the last action
+                vault.refresh()
+
+                if choice == "1":
+                    add_password(session, vault)
+                elif choice == "2":
+                    get_password(session, vault)
+                elif choice == "3":
+                    update_password(session, vault)
+                elif choice == "4":
+                    delete_password(vault)
+                elif choice == "5":
+                    analyze_password_standalone()
+                elif choice == "6":
+                    change_master_password_menu(session, background)
+                elif choice == "7":
+                    print_success("Goodbye! 👋")
+                    running = False
+                else:
+                    print_error("Invalid choice - please enter 1-7")
+        except VaultConflictError as e:
+            # another instance changed the same entry, start over from what's on disk
+            print_error(str(e))
+            vault.reload()
 
 
 def main():
     console.print("\n[bold cyan]🔐 PASSWORD MANAGER[/bold cyan]\n", justify="center")
 
-    stored_hash = load_master_password_hash()
-
-    if not stored_hash:
+    if not has_master_password():
         setup_master_password()
-        master_pass = login()
-    else:
-        master_pass = login()
+    with instrument.action("login"):
+        session = login()
 
     print_success("Welcome to your Password Manager!")
 
-    main_menu(master_pass)
+    try:
+        main_menu(session)
+    finally:
+        session.lock()
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
@@ -1,47 +1,131 @@
-import re
+import os
+import sys
+import string
+import hashlib
+from array import array
+from bisect import bisect_left
 
-def calculate_strength(password: str) -> dict:
+from strength_estimator import estimate_guesses, lower_same_length
+
+COMMON_PASSWORDS_FILE = 'common_passwords.txt'
+COMMON_INDEX_FILE = 'common_passwords.idx'
+INDEX_MAGIC = b'PMCI\x02'
+INDEX_MAGIC_V1 = b'PMCI\x01'  # fingerprints only, still readable
+RANKED_WORD_LENGTH = 32  # the strength estimator skips longer entries
+LOOKUP_CACHE_SIZE = 50_000
+BREACH_CORPUS_FILE = os.environ.get('PM_BREACH_CORPUS', 'breach_corpus.bin')
+
+_common_index = None
+_breach_corpus = None
+
+LOWER, UPPER, DIGIT, SYMBOL = 1, 2, 4, 8
+
+# character -> class bit, built once instead of four regex scans per call
+CHAR_CLASSES = {}
+for _chars, _bit in ((string.ascii_lowercase, LOWER), (string.ascii_uppercase, UPPER),
+                     (string.digits, DIGIT), ('!@#$%^&*(),.?":{}|<>', SYMBOL)):
+    for _ch in _chars:
+        CHAR_CLASSES[_ch] = _bit
+
+SEQUENCES = [
+    'qwertyuiop',
+    'asdfghjkl',
+    'zxcvbnm',
+    'abcdefghijklmnopqrstuvwxyz',
+    '1234567890'
+]
+
+# every 3-char window of every sequence, forwards and backwards ("abc", "cba", "321")
+SEQ_TRIGRAMS = frozenset(
+    window
+    for seq in SEQUENCES
+    for i in range(len(seq) - 2)
+    for window in (seq[i:i+3], seq[i:i+3][::-1])
+)
+
+LENGTH_POINTS = ((16, 40), (12, 30), (8, 20), (0, 10))
+CLASS_POINTS = 15
+SEQ_PENALTY = 20
+
+# guess estimate that earns full marks (1e14 guesses), the score is capped by it
+FULL_MARKS_LOG10 = 14
+
+PATTERN_FEEDBACK = {
+    'dictionary': "!  Avoid common words and passwords ({})",
+    'reversed': "!  Reversed words are easy to guess ({})",
+    'l33t': "!  Swapping letters for symbols doesn't hide a common word ({})",
+    'spatial': "!  Avoid keyboard patterns ({})",
+    'repeat': "!  Avoid repeated characters or words ({})",
+    'date': "!  Avoid dates ({})",
+    'year': "!  Avoid years ({})",
+}
+
+CLASS_FEEDBACK = (
+    (LOWER, "+  Add lowercase letters (a-z)"),
+    (UPPER, "+  Add uppercase letters (A-Z)"),
+    (DIGIT, "+  Add numbers (0-9)"),
+    (SYMBOL, "+  Add special symbols (!@#$%^&*)"),
+)
+
+
+def scan_password(password: str):
+    """One pass over the password: (class bitmask, has sequential chars)"""
+    classes = 0
     has_seq = False
-    score = 0
+    lowered = lower_same_length(password)
+    for i, ch in enumerate(password):
+        classes |= CHAR_CLASSES.get(ch, 0)
+        if not has_seq and i >= 2 and lowered[i-2:i+1] in SEQ_TRIGRAMS:
+            has_seq = True
+    return classes, has_seq
+
+
+def analyze_password(password: str) -> dict:
+    """Score, rating and feedback in one go"""
     if is_password_common(password):
+        estimate = estimate_guesses(password)
         return {
-        'score': 0,
-        'rating': 'very weak',
-        'is_common': True,
-        'has_seq': False
+            'score': 0,
+            'rating': 'very weak',
+            'is_common': True,
+            'has_seq': False,
+            'guesses': estimate['guesses'],
+            'guesses_log10': estimate['guesses_log10'],
+            'feedback': ["This is a commonly used password - choose something unique"]
         }
-        
-
-
-    
 
+    classes, has_seq = scan_password(password)
     length = len(password)
-    if length >= 16:
-        score += 40
-    elif length >= 12:
-        score += 30
-    elif length >= 8:
-        score += 20
-    else:
-        score+= 10
+    feedback = []
 
-    if has_seq_chars:
-        has_seq = True
-        score -= 20
+    score = next(points for min_length, points in LENGTH_POINTS if length >= min_length)
+    if has_seq:
+        score = max(0, score - SEQ_PENALTY)
 
+    if length < 8:
+        feedback.append("!  Password is too short - use at least 8 characters (12+ recommended)")
+    elif length < 12:
+        feedback.append("!  Consider making it longer (12+ characters is better)")
 
-    score = max(0, score)
+    for bit, message in CLASS_FEEDBACK:
+        if classes & bit:
+            score += CLASS_POINTS
+        else:
+            feedback.append(message)
 
+    if has_seq:
+        feedback.append("!  Avoid sequential characters (abc, 123, qwerty)")
+
+    estimate = estimate_guesses(password)
+    estimate_score = min(100, int(estimate['guesses_log10'] * 100 / FULL_MARKS_LOG10))
+    if estimate_score < score:
+        score = estimate_score
+        for match in estimate['sequence']:
+            if match.pattern in PATTERN_FEEDBACK:
+                feedback.append(PATTERN_FEEDBACK[match.pattern].format(match.token))
+    if not feedback:
+        feedback.append("✓ Strong password! No improvements needed.")
 
-    if re.search(r'[a-z]', password):  # Has lowercase
-        score += 15
-    if re.search(r'[A-Z]', password):  # Has uppercase
-        score += 15
-    if re.search(r'[0-9]', password):  # Has numbers
-        score += 15
-    if re.search(r'[!@#$%^&*(),.?":{}|<>]', password):  # Has symbols
-        score += 15
-    
     # Determine rating based on score
     if score >= 80:
         rating = 'very strong'
@@ -51,93 +135,278 @@ def calculate_strength(password: str) -> dict:
         rating = 'medium'
     else:
         rating = 'weak'
-    
+
     return {
         'score': score,
         'rating': rating,
         'is_common': False,
-        'has_seq': has_seq
+        'has_seq': has_seq,
+        'guesses': estimate['guesses'],
+        'guesses_log10': estimate['guesses_log10'],
+        'feedback': feedback
     }
 
+def calculate_strength(password: str) -> dict:
+    return analyze_password(password)
+
 def load_common_passwords() -> set:
     try:
-        with open('common_passwords.txt', 'r') as f:
+        with open(COMMON_PASSWORDS_FILE, 'r') as f:
             passwords = {line.strip().lower() for line in f if line.strip()}
             return passwords
     except FileNotFoundError:
         print("File not found")
         return set()
-    
+
+
+def password_fingerprint(password: str) -> int:
+    """64-bit hash of a lowercased password, used by the precompiled index"""
+    digest = hashlib.blake2b(password.lower().encode(), digest_size=8).digest()
+    return int.from_bytes(digest, 'little')
+
+
+class SortedHashIndex:
+    """Sorted array of password fingerprints, searched with bisect.
+
+    Version 2 files also carry a table for the strength estimator: every
+    wordlist entry up to RANKED_WORD_LENGTH chars and each of its prefixes,
+    sorted by fingerprint, with the entry's rank in the list (0 for a prefix
+    that isn't an entry itself).
+    """
+
+    def __init__(self, fingerprints: array, ranked: array = None, ranks: array = None):
+        self.fingerprints = fingerprints
+        self.ranked = ranked
+        self.ranks = ranks
+        self._lookups = {}  # the estimator asks for the same short prefixes over and over
+
+    def __contains__(self, password: str) -> bool:
+        fp = password_fingerprint(password)
+        i = bisect_left(self.fingerprints, fp)
+        return i < len(self.fingerprints) and self.fingerprints[i] == fp
+
+    def __len__(self):
+        return len(self.fingerprints)
+
+    def lookup(self, piece: str):
+        """Rank of a lowercase word, 0 if it's only the start of one, None if no entry starts that way"""
+        try:
+            return self._lookups[piece]
+        except KeyError:
+            pass
+        fp = password_fingerprint(piece)
+        i = bisect_left(self.ranked, fp)
+        rank = self.ranks[i] if i < len(self.ranked) and self.ranked[i] == fp else None
+        if len(self._lookups) >= LOOKUP_CACHE_SIZE:
+            self._lookups.clear()
+        self._lookups[piece] = rank
+        return rank
+
+    @classmethod
+    def load(cls, path: str = COMMON_INDEX_FILE) -> 'SortedHashIndex':
+        with open(path, 'rb') as f:
+            magic = f.read(len(INDEX_MAGIC))
+            if magic not in (INDEX_MAGIC, INDEX_MAGIC_V1):
+                raise ValueError(f"{path} is not a common password index")
+            fingerprints = _read_array(f, 'Q')
+            ranked = ranks = None
+            if magic == INDEX_MAGIC:
+                ranked = _read_array(f, 'Q')
+                ranks = _read_array(f, 'I')
+        return cls(fingerprints, ranked, ranks)
+
+
+def _read_array(f, typecode: str) -> array:
+    count = int.from_bytes(f.read(8), 'little')
+    values = array(typecode)
+    values.fromfile(f, count)
+    if sys.byteorder != 'little':
+        values.byteswap()
+    return values
+
+def _write_array(f, values: array):
+    if sys.byteorder != 'little':
+        values.byteswap()
+    f.write(len(values).to_bytes(8, 'little'))
+    values.tofile(f)
+
+
+def build_common_index(src: str = COMMON_PASSWORDS_FILE, dest: str = COMMON_INDEX_FILE) -> int:
+    """Precompile a wordlist into a sorted fingerprint file so startup is a single read"""
+    words = {}
+    with open(src, 'r', encoding='utf-8', errors='replace') as f:
+        for line in f:
+            word = line.strip().lower()
+            if word and word not in words:
+                words[word] = len(words) + 1
+    table = {}
+    for word, rank in words.items():
+        if len(word) > RANKED_WORD_LENGTH:
+            continue
+        for k in range(1, len(word)):
+            table.setdefault(password_fingerprint(word[:k]), 0)
+        fp = password_fingerprint(word)
+        if not table.get(fp):
+            table[fp] = rank
+    fingerprints = array('Q', sorted({password_fingerprint(word) for word in words}))
+    ranked = sorted(table)
+    with open(dest, 'wb') as f:
+        f.write(INDEX_MAGIC)
+        _write_array(f, fingerprints)
+        _write_array(f, array('Q', ranked))
+        _write_array(f, array('I', (table[fp] for fp in ranked)))
+    return len(fingerprints)
+
+
+def get_common_index():
+    """Build the common password lookup once per process.
+
+    Uses the precompiled index when it is at least as new as the wordlist,
+    otherwise falls back to a set built from the text file.
+    """
+    global _common_index
+    if _common_index is not None:
+        return _common_index
+    try:
+        if os.path.getmtime(COMMON_INDEX_FILE) >= os.path.getmtime(COMMON_PASSWORDS_FILE):
+            _common_index = SortedHashIndex.load()
+            return _common_index
+    except (OSError, ValueError):
+        pass
+    _common_index = frozenset(load_common_passwords())
+    return _common_index
+
+
+def get_ranked_index():
+    """The precompiled index if it has the estimator's rank table, else None"""
+    index = get_common_index()
+    if isinstance(index, SortedHashIndex) and index.ranked is not None:
+        return index
+    return None
+
+
+def get_breach_corpus():
+    """Open the memory-mapped breach corpus once, if one has been built"""
+    global _breach_corpus
+    if _breach_corpus is None:
+        from breach_corpus import BreachCorpus
+        try:
+            _breach_corpus = BreachCorpus(BREACH_CORPUS_FILE)
+        except (OSError, ValueError):
+            _breach_corpus = False
+    return _breach_corpus or None
+
+
 def is_password_common(password: str) -> bool:
-    common = load_common_passwords()
-    return password.lower() in common
+    if password.lower() in get_common_index():
+        return True
+    corpus = get_breach_corpus()
+    return corpus is not None and password in corpus
+
+"""     BATCH SCORING BELOW       """
+def _common_flags(passwords: list, np):
+    index = get_common_index()
+    if isinstance(index, SortedHashIndex):
+        table = np.frombuffer(index.fingerprints, dtype=np.uint64)
+        fps = np.fromiter((password_fingerprint(p) for p in passwords), dtype=np.uint64, count=len(passwords))
+        pos = np.minimum(np.searchsorted(table, fps), max(len(table) - 1, 0))
+        flags = table[pos] == fps if len(table) else np.zeros(len(passwords), dtype=bool)
+    else:
+        flags = np.fromiter((p.lower() in index for p in passwords), dtype=bool, count=len(passwords))
+    corpus = get_breach_corpus()
+    if corpus is not None:
+        flags |= np.fromiter((p in corpus for p in passwords), dtype=bool, count=len(passwords))
+    return flags
+
+
+def score_many(passwords, estimate: bool = False) -> dict:
+    """Score a whole batch at once, returns columns of NumPy arrays.
+
+    Columns: length, classes (LOWER|UPPER|DIGIT|SYMBOL bits), has_seq,
+    is_common, score, rating. Character classes and sequences are found over
+    one flat byte array instead of per password, which is what makes this
+    an order of magnitude faster than a calculate_strength loop.
+
+    By default scores are the rule-based part of analyze_password (length,
+    classes, sequences, common list; empty passwords score 0). That is an
+    upper bound: analyze_password also caps the score by the guess estimate.
+    The estimator can't be vectorized, so estimate=True runs it per password
+    (no faster than the loop) to give identical scores plus a guesses_log10
+    column. Use it on the shortlist the rule scores leave, not the whole set.
+    """
+    import numpy as np
+
+    passwords = list(passwords)
+    n = len(passwords)
+    encoded = [p.encode('utf-8') for p in passwords]
+    byte_lengths = np.fromiter(map(len, encoded), dtype=np.int64, count=n)
+    flat = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    rows = np.repeat(np.arange(n), byte_lengths)
+    # characters = bytes that aren't UTF-8 continuation bytes
+    lengths = np.bincount(rows[(flat & 0xC0) != 0x80], minlength=n)
+
+    # character classes: byte -> class bit table, then OR per password
+    class_table = np.zeros(256, dtype=np.uint8)
+    for ch, bit in CHAR_CLASSES.items():
+        class_table[ord(ch)] = bit
+    bits = class_table[flat]
+    classes = np.zeros(n, dtype=np.uint8)
+    for bit in (LOWER, UPPER, DIGIT, SYMBOL):
+        hit = np.bincount(rows[(bits & bit) > 0], minlength=n) > 0
+        classes |= np.where(hit, bit, 0).astype(np.uint8)
+
+    # sequences: pack each lowered 3-byte window into an int and look it up
+    lower_table = np.arange(256, dtype=np.uint32)
+    lower_table[ord('A'):ord('Z') + 1] += 32
+    low = lower_table[flat]
+    if len(flat) >= 3:
+        codes = (low[:-2] << 16) | (low[1:-1] << 8) | low[2:]
+        seq_codes = np.array([(ord(t[0]) << 16) | (ord(t[1]) << 8) | ord(t[2]) for t in SEQ_TRIGRAMS],
+                             dtype=np.uint32)
+        same_row = rows[:-2] == rows[2:]
+        hits = np.isin(codes, seq_codes) & same_row
+        has_seq = np.bincount(rows[:-2][hits], minlength=n) > 0
+    else:
+        has_seq = np.zeros(n, dtype=bool)
+
+    is_common = _common_flags(passwords, np)
+
+    length_points = np.select([lengths >= min_length for min_length, _ in LENGTH_POINTS],
+                              [points for _, points in LENGTH_POINTS])
+    scores = np.where(has_seq, np.maximum(length_points - SEQ_PENALTY, 0), length_points)
+    class_counts = np.array([bin(i).count('1') for i in range(16)])[classes]
+    scores = scores + class_counts * CLASS_POINTS
+
+    result = {'length': lengths, 'classes': classes, 'has_seq': has_seq, 'is_common': is_common}
+    if estimate:
+        guesses_log10 = np.fromiter((estimate_guesses(p)['guesses_log10'] for p in passwords),
+                                    dtype=np.float64, count=n)
+        scores = np.minimum(scores, np.minimum(100, (guesses_log10 * 100 / FULL_MARKS_LOG10).astype(np.int64)))
+        result['guesses_log10'] = guesses_log10
+    scores = np.where(is_common | (lengths == 0), 0, scores)
+
+    result['score'] = scores
+    result['rating'] = np.select(
+        [is_common, scores >= 80, scores >= 60, scores >= 40],
+        ['very weak', 'very strong', 'strong', 'medium'], default='weak')
+    return result
 
 def has_seq_chars(password: str) -> bool:
-    password = password.lower()
-
-    sequences = [
-        'qwertyuiop',
-        'asdfghjkl',
-        'zxcvbnm'
-        'abcdefghijklmnopqrstuvwxyz',
-        '1234567890'
-    ]
-
-    for seq in sequences:
-        for i in range(len(seq) - 2):
-            substring = seq[i:i+3]
-            if substring in password:
-                return True
-            # Backward sequence (e.g., "cba", "321")
-            if substring[::-1] in password:
-                return True
-    
-    return False
+    return scan_password(password)[1]
 
 def get_feedback(password: str) -> list:
-    feedback = []
-    
-    # Check if it's a common password
-    if is_password_common(password):
-        feedback.append("This is a commonly used password - choose something unique")
-        return feedback  # If common, other feedback doesn't matter
-    
-    # Length feedback
-    length = len(password)
-    if length < 8:
-        feedback.append("!  Password is too short - use at least 8 characters (12+ recommended)")
-    elif length < 12:
-        feedback.append("!  Consider making it longer (12+ characters is better)")
-    
-    # Character variety feedback
-    if not re.search(r'[a-z]', password):
-        feedback.append("+  Add lowercase letters (a-z)")
-    if not re.search(r'[A-Z]', password):
-        feedback.append("+  Add uppercase letters (A-Z)")
-    if not re.search(r'[0-9]', password):
-        feedback.append("+  Add numbers (0-9)")
-    if not re.search(r'[!@#$%^&*(),.?":{}|<>]', password):
-        feedback.append("+  Add special symbols (!@#$%^&*)")
-    
-    # Pattern feedback
-    if has_seq_chars(password):
-        feedback.append("!  Avoid sequential characters (abc, 123, qwerty)")
-    
-    # If no feedback, it's strong!
-    if not feedback:
-        feedback.append("✓ Strong password! No improvements needed.")
-    
-    return feedback
+    return analyze_password(password)['feedback']
 
 def display_strength_analysis(password: str):
-    result = calculate_strength(password)
-    feedback = get_feedback(password)
+    result = analyze_password(password)
+    feedback = result['feedback']
     
     print("\n" + "="*50)
     print("PASSWORD STRENGTH ANALYSIS")
     print("="*50)
     print(f"Score:   {result['score']}/100")
     print(f"Rating:  {result['rating'].upper()}")
+    print(f"Guesses: ~10^{result['guesses_log10']:.0f}")
     print("\nFeedback:")
     for item in feedback:
         print(f"  {item}")
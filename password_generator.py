@@ -0,0 +1,183 @@
+"""
+    Password and passphrase generation.
+
+    Randomness is drawn from secrets.token_bytes in 4 KiB blocks instead of
+    one secrets.choice call per character. Bytes are mapped onto the
+    alphabet with rejection sampling (bytes past the last full multiple of
+    the alphabet size are dropped), so every character is equally likely.
+
+    Modes:
+        random          characters from the chosen classes, each required class present
+        pronounceable   consonant/vowel syllables, e.g. "Tavokemu-7"
+        diceware        words from a wordlist, e.g. "olive-sprint-cabin-gravel-mural-tonic"
+"""
+
+import os
+import string
+import secrets
+
+BLOCK_SIZE = 4096
+WORDLIST_FILE = os.environ.get('PM_WORDLIST', 'wordlist.txt')
+
+CLASSES = {
+    'lower': string.ascii_lowercase,
+    'upper': string.ascii_uppercase,
+    'digit': string.digits,
+    'symbol': string.punctuation,
+}
+
+CONSONANTS = 'bcdfghjklmnprstvz'
+VOWELS = 'aeiou'
+
+_wordlist = None
+
+
+class RandomPool:
+    """Buffered secure random bytes with unbiased range reduction"""
+
+    def __init__(self, block_size: int = BLOCK_SIZE):
+        self.block_size = block_size
+        self._buffer = b''
+        self._pos = 0
+
+    def reset(self):
+        """Throw away buffered bytes (a forked child must not reuse its parent's)"""
+        self._buffer = b''
+        self._pos = 0
+
+    def _take(self, count: int) -> bytes:
+        if self._pos + count > len(self._buffer):
+            self._buffer = self._buffer[self._pos:] + secrets.token_bytes(max(self.block_size, count))
+            self._pos = 0
+        data = self._buffer[self._pos:self._pos + count]
+        self._pos += count
+        return data
+
+    def choose(self, alphabet: str, count: int) -> str:
+        """count characters drawn uniformly from an ASCII alphabet of at most 128 chars"""
+        table, rejected, acceptance = _translation(alphabet)
+        out = b''
+        while len(out) < count:
+            need = count - len(out)
+            # ask for a little extra so a second round is rarely needed
+            out += self._take(int(need / acceptance) + 4).translate(table, rejected)
+        return out[:count].decode('ascii')
+
+    def below(self, n: int) -> int:
+        """Uniform integer in [0, n), n up to 2**32"""
+        width = max(1, (n - 1).bit_length() + 7 >> 3)
+        span = 1 << (8 * width)
+        limit = span - span % n
+        while True:
+            value = int.from_bytes(self._take(width), 'big')
+            if value < limit:
+                return value % n
+
+
+_pool = RandomPool()
+if hasattr(os, 'register_at_fork'):
+    # otherwise parent and child would hand out the same passwords from the shared buffer
+    os.register_at_fork(after_in_child=_pool.reset)
+_translations = {}
+
+def _translation(alphabet: str):
+    """bytes.translate table mapping accepted bytes onto the alphabet, plus the bytes to drop"""
+    cached = _translations.get(alphabet)
+    if cached is None:
+        size = len(alphabet)
+        if not 0 < size <= 128 or not alphabet.isascii():
+            raise ValueError("Alphabet must be 1 to 128 ASCII characters")
+        limit = 256 - 256 % size
+        table = bytes(ord(alphabet[b % size]) if b < limit else 0 for b in range(256))
+        cached = _translations[alphabet] = (table, bytes(range(limit, 256)), limit / 256)
+    return cached
+
+
+"""     MODES BELOW       """
+def build_alphabet(classes) -> str:
+    try:
+        return ''.join(CLASSES[name] for name in classes)
+    except KeyError as e:
+        raise ValueError(f"Unknown character class: {e.args[0]}") from None
+
+def random_password(length: int = 16, classes=('lower', 'upper', 'digit', 'symbol'),
+                    required=None, pool: RandomPool = None) -> str:
+    """Uniformly random password over the given classes.
+
+    Every class in required (default: all of classes) appears at least once.
+    Candidates missing a class are thrown away and redrawn, which keeps the
+    result uniform over all passwords that satisfy the policy.
+    """
+    pool = pool or _pool
+    alphabet = build_alphabet(classes)
+    required = [CLASSES[name] for name in (classes if required is None else required)]
+    if length < len(required):
+        raise ValueError(f"Length {length} is too short to include {len(required)} required character classes")
+    while True:
+        password = pool.choose(alphabet, length)
+        if all(any(ch in chars for ch in password) for chars in required):
+            return password
+
+
+def pronounceable_password(syllables: int = 4, pool: RandomPool = None) -> str:
+    """Capitalized consonant-vowel(-consonant) syllables plus a digit: 'Tavokemu-7'"""
+    pool = pool or _pool
+    parts = []
+    for _ in range(syllables):
+        syllable = pool.choose(CONSONANTS, 1) + pool.choose(VOWELS, 1)
+        if pool.below(3) == 0:
+            syllable += pool.choose(CONSONANTS, 1)
+        parts.append(syllable)
+    return ''.join(parts).capitalize() + '-' + pool.choose(string.digits, 1)
+
+
+def load_wordlist(path: str = None) -> list:
+    """Diceware-style wordlist (one word per line, or 'dice-roll word' lines).
+
+    Falls back to generated pronounceable words when the default wordlist
+    isn't installed. A path given explicitly has to exist and hold at least
+    two words, otherwise OSError or ValueError is raised.
+    """
+    global _wordlist
+    if path is None and _wordlist is not None:
+        return _wordlist
+    words = []
+    try:
+        with open(path or WORDLIST_FILE, 'r', encoding='utf-8') as f:
+            for line in f:
+                parts = line.split()
+                if parts:
+                    words.append(parts[-1])
+    except FileNotFoundError:
+        if path is not None:
+            raise
+    words = sorted(set(words))
+    if path is None:
+        _wordlist = words
+    elif len(words) < 2:
+        raise ValueError(f"{path} has fewer than two distinct words")
+    return words
+
+def passphrase(words: int = 6, separator: str = '-', wordlist: list = None, pool: RandomPool = None) -> str:
+    pool = pool or _pool
+    wordlist = load_wordlist() if wordlist is None else wordlist
+    if len(wordlist) < 2:
+        # no wordlist: 2-syllable pseudo-words, 17*5*17*5 = 7225 of them
+        return separator.join(pool.choose(CONSONANTS, 1) + pool.choose(VOWELS, 1) +
+                              pool.choose(CONSONANTS, 1) + pool.choose(VOWELS, 1) for _ in range(words))
+    return separator.join(wordlist[pool.below(len(wordlist))] for _ in range(words))
+
+
+def generate(mode: str = 'random', **options) -> str:
+    if mode == 'random':
+        return random_password(**options)
+    if mode == 'pronounceable':
+        return pronounceable_password(**options)
+    if mode == 'diceware':
+        return passphrase(**options)
+    raise ValueError(f"Unknown generator mode: {mode}")
+
+def generate_many(count: int, mode: str = 'random', **options):
+    """Yield count passwords, sharing one random pool"""
+    for _ in range(count):
+        yield generate(mode, **options)
@@ -0,0 +1,171 @@
+"""
+    Search index over service and username.
+
+    Terms are normalized once when an entry is added. Prefix queries bisect a
+    sorted term list, and fuzzy queries rank candidates by shared trigrams
+    (entries with the query as an exact substring always make the list).
+    add()/remove() keep the index in step with the vault, so it never needs a
+    full rebuild.
+"""
+
+import re
+import heapq
+from bisect import bisect_left, insort
+from collections import defaultdict
+
+FIELDS = ('service', 'username')
+WORD_SPLIT = re.compile(r'[^a-z0-9]+')
+
+
+def normalize(text: str) -> str:
+    return ' '.join(text.lower().split())
+
+def trigrams(text: str) -> set:
+    padded = f"  {text} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+def entry_grams(terms) -> set:
+    """Union of the trigrams of every term, in one go"""
+    padded = [f"  {term} " for term in terms]
+    return {text[i:i + 3] for text in padded for i in range(len(text) - 2)}
+
+
+class SearchIndex:
+    def __init__(self, entries=()):
+        self._terms = []                     # sorted (term, entry_id) pairs
+        self._entry_terms = {}               # entry_id -> terms it contributed
+        self._gram_counts = {}               # entry_id -> number of distinct trigrams
+        # postings are collected as plain lists in one pass (each entry adds a
+        # trigram once) and turned into sets at the end
+        postings = defaultdict(list)
+        for entry in entries:
+            entry_id = entry['id']
+            terms = self._terms_for(entry)
+            self._entry_terms[entry_id] = terms
+            self._terms.extend((term, entry_id) for term in terms)
+            grams = entry_grams(terms)
+            self._gram_counts[entry_id] = len(grams)
+            for gram in grams:
+                postings[gram].append(entry_id)
+        self._terms.sort()
+        self._grams = defaultdict(set, ((gram, set(ids)) for gram, ids in postings.items()))  # trigram -> entry ids
+
+    def __len__(self):
+        return len(self._entry_terms)
+
+    def _terms_for(self, entry: dict) -> set:
+        terms = set()
+        for field in FIELDS:
+            value = normalize(entry.get(field) or '')
+            if value:
+                terms.add(value)
+                terms.update(word for word in WORD_SPLIT.split(value) if word)
+        return terms
+
+    def add(self, entry: dict):
+        """Index an entry, replacing anything indexed for the same id"""
+        entry_id = entry['id']
+        if entry_id in self._entry_terms:
+            self.remove(entry_id)
+        terms = self._terms_for(entry)
+        self._entry_terms[entry_id] = terms
+        for term in terms:
+            insort(self._terms, (term, entry_id))
+        self._index_grams(entry_id, terms)
+
+    def _index_grams(self, entry_id: int, terms: set):
+        grams = entry_grams(terms)
+        self._gram_counts[entry_id] = len(grams)
+        for gram in grams:
+            self._grams[gram].add(entry_id)
+
+    def remove(self, entry_id: int):
+        terms = self._entry_terms.pop(entry_id, ())
+        self._gram_counts.pop(entry_id, None)
+        for term in terms:
+            i = bisect_left(self._terms, (term, entry_id))
+            if i < len(self._terms) and self._terms[i] == (term, entry_id):
+                del self._terms[i]
+            for gram in trigrams(term):
+                ids = self._grams.get(gram)
+                if ids is not None:
+                    ids.discard(entry_id)
+                    if not ids:
+                        del self._grams[gram]
+
+    def prefix(self, query: str, limit: int = None) -> list:
+        """Ids of entries where a term (whole field or single word) starts with query"""
+        query = normalize(query)
+        found = {}
+        i = bisect_left(self._terms, (query,))
+        while i < len(self._terms) and self._terms[i][0].startswith(query):
+            found.setdefault(self._terms[i][1], None)
+            if limit and len(found) >= limit:
+                break
+            i += 1
+        return list(found)
+
+    def fuzzy(self, query: str, limit: int = 20, min_score: float = 0.3) -> list:
+        """(entry_id, score) pairs ranked by trigram similarity to the best matching term"""
+        query = normalize(query)
+        if not query:
+            return []
+        if len(query) < 3:
+            # too short to share inner trigrams, fall back to a substring scan
+            results = [(entry_id, 0.5 + 0.5 * len(query) / max(len(term) for term in terms))
+                       for entry_id, terms in self._entry_terms.items()
+                       if any(query in term for term in terms)]
+            results.sort(key=lambda item: (-item[1], item[0]))
+            return results[:limit]
+        query_grams = trigrams(query)
+        hits = defaultdict(int)
+        for gram in query_grams:
+            for entry_id in self._grams.get(gram, ()):
+                hits[entry_id] += 1
+
+        # rank by trigram overlap with the whole entry, then score the best few per term.
+        # Exact substrings go in whatever their overlap: 'tub' shares one trigram with 'youtube'
+        query_count = len(query_grams)
+        candidates = {entry_id for _, entry_id in heapq.nlargest(
+            limit * 3,
+            ((shared / (query_count + self._gram_counts[entry_id] - shared), entry_id)
+             for entry_id, shared in hits.items() if shared / query_count >= min_score))}
+        candidates.update(entry_id for _, entry_id in heapq.nlargest(limit * 3, self._substring_hits(query)))
+
+        results = []
+        for entry_id in candidates:
+            best = 0.0
+            for term in self._entry_terms[entry_id]:
+                term_grams = trigrams(term)
+                score = len(query_grams & term_grams) / len(query_grams | term_grams)
+                if query in term:
+                    score = max(score, 0.5 + 0.5 * len(query) / len(term))
+                best = max(best, score)
+            if best >= min_score:
+                results.append((entry_id, best))
+        results.sort(key=lambda item: (-item[1], item[0]))
+        return results[:limit]
+
+    def _substring_hits(self, query: str):
+        """(shortest term length, entry_id) for entries with query inside a term.
+        Only entries holding every trigram of query itself are checked"""
+        postings = sorted((self._grams.get(query[i:i + 3], set()) for i in range(len(query) - 2)), key=len)
+        ids = set(postings[0])
+        for other in postings[1:]:
+            ids &= other
+        for entry_id in ids:
+            lengths = [len(term) for term in self._entry_terms[entry_id] if query in term]
+            if lengths:
+                yield -min(lengths), entry_id
+
+    def search(self, query: str, limit: int = 20) -> list:
+        """Prefix matches first, then fuzzy/substring matches, as a list of ids"""
+        ranked = self.prefix(query, limit)
+        if limit and len(ranked) >= limit:
+            return ranked
+        seen = set(ranked)
+        for entry_id, _ in self.fuzzy(query, limit=limit):
+            if entry_id not in seen:
+                ranked.append(entry_id)
+                seen.add(entry_id)
+        return ranked[:limit] if limit else ranked
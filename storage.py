@@ -1,33 +1,711 @@
 import os
+import re
 import json
+import struct
+import sqlite3
+import tempfile
+from contextlib import contextmanager
 
-def save_master_password_hash(pass_hash: str):
-    """"""
-    config = {'master_password_hash': pass_hash}
-    with open('config.json', 'w') as f:
-        json.dump(config, f)
+try:
+    import fcntl
+except ImportError:  # Windows: no advisory locks, same as before
+    fcntl = None
 
-def load_master_password_hash() -> str:
-    """Load the master password hash from config"""
+CONFIG_FILE = 'config.json'
+DATA_FILE = 'data.json'
+DB_FILE = 'vault.db'
+BINARY_FILE = 'vault.pmv'
+
+ENTRY_FIELDS = ('id', 'service', 'username', 'password', 'created', 'strength')
+METADATA_FIELDS = ('id', 'service', 'username', 'created', 'strength')  # what listing and search need
+CHECKPOINT_BYTES = 256 * 1024  # fold the journal into data.json past this size
+
+_backend = None
+
+
+class VaultConflictError(Exception):
+    """Someone else committed to the vault since we read it"""
+
+    def __init__(self, message: str, ids=()):
+        super().__init__(message)
+        self.ids = list(ids)
+
+
+def _entry_dict(obj):
+    """json.dumps fallback: Entry records (from the binary backend) serialize as plain dicts"""
+    if hasattr(obj, 'to_dict'):
+        return obj.to_dict()
+    raise TypeError(f"{type(obj).__name__} is not JSON serializable")
+
+def _fsync_dir(path: str):
+    """fsync the directory holding path so a rename survives a crash (no-op on Windows)"""
+    if not hasattr(os, 'O_DIRECTORY'):
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY | os.O_DIRECTORY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+def atomic_write(path: str, data: bytes):
+    """Write to a temp file, fsync it, then rename over the target.
+
+    Readers see either the old file or the new one, never a truncated one.
+    """
+    with atomic_file(path) as f:
+        f.write(data)
+
+@contextmanager
+def atomic_file(path: str, mode: int = 0o600):
+    """atomic_write for data written in pieces: yields a binary file to write to.
+
+    The temp file gets a unique name next to the target (so two writers
+    never share one) and is created with mode 0600 regardless of the umask.
+    The target only appears once the block exits cleanly; on an error the
+    temp file is removed and the target is left as it was.
+    """
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path) or '.', prefix=os.path.basename(path) + '.',
+                                    suffix='.tmp')
     try:
-        with open('config.json', 'r') as f:
-            config = json.load(f)
-            return config.get('master_password_hash', '')
+        with os.fdopen(fd, 'wb') as f:
+            if mode != 0o600:
+                os.chmod(tmp_path, mode)
+            yield f
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        try:
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            pass
+        raise
+    _fsync_dir(path)
+
+
+def load_config() -> dict:
+    """Load config.json, empty dict if missing or unreadable"""
+    try:
+        with open(CONFIG_FILE, 'r') as f:
+            return json.load(f)
     except (FileNotFoundError, json.JSONDecodeError):
-        return ''
+        return {}
+
+def save_config(config: dict):
+    atomic_write(CONFIG_FILE, json.dumps(config).encode())
+
+def save_master_password_hash(pass_hash: str):
+    """Store the master password hash, keeping any other config keys"""
+    config = load_config()
+    config['master_password_hash'] = pass_hash
+    save_config(config)
+
+def load_master_password_hash() -> str:
+    """Load the legacy master password hash from config"""
+    return load_config().get('master_password_hash', '')
+
+def save_kdf_header(kdf: dict, verifier: str, wrapped_keys: list = None, data_key_id: str = None):
+    """Store the vault's KDF header, verifier and wrapped data keys, dropping the legacy hash"""
+    config = load_config()
+    config['kdf'] = kdf
+    config['verifier'] = verifier
+    if wrapped_keys is not None:
+        config['wrapped_keys'] = wrapped_keys
+        config['data_key_id'] = data_key_id
+    config.pop('master_password_hash', None)
+    config.pop('pending_kdf', None)
+    config.pop('pending_wrapped_keys', None)
+    save_config(config)
+
+def has_master_password() -> bool:
+    config = load_config()
+    return bool(config.get('kdf') or config.get('master_password_hash'))
+
+
+class FileLock:
+    """Advisory flock on a side file: shared for readers, exclusive for writers.
+
+    Re-entrant within one object, so a commit that reads the vault while
+    holding the exclusive lock doesn't deadlock on itself. Readers never
+    block each other. Without fcntl (Windows) locking is a no-op.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._fd = None
+        self._depth = 0
+        self._exclusive = False
+
+    @contextmanager
+    def _hold(self, exclusive: bool):
+        if self._depth and exclusive and not self._exclusive:
+            raise RuntimeError("Can't take an exclusive lock while holding a shared one")
+        if fcntl is None or self._depth:
+            # nested: the outer holder already covers us
+            self._depth += 1
+            try:
+                yield
+            finally:
+                self._depth -= 1
+            return
+        self._fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            fcntl.flock(self._fd, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            self._depth = 1
+            self._exclusive = exclusive
+            yield
+        finally:
+            self._depth = 0
+            self._exclusive = False
+            os.close(self._fd)  # closing releases the lock
+            self._fd = None
+
+    def shared(self):
+        return self._hold(False)
+
+    def exclusive(self):
+        return self._hold(True)
+
+
+"""     STORAGE BACKENDS BELOW       """
+class JSONStorage:
+    """Original data.json format plus a write-ahead journal.
+
+    apply() appends one fsynced line per batch to data.json.journal instead of
+    rewriting the vault. The journal is tagged with the generation of data.json
+    it applies to, and is folded back in by checkpoint(), which writes a new
+    generation atomically and then removes the journal. A journal left over
+    from an older generation is ignored, and a torn last line from a crash is
+    skipped, so replay is always safe.
+
+    Ids come from a persisted counter ("next_id" in the header and in journal
+    records) that only ever goes up, so a deleted id is never handed out again.
+    "revision" goes up by one per commit; apply() refuses to commit on top of
+    a revision the caller hasn't seen. Commits hold an exclusive lock on
+    data.json.lock, reads a shared one.
+    """
+    name = 'json'
+
+    def __init__(self, path: str = DATA_FILE):
+        self.path = path
+        self.journal_path = path + '.journal'
+        self.paths = (self.path, self.journal_path)
+        self.lock = FileLock(path + '.lock')
+        self.auto_checkpoint = True
+        self._journal_state = None  # (generation, length, stat, next_id, revision) after our last append
+
+    @contextmanager
+    def bulk(self):
+        """Hold off checkpoints until a run of apply() calls is done"""
+        self.auto_checkpoint = False
+        try:
+            yield self
+        finally:
+            self.auto_checkpoint = True
+            self.checkpoint()
+
+    def _read_data(self) -> dict:
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return {'generation': 0, 'next_id': 1, 'revision': 0, 'entries': []}
+        except json.JSONDecodeError as e:
+            # don't hand back an empty vault that the next save would persist
+            raise ValueError(f"{self.path} is corrupt: {e}") from e
+        data.setdefault('generation', 0)
+        data.setdefault('revision', 0)
+        data.setdefault('entries', [])
+        if 'next_id' not in data:
+            # written before ids were persisted
+            data['next_id'] = max((entry['id'] for entry in data['entries']), default=0) + 1
+        return data
+
+    def _read_header(self):
+        """(generation, next_id, revision) of data.json.
+
+        They are written ahead of the entries, so a short read usually avoids
+        parsing the vault.
+        """
+        try:
+            with open(self.path, 'r') as f:
+                head = f.read(160)
+        except FileNotFoundError:
+            return 0, 1, 0
+        if '"entries"' in head:
+            fields = dict(re.findall(r'"(generation|next_id|revision)":\s*(\d+)', head.split('"entries"')[0]))
+            if 'generation' in fields and 'next_id' in fields:
+                return int(fields['generation']), int(fields['next_id']), int(fields.get('revision', 0))
+        data = self._read_data()
+        return data['generation'], data['next_id'], data['revision']
+
+    def _read_generation(self) -> int:
+        return self._read_header()[0]
+
+    def _scan_journal(self):
+        """(generation, records, length of the intact prefix) of the journal file"""
+        try:
+            with open(self.journal_path, 'rb') as f:
+                raw = f.read()
+        except FileNotFoundError:
+            return None, [], 0
+        records = []
+        valid_length = 0
+        for line in raw.splitlines(keepends=True):
+            if not line.endswith(b'\n'):
+                break  # torn write, nothing after it was committed
+            try:
+                records.append(json.loads(line))
+            except json.JSONDecodeError:
+                break
+            valid_length += len(line)
+        if not records:
+            return None, [], 0
+        return records[0].get('generation'), records[1:], valid_length
+
+    def _journal_stat(self):
+        try:
+            st = os.stat(self.journal_path)
+        except FileNotFoundError:
+            return None
+        return (st.st_size, st.st_mtime_ns, st.st_ino)
+
+    def _read_journal(self, generation: int) -> list:
+        journal_generation, records, _ = self._scan_journal()
+        return records if journal_generation == generation else []
+
+    @staticmethod
+    def _advance(next_id: int, revision: int, records: list):
+        """Counters from the header, moved on by each journal record"""
+        for record in records:
+            next_id = max(next_id, record.get('next_id', 0))
+            revision = max(revision, record.get('revision', 0))
+        return next_id, revision
+
+    def snapshot(self):
+        """(revision, entries) read together under a shared lock"""
+        with self.lock.shared():
+            data = self._read_data()
+            records = self._read_journal(data['generation'])
+            revision = self._advance(data['next_id'], data['revision'], records)[1]
+            if not records:
+                return revision, data['entries']
+            entries = {entry['id']: entry for entry in data['entries']}
+            for record in records:
+                for entry in record.get('upserts', []):
+                    entries[entry['id']] = entry
+                for entry_id in record.get('deletes', []):
+                    entries.pop(entry_id, None)
+            return revision, list(entries.values())
+
+    def load_all(self) -> list:
+        return self.snapshot()[1]
+
+    def get(self, entry_id: int):
+        """One entry, or None"""
+        return next((entry for entry in self.load_all() if entry['id'] == entry_id), None)
+
+    def list_metadata(self) -> list:
+        """METADATA_FIELDS of every entry, no tokens"""
+        return [{field: entry.get(field) for field in METADATA_FIELDS} for entry in self.load_all()]
+
+    def _write_data(self, entries: list, next_id: int, revision: int):
+        self._write_snapshot({'generation': self._read_generation() + 1, 'next_id': next_id,
+                              'revision': revision, 'entries': entries})
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+
+    def _write_snapshot(self, data: dict):
+        atomic_write(self.path, json.dumps(data, indent=2, default=_entry_dict).encode())
+
+    def replace_all(self, entries: list, next_id: int = None):
+        with self.lock.exclusive():
+            current_next_id, revision = self._counters()
+            next_id = max(next_id or 0, current_next_id, max((entry['id'] for entry in entries), default=0) + 1)
+            self._write_data(entries, next_id, revision + 1)
+
+    def checkpoint(self):
+        """Fold the journal into data.json (same content, so the revision stays)"""
+        with self.lock.exclusive():
+            if os.path.exists(self.journal_path):
+                self._write_data(self.load_all(), *self._counters())
+
+    def _counters(self):
+        generation, next_id, revision = self._read_header()
+        return self._advance(next_id, revision, self._read_journal(generation))
+
+    def next_id(self) -> int:
+        """Next unused id: the counter from the header, advanced by the journal"""
+        with self.lock.shared():
+            return self._counters()[0]
+
+    def revision(self) -> int:
+        with self.lock.shared():
+            return self._counters()[1]
+
+    def insert(self, entry: dict):
+        self.apply([entry], [], [])
+
+    def update(self, entry: dict):
+        self.apply([], [entry], [])
+
+    def delete(self, entry_id: int):
+        self.apply([], [], [entry_id])
+
+    def apply(self, inserts: list, updates: list, deletes: list, expected_revision: int = None) -> int:
+        """Commit a batch of changes as one journal record with a single fsync.
+
+        With expected_revision, raises VaultConflictError if anyone committed
+        since that revision. Returns the new revision.
+        """
+        with self.lock.exclusive():
+            generation, next_id, revision = self._read_header()
+            state = self._journal_state
+            if state and state[0] == generation and state[2] == self._journal_stat():
+                # nobody touched the journal since our last append, skip re-reading it
+                journal_generation, valid_length, _, next_id, revision = state
+            else:
+                journal_generation, records, valid_length = self._scan_journal()
+                if journal_generation == generation:
+                    next_id, revision = self._advance(next_id, revision, records)
+
+            if expected_revision is not None and revision != expected_revision:
+                raise VaultConflictError(f"Vault changed on disk (revision {revision}, expected {expected_revision})")
+
+            revision += 1
+            record = {'upserts': list(inserts) + list(updates), 'deletes': list(deletes), 'revision': revision}
+            if inserts:
+                next_id = max(next_id, max(entry['id'] for entry in inserts) + 1)
+                record['next_id'] = next_id
+            record = (json.dumps(record) + '\n').encode()
+
+            if journal_generation == generation:
+                with open(self.journal_path, 'r+b') as f:
+                    f.truncate(valid_length)  # drop a torn tail before appending
+                    f.seek(valid_length)
+                    f.write(record)
+                    f.flush()
+                    os.fsync(f.fileno())
+                valid_length += len(record)
+            else:
+                header = (json.dumps({'generation': generation}) + '\n').encode()
+                atomic_write(self.journal_path, header + record)
+                valid_length = len(header) + len(record)
+            self._journal_state = (generation, valid_length, self._journal_stat(), next_id, revision)
+
+            if self.auto_checkpoint and valid_length > CHECKPOINT_BYTES:
+                self.checkpoint()
+            return revision
+
+
+class BinaryStorage(JSONStorage):
+    """vault.pmv: the binary container from vault_file.py instead of data.json.
+
+    Commits still go to a JSON journal (vault.pmv.journal) and are folded into
+    a new vault.pmv by checkpoint(), exactly like the JSON backend. get() and
+    list_metadata() decode only what they return straight out of the mapped
+    file and lay the journal over it, so neither loads the whole vault.
+    """
+    name = 'binary'
+
+    def __init__(self, path: str = BINARY_FILE):
+        super().__init__(path)
+
+    @contextmanager
+    def _open(self):
+        """The VaultFile, or None if there is no vault yet. Decoding errors become ValueError"""
+        from vault_file import VaultFile
+        try:
+            vault_file = VaultFile(self.path)
+        except FileNotFoundError:
+            yield None
+            return
+        except (ValueError, KeyError, UnicodeDecodeError, struct.error) as e:
+            raise ValueError(f"{self.path} is corrupt: {e}") from e
+        try:
+            yield vault_file
+        except (ValueError, KeyError, UnicodeDecodeError, struct.error) as e:
+            raise ValueError(f"{self.path} is corrupt: {e}") from e
+        finally:
+            vault_file.close()
+
+    def _read_data(self) -> dict:
+        with self._open() as vault_file:
+            if vault_file is None:
+                return {'generation': 0, 'next_id': 1, 'revision': 0, 'entries': []}
+            header = vault_file.header
+            entries = list(vault_file)
+        return {'generation': header['generation'], 'next_id': header['next_id'],
+                'revision': header.get('revision', 0), 'entries': entries}
+
+    def get(self, entry_id: int):
+        """One entry: the journal's latest version of it, else a single record from vault.pmv"""
+        with self.lock.shared():
+            with self._open() as vault_file:
+                generation = vault_file.header['generation'] if vault_file else 0
+                entry = vault_file.get(entry_id) if vault_file else None
+            for record in self._read_journal(generation):
+                for upsert in record.get('upserts', []):
+                    if upsert['id'] == entry_id:
+                        entry = upsert
+                if entry_id in record.get('deletes', []):
+                    entry = None
+            return entry
+
+    def list_metadata(self) -> list:
+        """Text fields of every record plus the journal's changes, tokens never decoded"""
+        with self.lock.shared():
+            with self._open() as vault_file:
+                generation = vault_file.header['generation'] if vault_file else 0
+                entries = {entry['id']: entry for entry in vault_file.metadata()} if vault_file else {}
+            for record in self._read_journal(generation):
+                for upsert in record.get('upserts', []):
+                    entries[upsert['id']] = {field: upsert.get(field) for field in METADATA_FIELDS}
+                for entry_id in record.get('deletes', []):
+                    entries.pop(entry_id, None)
+            return list(entries.values())
+
+    def apply(self, inserts: list, updates: list, deletes: list, expected_revision: int = None) -> int:
+        """JSONStorage.apply, once every entry is known to fit the binary format.
+
+        The journal itself is JSON, so without this check an over-long field
+        would commit fine and only fail at the next checkpoint.
+        """
+        from vault_file import check_entry
+        for entry in list(inserts) + list(updates):
+            check_entry(entry)
+        return super().apply(inserts, updates, deletes, expected_revision)
+
+    def _read_header(self):
+        from vault_file import read_header
+        try:
+            header = read_header(self.path)
+        except FileNotFoundError:
+            return 0, 1, 0
+        except (ValueError, KeyError) as e:
+            raise ValueError(f"{self.path} is corrupt: {e}") from e
+        return header['generation'], header['next_id'], header.get('revision', 0)
+
+    def _write_snapshot(self, data: dict):
+        from vault_file import write_vault
+        header = {key: data[key] for key in ('generation', 'next_id', 'revision')}
+        with atomic_file(self.path) as f:
+            write_vault(f, data['entries'], header)
+
+
+class SQLiteStorage:
+    """Entries as rows keyed by id, so single-entry changes don't rewrite the vault.
+
+    Fields outside ENTRY_FIELDS are kept as a JSON blob in the extra column.
+    The id counter and commit revision live in the meta table, and commits
+    take the same vault.db.lock as the JSON backend.
+    """
+    name = 'sqlite'
+
+    def __init__(self, path: str = DB_FILE):
+        self.path = path
+        self.paths = (path,)
+        self.lock = FileLock(path + '.lock')
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY,
+                service TEXT NOT NULL,
+                username TEXT NOT NULL,
+                password TEXT NOT NULL,
+                created TEXT,
+                strength TEXT,
+                extra TEXT
+            )""")
+        # persisted id counter and revision, so ids of deleted entries are never reused
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value INTEGER)")
+        self.conn.commit()
+
+    def _meta(self, key: str, default: int) -> int:
+        row = self.conn.execute("SELECT value FROM meta WHERE key=?", (key,)).fetchone()
+        return row[0] if row else default
+
+    def _bump_next_id(self, next_id: int):
+        self.conn.execute(
+            "INSERT INTO meta VALUES ('next_id', ?) ON CONFLICT(key) DO UPDATE SET value=MAX(value, excluded.value)",
+            (next_id,))
+
+    def _bump_revision(self) -> int:
+        revision = self._meta('revision', 0) + 1
+        self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('revision', ?)", (revision,))
+        return revision
+
+    @staticmethod
+    def _to_row(entry: dict) -> tuple:
+        extra = {k: v for k, v in entry.items() if k not in ENTRY_FIELDS}
+        return tuple(entry.get(field) for field in ENTRY_FIELDS) + (json.dumps(extra) if extra else None,)
+
+    @staticmethod
+    def _from_row(row: tuple) -> dict:
+        entry = dict(zip(ENTRY_FIELDS, row[:len(ENTRY_FIELDS)]))
+        if row[-1]:
+            entry.update(json.loads(row[-1]))
+        return entry
+
+    def snapshot(self):
+        """(revision, entries) read together under a shared lock"""
+        with self.lock.shared():
+            revision = self._meta('revision', 0)
+            rows = self.conn.execute(
+                "SELECT id, service, username, password, created, strength, extra FROM entries ORDER BY id")
+            return revision, [self._from_row(row) for row in rows]
+
+    def load_all(self) -> list:
+        return self.snapshot()[1]
+
+    def get(self, entry_id: int):
+        with self.lock.shared():
+            row = self.conn.execute(
+                "SELECT id, service, username, password, created, strength, extra FROM entries WHERE id=?",
+                (entry_id,)).fetchone()
+        return self._from_row(row) if row else None
+
+    def list_metadata(self) -> list:
+        with self.lock.shared():
+            rows = self.conn.execute("SELECT id, service, username, created, strength FROM entries ORDER BY id")
+            return [dict(zip(METADATA_FIELDS, row)) for row in rows]
+
+    def replace_all(self, entries: list, next_id: int = None):
+        with self.lock.exclusive(), self.conn:
+            next_id = max(next_id or 0, self.next_id(), max((e['id'] for e in entries), default=0) + 1)
+            self.conn.execute("DELETE FROM entries")
+            self.conn.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                  (self._to_row(e) for e in entries))
+            self._bump_next_id(next_id)
+            self._bump_revision()
+
+    def next_id(self) -> int:
+        (max_id,) = self.conn.execute("SELECT MAX(id) FROM entries").fetchone()
+        return max((max_id or 0) + 1, self._meta('next_id', 1))
+
+    def revision(self) -> int:
+        return self._meta('revision', 0)
+
+    def insert(self, entry: dict):
+        self.apply([entry], [], [])
+
+    def update(self, entry: dict):
+        self.apply([], [entry], [])
+
+    def delete(self, entry_id: int):
+        self.apply([], [], [entry_id])
+
+    def apply(self, inserts: list, updates: list, deletes: list, expected_revision: int = None) -> int:
+        """Apply a batch of changes in one transaction. Returns the new revision.
+
+        With expected_revision, raises VaultConflictError if anyone committed
+        since that revision.
+        """
+        with self.lock.exclusive(), self.conn:
+            if expected_revision is not None and self.revision() != expected_revision:
+                raise VaultConflictError(
+                    f"Vault changed on disk (revision {self.revision()}, expected {expected_revision})")
+            self.conn.executemany("INSERT INTO entries VALUES (?, ?, ?, ?, ?, ?, ?)",
+                                  (self._to_row(e) for e in inserts))
+            if inserts:
+                self._bump_next_id(max(e['id'] for e in inserts) + 1)
+            self.conn.executemany(
+                "UPDATE entries SET service=?, username=?, password=?, created=?, strength=?, extra=? WHERE id=?",
+                (row[1:] + row[:1] for row in map(self._to_row, updates)))
+            self.conn.executemany("DELETE FROM entries WHERE id=?", ((entry_id,) for entry_id in deletes))
+            return self._bump_revision()
+
+    def checkpoint(self):
+        pass  # every commit already lands in the database file
+
+    @contextmanager
+    def bulk(self):
+        yield self
+
+    def close(self):
+        self.conn.close()
+
+
+BACKENDS = {
+    JSONStorage.name: JSONStorage,
+    SQLiteStorage.name: SQLiteStorage,
+    BinaryStorage.name: BinaryStorage,
+}
+
+def get_backend():
+    """Storage backend picked by the 'storage_backend' config key (json by default)"""
+    global _backend
+    name = load_config().get('storage_backend', JSONStorage.name)
+    if _backend is None or _backend.name != name:
+        _backend = BACKENDS[name]()
+    return _backend
 
 
 def save_entries(entries: list):
-    """Save password entries to data.json"""
-    data = {'entries': entries}
-    with open('data.json', 'w') as f:
-        json.dump(data, f, indent=2)
+    """Save password entries to the configured backend"""
+    get_backend().replace_all(entries)
 
 def load_entries() -> list:
-    """Load password entries from data.json"""
-    try:
-        with open('data.json', 'r') as f:
-            data = json.load(f)
-            return data.get('entries', [])
-    except (FileNotFoundError, json.JSONDecodeError):
-        return []
\ No newline at end of file
+    """Load password entries from the configured backend"""
+    return get_backend().load_all()
+
+def next_entry_id() -> int:
+    return get_backend().next_id()
+
+def insert_entry(entry: dict):
+    get_backend().insert(entry)
+
+def update_entry(entry: dict):
+    get_backend().update(entry)
+
+def delete_entry(entry_id: int):
+    get_backend().delete(entry_id)
+
+
+def migrate(dest: str = SQLiteStorage.name) -> int:
+    """One-shot move of the vault to another backend. The old file is kept as a .bak"""
+    if dest not in BACKENDS:
+        raise ValueError(f"Unknown storage backend: {dest}")
+    source = get_backend()
+    if source.name == dest:
+        return 0
+    with source.lock.exclusive():
+        source.checkpoint()
+        entries = source.load_all()
+        target = BACKENDS[dest]()
+        target.replace_all(entries, source.next_id())
+        if hasattr(target, 'close'):
+            target.close()
+
+        config = load_config()
+        config['storage_backend'] = dest
+        save_config(config)
+        if hasattr(source, 'close'):
+            source.close()
+        for path in source.paths:
+            if os.path.exists(path):
+                os.replace(path, path + '.bak')
+    return len(entries)
+
+def export_json(path: str) -> int:
+    """Write the vault, still encrypted, in the data.json format (for backups or other tools)"""
+    backend = get_backend()
+    with backend.lock.shared():
+        revision, entries = backend.snapshot()
+        next_id = backend.next_id()
+    data = {'generation': 1, 'next_id': next_id, 'revision': revision, 'entries': entries}
+    atomic_write(path, json.dumps(data, indent=2, default=_entry_dict).encode())
+    return len(entries)
+
+
+if __name__ == "__main__":
+    import sys
+
+    if sys.argv[1:2] == ['migrate'] and len(sys.argv) <= 3:
+        dest = sys.argv[2] if len(sys.argv) == 3 else SQLiteStorage.name
+        print(f"Migrated {migrate(dest)} entries to the {dest} backend")
+    elif sys.argv[1:2] == ['export-json'] and len(sys.argv) == 3:
+        print(f"Exported {export_json(sys.argv[2])} entries to {sys.argv[2]}")
+    else:
+        print(f"usage: python storage.py migrate [{'|'.join(BACKENDS)}]\n"
+              "       python storage.py export-json FILE")
@@ -0,0 +1,425 @@
+"""
+    Guess-count strength estimator, modelled on zxcvbn.
+
+    Matchers find every dictionary word (plain, reversed and l33t), keyboard
+    walk, repeat, sequence and date inside the password. A dynamic programme
+    then picks the cheapest way to cover the whole password with those
+    matches plus brute-forced gaps. The estimate is the number of guesses an
+    attacker working through that decomposition would need.
+
+    Dictionaries are looked up by prefix, so substring scans stop as soon as
+    no word can start that way. The common password list comes from the
+    precompiled common_passwords.idx when it has been built (one read, no
+    parsing); other wordlists are compiled once per process into a ranked
+    word -> position map plus the set of every word prefix.
+"""
+
+import re
+import math
+from datetime import date
+
+BRUTEFORCE_CARDINALITY = 10
+MIN_GUESSES_SINGLE_CHAR = 11
+MIN_GUESSES_MULTI_CHAR = 51
+MIN_YEAR_SPACE = 20
+REFERENCE_YEAR = date.today().year
+MAX_WORD_LENGTH = 32  # longer wordlist entries are skipped
+MAX_GUESSES_LOG10 = 300
+
+# ranked wordlists, best first; more can be registered with add_wordlist()
+WORDLISTS = {
+    'passwords': 'common_passwords.txt',
+}
+
+L33T_TABLE = {
+    '4': 'a', '@': 'a', '8': 'b', '(': 'c', '{': 'c', '[': 'c', '<': 'c',
+    '3': 'e', '6': 'g', '9': 'g', '1': 'il', '!': 'i', '|': 'il', '0': 'o',
+    '$': 's', '5': 's', '7': 'lt', '+': 't', '%': 'x', '2': 'z',
+}
+
+# runs of letters and l33t chars, the only places a l33t word can sit
+L33T_SEGMENT = re.compile(r'(?:[^\W\d_]|[' + re.escape(''.join(L33T_TABLE)) + r'])+')
+
+QWERTY_ROWS = ('`1234567890-=', 'qwertyuiop[]\\', "asdfghjkl;'", 'zxcvbnm,./')
+QWERTY_SHIFTED = ('~!@#$%^&*()_+', 'QWERTYUIOP{}|', 'ASDFGHJKL:"', 'ZXCVBNM<>?')
+
+_dictionaries = None
+_keyboard = None
+
+
+class Match:
+    __slots__ = ('i', 'j', 'token', 'pattern', 'guesses', 'detail')
+
+    def __init__(self, i: int, j: int, token: str, pattern: str, guesses: float, detail: str = ''):
+        self.i, self.j, self.token, self.pattern = i, j, token, pattern
+        self.guesses = max(guesses, MIN_GUESSES_SINGLE_CHAR if j == i else MIN_GUESSES_MULTI_CHAR)
+        self.detail = detail
+
+    def __repr__(self):
+        return f"Match({self.pattern} {self.token!r} {self.guesses:.0f})"
+
+
+"""     DICTIONARIES BELOW       """
+def add_wordlist(name: str, path: str):
+    """Register another ranked wordlist (one word per line, most common first)"""
+    global _dictionaries
+    WORDLISTS[name] = path
+    _dictionaries = None
+
+def _compile_wordlist(path: str):
+    """lookup(piece) for a text wordlist: rank, 0 for a prefix of some word, None otherwise"""
+    ranked = {}
+    prefixes = set()
+    seen = set()
+    try:
+        with open(path, 'r', encoding='utf-8', errors='replace') as f:
+            for line in f:
+                word = line.strip().lower()
+                if not word or word in seen:
+                    continue
+                seen.add(word)
+                # rank counts every entry, same as the precompiled index
+                if len(word) <= MAX_WORD_LENGTH:
+                    ranked[word] = len(seen)
+                    prefixes.update(word[:k] for k in range(1, len(word) + 1))
+    except FileNotFoundError:
+        pass
+
+    def lookup(piece: str):
+        if piece not in prefixes:
+            return None
+        return ranked.get(piece, 0)
+    return lookup
+
+def get_dictionaries() -> dict:
+    """name -> lookup(piece), compiled once per process"""
+    global _dictionaries
+    if _dictionaries is None:
+        import password_analyzer
+
+        _dictionaries = {}
+        for name, path in WORDLISTS.items():
+            index = None
+            if path == password_analyzer.COMMON_PASSWORDS_FILE:
+                index = password_analyzer.get_ranked_index()
+            _dictionaries[name] = index.lookup if index is not None else _compile_wordlist(path)
+    return _dictionaries
+
+def _scan(text: str, lookup, min_length: int = 1):
+    """Yield (i, j, rank) for every dictionary word at text[i:j+1]"""
+    n = len(text)
+    for i in range(n):
+        for j in range(i, min(n, i + MAX_WORD_LENGTH)):
+            rank = lookup(text[i:j+1])
+            if rank is None:
+                break
+            if rank and j - i + 1 >= min_length:
+                yield i, j, rank
+
+
+def lower_same_length(text: str) -> str:
+    """text.lower() with one char per char: 'İ'.lower() is two, which would shift every match after it"""
+    lowered = text.lower()
+    if len(lowered) == len(text):
+        return lowered
+    return ''.join(c.lower()[0] for c in text)
+
+def _uppercase_variations(token: str) -> int:
+    if token.islower() or not any(c.isalpha() for c in token):
+        return 1
+    upper = sum(1 for c in token if c.isupper())
+    lower = sum(1 for c in token if c.islower())
+    # Capitalized, ALL CAPS and trailing-cap are the usual cases
+    if (token[0].isupper() and upper == 1) or lower == 0 or (token[-1].isupper() and upper == 1):
+        return 2
+    return sum(math.comb(upper + lower, k) for k in range(1, min(upper, lower) + 1))
+
+def dictionary_matches(password: str) -> list:
+    matches = []
+    lowered = lower_same_length(password)
+    n = len(password)
+    for name, lookup in get_dictionaries().items():
+        for i, j, rank in _scan(lowered, lookup):
+            token = password[i:j+1]
+            matches.append(Match(i, j, token, 'dictionary', rank * _uppercase_variations(token), name))
+        for i, j, rank in _scan(lowered[::-1], lookup, min_length=3):
+            start, end = n - 1 - j, n - 1 - i
+            token = password[start:end+1]
+            if lowered[start:end+1] != lowered[start:end+1][::-1]:  # palindromes are already plain matches
+                matches.append(Match(start, end, token, 'reversed', 2 * rank * _uppercase_variations(token), name))
+    return matches
+
+def _l33t_variants(password: str) -> list:
+    """Translations of the password with each ambiguous l33t char resolved one way"""
+    subs = [(ch, L33T_TABLE[ch]) for ch in set(password) if ch in L33T_TABLE]
+    if not subs:
+        return []
+    variants = [{}]
+    for ch, options in subs:
+        variants = [dict(v, **{ch: option}) for v in variants for option in options][:8]
+    return [(table, password.translate(str.maketrans(table))) for table in variants]
+
+def l33t_matches(password: str) -> list:
+    """Dictionary words with l33t substitutions. Only stretches of letters and
+    l33t chars that have a letter left in them are scanned: an all-digit or
+    all-symbol run is left to the digit and date matchers"""
+    matches = []
+    for segment in L33T_SEGMENT.finditer(password):
+        text, offset = segment.group(0), segment.start()
+        if not any(c.isalpha() for c in text):
+            continue
+        for table, translated in _l33t_variants(text):
+            lowered = lower_same_length(translated)
+            for name, lookup in get_dictionaries().items():
+                for i, j, rank in _scan(lowered, lookup):
+                    token = text[i:j+1]
+                    if lowered[i:j+1] == lower_same_length(token):
+                        continue  # no substitution inside this word
+                    subbed = sum(1 for c in token if c in table)
+                    unsubbed = sum(1 for c in token if c in table.values())
+                    l33t_factor = sum(math.comb(subbed + unsubbed, k) for k in range(1, subbed + 1)) or 2
+                    matches.append(Match(offset + i, offset + j, token, 'l33t',
+                                         rank * l33t_factor * _uppercase_variations(token), name))
+    return matches
+
+
+"""     PATTERN MATCHERS BELOW       """
+def _keyboard_graph() -> dict:
+    """char -> {neighbour: direction} on a qwerty layout (shifted chars included)"""
+    global _keyboard
+    if _keyboard is None:
+        _keyboard = {}
+        positions = {}
+        for rows in (QWERTY_ROWS, QWERTY_SHIFTED):
+            for r, row in enumerate(rows):
+                for c, ch in enumerate(row):
+                    positions[ch] = (r, c + r * 0.5)  # rows are staggered by half a key
+        for ch, (r, x) in positions.items():
+            _keyboard[ch] = {other: (r2 - r, x2 - x) for other, (r2, x2) in positions.items()
+                             if other != ch and abs(r2 - r) <= 1 and abs(x2 - x) <= 1.0}
+    return _keyboard
+
+KEYBOARD_AVERAGE_DEGREE = sum(len(v) for v in _keyboard_graph().values()) / len(_keyboard_graph())
+
+SHIFTED_KEYS = set(''.join(QWERTY_SHIFTED))
+
+def spatial_matches(password: str) -> list:
+    graph = _keyboard_graph()
+    starts = len(graph)
+    degree = KEYBOARD_AVERAGE_DEGREE
+    matches = []
+    i = 0
+    n = len(password)
+    while i < n - 2:
+        j = i
+        turns = 0
+        last_direction = None
+        while j + 1 < n:
+            direction = graph.get(password[j], {}).get(password[j+1])
+            if direction is None:
+                break
+            if direction != last_direction:
+                turns += 1
+                last_direction = direction
+            j += 1
+        if j - i >= 2:
+            length = j - i + 1
+            guesses = 0
+            for k in range(2, length + 1):
+                for t in range(1, min(turns, k - 1) + 1):
+                    guesses += math.comb(k - 1, t - 1) * starts * degree ** t
+            shifted = sum(1 for c in password[i:j+1] if c in SHIFTED_KEYS)
+            if shifted and shifted < length:
+                guesses *= sum(math.comb(length, k) for k in range(1, min(shifted, length - shifted) + 1))
+            matches.append(Match(i, j, password[i:j+1], 'spatial', guesses))
+            i = j
+        else:
+            i += 1
+    return matches
+
+def sequence_matches(password: str) -> list:
+    matches = []
+    n = len(password)
+    i = 0
+    while i < n - 2:
+        delta = ord(password[i+1]) - ord(password[i])
+        j = i + 1
+        if 0 < abs(delta) <= 5:
+            while j + 1 < n and ord(password[j+1]) - ord(password[j]) == delta:
+                j += 1
+        if j - i >= 2:
+            token = password[i:j+1]
+            if token[0] in 'aAzZ019':
+                base = 4
+            elif token[0].isdigit():
+                base = 10
+            else:
+                base = 26
+            guesses = base * len(token) * (1 if delta > 0 else 2)
+            matches.append(Match(i, j, token, 'sequence', guesses))
+            i = j
+        else:
+            i += 1
+    return matches
+
+REPEAT_GREEDY = re.compile(r'(.+)\1+')
+REPEAT_LAZY = re.compile(r'(.+?)\1+')
+
+def repeat_matches(password: str) -> list:
+    matches = []
+    pos = 0
+    while pos < len(password):
+        lazy = REPEAT_LAZY.search(password, pos)
+        if not lazy:
+            break
+        # both find the leftmost repeat, so the greedy one only has to be tried from there
+        greedy = REPEAT_GREEDY.match(password, lazy.start())
+        if len(greedy.group(0)) > len(lazy.group(0)):
+            # 'abcabc': the greedy run is longer, its unit is the shortest repeat inside it
+            found = greedy
+            base = REPEAT_LAZY.fullmatch(found.group(0)).group(1)
+        else:
+            # 'aaaaaaa': greedy would split this into 'aaa' twice
+            found, base = lazy, lazy.group(1)
+        whole = found.group(0)
+        base_guesses = estimate_guesses(base)['guesses']
+        matches.append(Match(found.start(), found.end() - 1, whole, 'repeat',
+                             base_guesses * (len(whole) // len(base)), base))
+        pos = found.end()
+    return matches
+
+DATE_WITH_SEPARATOR = re.compile(r'(\d{1,4})([\s/\\_.-])(\d{1,2})\2(\d{1,4})')
+YEAR = re.compile(r'19\d\d|20\d\d')
+DIGIT_RUN = re.compile(r'\d{4,}')
+# token length -> sizes of the day/month/year parts it can be cut into, in scan order
+DATE_SPLITS = {length: [(a, b - a, length - b) for a in range(1, length - 1) for b in range(a + 1, length)
+                        if all(size in (1, 2, 4) for size in (a, b - a, length - b))]
+               for length in range(4, 9)}
+
+def _valid_date(a: int, b: int, c: int):
+    """Interpret three numbers as some ordering of day, month, year"""
+    for year, month, day in ((c, b, a), (c, a, b), (a, b, c)):
+        if 1 <= month <= 12 and 1 <= day <= 31:
+            if year < 100:
+                year += 1900 if year > 50 else 2000
+            if 1000 <= year <= 2050:
+                return year
+    return None
+
+def _date_guesses(year: int, separator: bool) -> float:
+    return 365 * max(abs(year - REFERENCE_YEAR), MIN_YEAR_SPACE) * (4 if separator else 1)
+
+def date_matches(password: str) -> list:
+    matches = []
+    for m in DATE_WITH_SEPARATOR.finditer(password):
+        year = _valid_date(int(m.group(1)), int(m.group(3)), int(m.group(4)))
+        if year:
+            matches.append(Match(m.start(), m.end() - 1, m.group(0), 'date', _date_guesses(year, True)))
+    for run in DIGIT_RUN.finditer(password):
+        digits, offset = run.group(0), run.start()
+        n = len(digits)
+        # parts[size][k] describes digits[k:k+size]: (could be a month, could be a day, year or 0).
+        # Worked out once per run, the scan below is then table lookups only
+        parts = {}
+        for size in (1, 2, 4):
+            parts[size] = []
+            for k in range(n - size + 1):
+                number = int(digits[k:k+size])
+                year = number + (1900 if number > 50 else 2000) if number < 100 else number
+                parts[size].append((1 <= number <= 12, 1 <= number <= 31, year if 1000 <= year <= 2050 else 0))
+        for length, splits in DATE_SPLITS.items():
+            # year of the first split that reads as a date, for every start at once
+            years = [0] * (n - length + 1)
+            for size1, size2, size3 in splits:
+                firsts, middles, lasts = parts[size1], parts[size2][size1:], parts[size3][size1 + size2:]
+                # same orderings as _valid_date: year last (day or month first), then year first
+                years = [year or (c[2] if c[2] and ((b[0] and a[1]) or (a[0] and b[1])) else
+                                  a[2] if a[2] and b[0] and c[1] else 0)
+                         for year, a, b, c in zip(years, firsts, middles, lasts)]
+            for i, year in enumerate(years):
+                if year:
+                    matches.append(Match(offset + i, offset + i + length - 1, digits[i:i+length], 'date',
+                                         _date_guesses(year, False)))
+    for m in YEAR.finditer(password):
+        year = int(m.group(0))
+        matches.append(Match(m.start(), m.end() - 1, m.group(0), 'year',
+                             max(abs(year - REFERENCE_YEAR), MIN_YEAR_SPACE)))
+    return matches
+
+
+def omnimatch(password: str) -> list:
+    matches = []
+    for matcher in (dictionary_matches, l33t_matches, spatial_matches, sequence_matches,
+                    repeat_matches, date_matches):
+        matches.extend(matcher(password))
+    return matches
+
+
+"""     SEARCH BELOW       """
+def most_guessable_sequence(password: str, matches: list):
+    """Cheapest cover of the password by matches and brute-force runs.
+
+    Minimizes log10(l! * product of guesses) where l is the number of pieces,
+    the same objective as zxcvbn, with brute force extended one char at a time.
+    """
+    n = len(password)
+    by_end = [[] for _ in range(n)]
+    for match in matches:
+        by_end[match.j].append(match)
+
+    log_bf = math.log10(BRUTEFORCE_CARDINALITY)
+    log_factorial = [0.0] * (n + 2)
+    for count in range(2, n + 2):
+        log_factorial[count] = log_factorial[count - 1] + math.log10(count)
+
+    # best[k] / bf[k]: cheapest cover of password[:k+1] overall / ending in a
+    # brute-force run, as (log10 product, piece count, last piece, its start)
+    best = [None] * n
+    bf = [None] * n
+    empty = (0.0, 0, None, 0)
+
+    for k in range(n):
+        prev = best[k-1] if k else empty
+        choice = (prev[0] + log_bf, prev[1] + 1, 'bf', k)
+        if k:
+            run = bf[k-1]
+            if run[0] + log_bf + log_factorial[run[1]] < choice[0] + log_factorial[choice[1]]:
+                choice = (run[0] + log_bf, run[1], 'bf', run[3])
+        bf[k] = choice
+        cost = choice[0] + log_factorial[choice[1]]
+
+        for match in by_end[k]:
+            prev = best[match.i - 1] if match.i else empty
+            log_product = prev[0] + math.log10(match.guesses)
+            if log_product + log_factorial[prev[1] + 1] < cost:
+                choice = (log_product, prev[1] + 1, match, match.i)
+                cost = log_product + log_factorial[prev[1] + 1]
+        best[k] = choice
+
+    # walk back to recover the pieces
+    pieces = []
+    k = n - 1
+    while k >= 0:
+        state = best[k]
+        if state[2] == 'bf':
+            start = state[3]
+            token = password[start:k+1]
+            pieces.append(Match(start, k, token, 'bruteforce', BRUTEFORCE_CARDINALITY ** len(token)))
+        else:
+            pieces.append(state[2])
+        k = pieces[-1].i - 1
+    pieces.reverse()
+    return best[n-1][0] + log_factorial[best[n-1][1]], pieces
+
+
+def estimate_guesses(password: str) -> dict:
+    """{'guesses', 'guesses_log10', 'sequence'} for a password"""
+    if not password:
+        return {'guesses': 1, 'guesses_log10': 0.0, 'sequence': []}
+    log_guesses, pieces = most_guessable_sequence(password, omnimatch(password))
+    return {
+        # past ~1e308 the float overflows, nobody needs the exact figure there
+        'guesses': 10 ** log_guesses if log_guesses < MAX_GUESSES_LOG10 else math.inf,
+        'guesses_log10': log_guesses,
+        'sequence': pieces,
+    }
@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+MASTER = 'correct horse battery'
+CHEAP_KDF = {'iterations': 1000}
+
+
+@pytest.fixture
+def workdir(tmp_path, monkeypatch):
+    """Run in an empty directory: the vault files are all relative paths"""
+    import storage
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(storage, '_backend', None)
+    return tmp_path
+
+
+@pytest.fixture
+def session(workdir):
+    """A new vault with a cheap KDF, unlocked"""
+    from vault import init_master_password
+    session = init_master_password(MASTER, 'pbkdf2', CHEAP_KDF)
+    yield session
+    session.lock()
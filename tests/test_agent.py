@@ -0,0 +1,82 @@
+import os
+import socket
+
+import pytest
+
+from agent import AgentError, agent_available, check_private_dir
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, 'AF_UNIX'), reason="needs Unix sockets")
+
+
+def test_stale_socket_is_removed(tmp_path):
+    directory = tmp_path / 'agent'
+    directory.mkdir(mode=0o700)
+    path = str(directory / 'agent.sock')
+    with socket.socket(socket.AF_UNIX) as sock:
+        sock.bind(path)  # bound but never listening, like an agent that was killed
+    assert not agent_available(path)
+    assert not os.path.exists(path)
+
+
+def test_shared_directory_is_refused(tmp_path):
+    directory = tmp_path / 'agent'
+    directory.mkdir()
+    directory.chmod(0o755)
+    with pytest.raises(AgentError):
+        check_private_dir(str(directory))
+
+
+def test_symlinked_directory_is_refused(tmp_path):
+    target = tmp_path / 'real'
+    target.mkdir(mode=0o700)
+    link = tmp_path / 'agent'
+    link.symlink_to(target)
+    with pytest.raises(AgentError):
+        check_private_dir(str(link))
+
+
+def _private_socket(tmp_path):
+    directory = tmp_path / 'agent'
+    directory.mkdir(mode=0o700)
+    return str(directory / 'agent.sock')
+
+
+def test_unexpected_error_still_gets_an_answer(session, tmp_path, monkeypatch):
+    import threading
+    import time
+    from agent import Agent, agent_call, start_agent
+    from conftest import MASTER
+    from vault import Vault, open_session
+
+    real = Agent.handle
+
+    def handle(self, request):
+        if request.get('op') == 'boom':
+            raise RuntimeError("went wrong")
+        return real(self, request)
+
+    monkeypatch.setattr(Agent, 'handle', handle)
+    path = _private_socket(tmp_path)
+    agent_session = open_session(MASTER)
+    thread = threading.Thread(target=start_agent, args=(agent_session, Vault(session=agent_session), path),
+                              kwargs={'daemon': False})
+    thread.start()
+    try:
+        for _ in range(200):
+            if os.path.exists(path):
+                break
+            time.sleep(0.01)
+        with pytest.raises(AgentError, match="RuntimeError: went wrong"):
+            agent_call({'op': 'boom'}, path, timeout=2.0)
+        assert agent_call({'op': 'ping'}, path) == {'entries': 0}
+    finally:
+        agent_call({'op': 'lock'}, path)
+        thread.join(5)
+    assert not thread.is_alive()
+
+
+def test_stop_without_an_agent_says_so(workdir, tmp_path, capsys):
+    import cli
+    path = _private_socket(tmp_path)
+    assert cli.run(['agent', '--stop', '--socket', path]) == 1
+    assert capsys.readouterr().err == f"error: No agent running at {path}\n"
@@ -0,0 +1,73 @@
+import io
+import os
+
+import pytest
+
+from attachments import (add_attachment, attachment_path, decrypt_stream, encrypt_stream,
+                         extract_attachment, remove_attachment)
+from entry import Entry
+from vault import Vault, new_entry
+
+
+def _vault_with_attachment(session, data=b'ssh key'):
+    vault = Vault()
+    entry = vault.add(new_entry('github', 'me', 'hunter22', session))
+    vault.flush()
+    entry = Entry.from_dict(entry.to_dict())
+    ref = add_attachment(entry, io.BytesIO(data), 'id_ed25519', session)
+    vault.update(entry)
+    vault.flush()
+    return vault, entry.id, ref
+
+
+@pytest.mark.parametrize('size', [0, 1, 64 * 1024, 64 * 1024 + 1, 200000])
+def test_stream_round_trip(size):
+    key = os.urandom(32)
+    data = os.urandom(size)
+    sealed = io.BytesIO()
+    encrypt_stream(io.BytesIO(data), sealed, key)
+    out = io.BytesIO()
+    assert decrypt_stream(io.BytesIO(sealed.getvalue()), out, key) == size
+    assert out.getvalue() == data
+
+
+def test_truncated_stream_fails():
+    key = os.urandom(32)
+    sealed = io.BytesIO()
+    encrypt_stream(io.BytesIO(os.urandom(3 * 64 * 1024)), sealed, key)
+    cut = sealed.getvalue()[:-(64 * 1024 + 16)]
+    with pytest.raises(ValueError):
+        decrypt_stream(io.BytesIO(cut), io.BytesIO(), key)
+
+
+def test_attachment_survives_update_without_the_field(session):
+    vault, entry_id, ref = _vault_with_attachment(session)
+    # what the menu's update used to send: only the fixed fields
+    edited = {k: vault.get(entry_id)[k] for k in ('id', 'service', 'username', 'password', 'created', 'strength')}
+    edited['username'] = 'someone else'
+    vault.update(edited)
+    vault.flush()
+
+    reloaded = Vault().get(entry_id)
+    assert reloaded['username'] == 'someone else'
+    assert reloaded['attachments'][0]['id'] == ref['id']
+    out = io.BytesIO()
+    extract_attachment(reloaded['attachments'][0], session, out)
+    assert out.getvalue() == b'ssh key'
+
+
+def test_detach_deletes_the_file(session):
+    vault, entry_id, ref = _vault_with_attachment(session)
+    entry = Entry.from_dict(vault.get(entry_id).to_dict())
+    remove_attachment(entry, 'id_ed25519')
+    vault.update(entry)
+    vault.flush()
+    assert not os.path.exists(attachment_path(ref['id']))
+    assert Vault().get(entry_id).get('attachments') is None
+
+
+def test_delete_entry_deletes_the_file(session):
+    vault, entry_id, ref = _vault_with_attachment(session)
+    vault.delete(entry_id)
+    vault.flush()
+    assert not os.path.exists(attachment_path(ref['id']))
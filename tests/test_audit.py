@@ -0,0 +1,52 @@
+import json
+
+import pytest
+from cryptography.fernet import Fernet
+
+import password_analyzer
+import strength_estimator
+from audit import audit_vault, format_report
+from vault import Vault, new_entry
+
+STRONG = 'c0rrect-H0rse-battery-st4ple!'
+
+
+@pytest.fixture
+def audited_vault(session, workdir, monkeypatch):
+    """Two entries sharing a password, a common one, a short one and one under a key we don't have"""
+    (workdir / 'common_passwords.txt').write_text('password\nletmein\n')
+    monkeypatch.setattr(password_analyzer, '_common_index', None)
+    monkeypatch.setattr(password_analyzer, '_breach_corpus', False)
+    monkeypatch.setattr(strength_estimator, '_dictionaries', None)
+
+    vault = Vault(session=session)
+    for service, password in (('github', STRONG), ('gitlab', STRONG), ('mail', 'letmein'),
+                              ('bank', 'Tq9#vLm2$wXe7!pR'), ('forum', 'abc')):
+        vault.add(new_entry(service, 'me', password, session))
+    foreign = new_entry('lost', 'me', 'x', session)
+    foreign['password'] = Fernet(Fernet.generate_key()).encrypt(b'x').decode()
+    vault.add(foreign)
+    vault.flush()
+    return vault
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_report_flags_reused_common_and_weak(session, audited_vault, workers):
+    report = audit_vault(session, workers)
+    by_service = {item['service']: item for item in report['entries']}
+    assert report['total'] == 6 and report['errors'] == 1
+    assert by_service['lost']['error'] == 'cannot decrypt'
+    assert report['reused'] == 2
+    assert [sorted(by_service[s]['id'] for s in ('github', 'gitlab'))] == [sorted(g) for g in report['reused_groups']]
+    assert by_service['mail']['is_common'] and report['common'] == 1
+    assert not by_service['bank']['reused'] and not by_service['bank']['is_common']
+    assert by_service['forum']['score'] < by_service['bank']['score']
+    assert report['weak'] >= 2
+
+    # plaintexts never make it into the report
+    dumped = json.dumps(report)
+    assert STRONG not in dumped and 'letmein' not in dumped
+    text = format_report(report)
+    assert '#6 lost (me): cannot decrypt' in text
+    assert 'github (me)' in text and 'reused' in text
+    assert 'bank' not in text
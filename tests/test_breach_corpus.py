@@ -0,0 +1,63 @@
+import hashlib
+import random
+
+import pytest
+
+import password_analyzer
+from breach_corpus import BreachCorpus, build_corpus
+
+
+def sha1(text: str) -> bytes:
+    return hashlib.sha1(text.encode()).digest()
+
+
+@pytest.fixture
+def corpus(tmp_path):
+    rng = random.Random(5)
+    passwords = [f'leaked{rng.randrange(10 ** 6)}' for _ in range(3000)]
+    hashed = 'Tr0ub4dor&3'
+    lines = passwords + passwords[:500] + ['', f'{sha1(hashed).hex().upper()}:42']
+    # digests at both ends of the fan-out table
+    lines += [('00' * 20), ('ff' * 20), ('0000' + 'ab' * 18), ('ffff' + '01' * 18)]
+    (tmp_path / 'leaks.txt').write_text('\n'.join(lines) + '\n')
+    # a small run size forces several sorted runs and a real merge, with duplicates across runs
+    count = build_corpus(str(tmp_path / 'leaks.txt'), str(tmp_path / 'corpus.bin'), run_size=700)
+    opened = BreachCorpus(str(tmp_path / 'corpus.bin'))
+    yield opened, set(passwords), hashed, count
+    opened.close()
+
+
+def test_every_password_is_found_once(corpus):
+    opened, passwords, hashed, count = corpus
+    assert count == len(opened) == len(passwords) + 5
+    assert all(password in opened for password in passwords)
+    assert all(password.upper() in opened for password in list(passwords)[:100])  # lists are case-folded
+    assert hashed in opened and hashed.lower() not in opened
+    rng = random.Random(6)
+    assert not any(f'leaked{n}' in opened for n in (rng.randrange(10 ** 6, 10 ** 7) for _ in range(2000)))
+
+
+def test_fanout_buckets_cover_the_records(corpus):
+    opened, _, _, count = corpus
+    fanout = opened._fanout
+    assert fanout[0] == 0 and fanout[-1] == count
+    assert all(a <= b for a, b in zip(fanout, fanout[1:]))
+    for digest in (bytes(20), b'\xff' * 20, bytes.fromhex('0000' + 'ab' * 18), bytes.fromhex('ffff' + '01' * 18)):
+        assert opened.contains_digest(digest)
+    assert not opened.contains_digest(bytes.fromhex('0000' + 'ab' * 17 + 'ac'))
+    assert not opened.contains_digest(b'\xff' * 19 + b'\xfe')
+
+
+def test_analyzer_consults_the_corpus(corpus, tmp_path, monkeypatch):
+    opened, passwords, _, _ = corpus
+    monkeypatch.setattr(password_analyzer, '_breach_corpus', opened)
+    password = sorted(passwords)[0]
+    assert password_analyzer.is_password_common(password)
+    assert not password_analyzer.is_password_common('not in any leak 8c1f')
+    assert list(password_analyzer.score_many([password, 'not in any leak 8c1f'])['is_common']) == [True, False]
+
+
+def test_not_a_corpus_file(tmp_path):
+    (tmp_path / 'other.bin').write_bytes(b'PMVB' + bytes(100))
+    with pytest.raises(ValueError):
+        BreachCorpus(str(tmp_path / 'other.bin'))
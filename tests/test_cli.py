@@ -0,0 +1,35 @@
+import getpass
+
+import cli
+
+
+def test_closed_stdin_at_a_prompt_is_an_error(session, monkeypatch, capsys):
+    def closed(*args, **kwargs):
+        raise EOFError
+    monkeypatch.setattr(getpass, 'getpass', closed)
+    assert cli.run(['get', 'github']) == 1
+    assert capsys.readouterr().err == "error: no input\n"
+
+
+def test_detach_needs_the_master_password(session, monkeypatch):
+    import io
+    import os
+    from conftest import MASTER
+    from attachments import add_attachment, attachment_path
+    from entry import Entry
+    from vault import Vault, new_entry
+
+    vault = Vault()
+    entry = Entry.from_dict(vault.add(new_entry('github', 'me', 'hunter22', session)).to_dict())
+    ref = add_attachment(entry, io.BytesIO(b'ssh key'), 'id_ed25519', session)
+    vault.update(entry)
+    vault.flush()
+
+    monkeypatch.setattr(getpass, 'getpass', lambda *args, **kwargs: 'wrong')
+    assert cli.run(['detach', 'github', 'id_ed25519']) == 1
+    assert os.path.exists(attachment_path(ref['id']))
+
+    monkeypatch.setattr(getpass, 'getpass', lambda *args, **kwargs: MASTER)
+    assert cli.run(['detach', 'github', 'id_ed25519']) == 0
+    assert not os.path.exists(attachment_path(ref['id']))
+    assert Vault().get(entry.id).get('attachments') is None
@@ -0,0 +1,179 @@
+import io
+
+import pytest
+
+from conftest import MASTER, CHEAP_KDF
+from attachments import add_attachment, extract_attachment
+from crypto import KeySession, key_index, make_verifier, new_kdf_header
+from entry import Entry
+from storage import load_config, save_kdf_header
+from vault import (Vault, file_fingerprint, new_entry, open_session, rotate_data_key, reencrypt_vault,
+                   change_master_password)
+
+
+def _fill(session, count=30):
+    vault = Vault(session=session)
+    for i in range(count):
+        vault.add(new_entry(f'svc{i}', 'me', f'pw{i}', session))
+    vault.flush()
+    return vault
+
+
+def _all_decrypt(session):
+    return all(entry.decrypt(session) == f'pw{entry.id - 1}' for entry in Vault())
+
+
+def test_master_password_change_leaves_the_vault_alone(session):
+    paths = _fill(session).backend.paths
+    before = file_fingerprint(paths)
+    change_master_password(session, 'a whole new one', new_kdf_header('pbkdf2', CHEAP_KDF))
+    assert file_fingerprint(paths) == before
+    assert open_session(MASTER) is None
+    fresh = open_session('a whole new one')
+    assert _all_decrypt(fresh)
+
+
+def test_rotation_moves_entries_and_attachment_keys(session):
+    vault = _fill(session)
+    entry = Entry.from_dict(vault.get(1).to_dict())
+    add_attachment(entry, io.BytesIO(b'note'), 'note', session)
+    vault.update(entry)
+    vault.flush()
+
+    rotate_data_key(session)
+    assert len(load_config()['wrapped_keys']) == 2
+    assert reencrypt_vault(session, batch_size=7) == 30
+    assert len(load_config()['wrapped_keys']) == 1
+    assert not load_config().get('reencrypt_pending')
+
+    fresh = open_session(MASTER)
+    assert all(key_index(e['password'], fresh) == 0 for e in Vault())
+    out = io.BytesIO()
+    extract_attachment(Vault().get(1)['attachments'][0], fresh, out)
+    assert out.getvalue() == b'note'
+
+
+def test_session_opened_before_a_rotation_keeps_writing_readable_entries(session):
+    _fill(session)
+    stale = open_session(MASTER)
+    stale_vault = Vault(session=stale)
+
+    # another process rotates and finishes while `stale` is still open
+    rotator = open_session(MASTER)
+    rotate_data_key(rotator)
+    reencrypt_vault(rotator)
+
+    stale_vault.add(new_entry('late', 'me', 'pw30', stale))
+    stale_vault.flush()
+
+    fresh = open_session(MASTER)
+    assert _all_decrypt(fresh)
+
+
+def test_old_vault_without_data_keys_is_migrated(workdir):
+    old = KeySession(MASTER, new_kdf_header('pbkdf2', CHEAP_KDF))
+    save_kdf_header(old.kdf, make_verifier(old.master_key))
+    _fill(old)
+    session = open_session(MASTER)
+    assert session.enveloped and load_config().get('reencrypt_pending')
+    assert _all_decrypt(session)
+    reencrypt_vault(session)
+    assert all(key_index(e['password'], session) == 0 for e in Vault())
+    assert _all_decrypt(open_session(MASTER))
+
+
+def test_rotating_attachment_keys_leaves_shared_refs_alone(session):
+    from attachments import rotate_keys
+    entry = Entry.from_dict(new_entry('svc', 'me', 'pw', session))
+    add_attachment(entry, io.BytesIO(b'note'), 'note', session)
+    copy = Entry.from_dict(entry.to_dict())  # shallow: shares the ref dicts
+    before = entry['attachments'][0]['key']
+
+    rotate_data_key(session)
+    rotate_keys(copy, session)
+    assert entry['attachments'][0]['key'] == before
+    assert copy['attachments'][0]['key'] != before
+    assert key_index(copy['attachments'][0]['key'], session) == 0
+
+
+def test_reload_takes_the_new_data_key_under_the_lock(session, monkeypatch):
+    import vault as vault_module
+    vault = _fill(session, 3)
+    held = []
+    real = vault_module.refresh_data_key
+
+    def spy(session, entries):
+        held.append(vault.backend.lock._exclusive)
+        return real(session, entries)
+
+    monkeypatch.setattr(vault_module, 'refresh_data_key', spy)
+    vault.reload()
+    assert held == [True]
+
+
+def _legacy_vault(monkeypatch, count=5):
+    """A vault from before KDF headers: SHA-256 hash in the config, entries under the fixed-salt key"""
+    import crypto
+    import storage
+    from cryptography.fernet import Fernet
+
+    monkeypatch.setitem(crypto.LEGACY_KDF, 'params', CHEAP_KDF)
+    monkeypatch.setitem(crypto.KDF_DEFAULTS, 'pbkdf2', CHEAP_KDF)
+    storage.save_master_password_hash(crypto.hash_password(MASTER))
+    fernet = Fernet(crypto.generatekey(MASTER))
+    storage.get_backend().apply([{'id': i + 1, 'service': f'svc{i}', 'username': 'me', 'created': '',
+                                  'strength': 'Weak', 'password': fernet.encrypt(f'pw{i}'.encode()).decode()}
+                                 for i in range(count)], [], [])
+
+
+def test_legacy_vault_is_rekeyed_on_login(workdir, monkeypatch):
+    import crypto
+    _legacy_vault(monkeypatch)
+    assert open_session('wrong') is None
+    assert 'kdf' not in load_config()
+
+    session = open_session(MASTER)
+    config = load_config()
+    assert config['kdf']['version'] == crypto.KDF_VERSION and config['kdf'] != crypto.LEGACY_KDF
+    assert 'master_password_hash' not in config and 'pending_kdf' not in config
+    assert all(key_index(e['password'], session) == 0 for e in Vault())
+    assert _all_decrypt(session)
+    assert _all_decrypt(open_session(MASTER))
+
+
+def test_interrupted_rekey_finishes_on_the_next_login(workdir, monkeypatch):
+    import vault as vault_module
+    _legacy_vault(monkeypatch)
+
+    def crash(*args, **kwargs):
+        raise RuntimeError("power cut")
+
+    # the entries are rewritten, the new header never gets saved
+    with monkeypatch.context() as patched:
+        patched.setattr(vault_module, 'save_kdf_header', crash)
+        with pytest.raises(RuntimeError):
+            open_session(MASTER)
+    assert load_config().get('pending_kdf') and load_config().get('master_password_hash')
+
+    session = open_session(MASTER)
+    assert not load_config().get('pending_kdf')
+    assert _all_decrypt(session)
+
+
+def test_calibration_scales_with_the_time_per_run(monkeypatch):
+    import time
+    import crypto
+
+    def fake_kdf(password, kdf):
+        # a microsecond per unit of work
+        params = kdf['params']
+        time.sleep(params.get('iterations', params.get('n', 0)) / 1e6)
+
+    monkeypatch.setattr(crypto, 'derive_key', fake_kdf)
+    iterations = crypto.calibrate_kdf('pbkdf2', 0.5)['iterations']
+    assert 200000 < iterations <= 500000
+    assert crypto.calibrate_kdf('pbkdf2', 0.01) == {'iterations': 100000}  # never below the old default
+    assert crypto.calibrate_kdf('scrypt', 0.2)['n'] in (2 ** 16, 2 ** 17)
+    assert crypto.calibrate_kdf('scrypt', 0.001)['n'] == 2 ** 14
+    with pytest.raises(ValueError):
+        crypto.calibrate_kdf('md5')
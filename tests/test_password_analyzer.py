@@ -0,0 +1,60 @@
+import random
+import string
+import time
+
+import pytest
+
+import password_analyzer
+from password_analyzer import calculate_strength
+
+np = pytest.importorskip('numpy')
+
+
+@pytest.fixture
+def wordlist(workdir, monkeypatch):
+    (workdir / 'common_passwords.txt').write_text('password\n123456\nqwerty\nletmein\n')
+    monkeypatch.setattr(password_analyzer, '_common_index', None)
+    return workdir
+
+
+def test_score_many_matches_calculate_strength(wordlist):
+    rng = random.Random(4)
+    alphabet = string.ascii_letters + string.digits + '!@#$ é€'
+    passwords = ['', 'a', 'abc', 'password', 'PASSWORD', 'Password1!', 'qwerty123', 'ÀÉÎõü', 'xY9!' * 5]
+    passwords += [''.join(rng.choice(alphabet) for _ in range(rng.randint(0, 20))) for _ in range(500)]
+
+    result = password_analyzer.score_many(passwords, estimate=True)
+    for i, password in enumerate(passwords):
+        expected = calculate_strength(password)
+        assert (result['score'][i], result['rating'][i]) == (expected['score'], expected['rating']), password
+        assert result['is_common'][i] == expected['is_common']
+
+
+def test_rules_only_is_an_upper_bound(wordlist):
+    passwords = ['', 'password', 'aaaaaaaaaaaa', 'Tr0ub4dor&3', 'correct horse battery staple']
+    rules = password_analyzer.score_many(passwords)
+    assert 'guesses_log10' not in rules
+    assert rules['score'][0] == 0
+    for password, score in zip(passwords, rules['score']):
+        assert score >= calculate_strength(password)['score']
+
+
+def test_score_many_handles_lowercase_that_changes_length(wordlist):
+    passwords = ['İpassword', 'İİİabc', 'ﬃ123456']
+    result = password_analyzer.score_many(passwords, estimate=True)
+    assert list(result['score']) == [calculate_strength(p)['score'] for p in passwords]
+
+
+def test_batch_is_an_order_of_magnitude_faster(wordlist):
+    import benchmark
+    passwords = benchmark.sample_passwords(random.Random(1), 2000)
+    password_analyzer.score_many(passwords[:10])  # numpy import and tables
+
+    start = time.perf_counter()
+    for password in passwords:
+        calculate_strength(password)
+    loop = time.perf_counter() - start
+    start = time.perf_counter()
+    password_analyzer.score_many(passwords)
+    batch = time.perf_counter() - start
+    assert loop / batch >= 10
@@ -0,0 +1,36 @@
+import os
+
+import pytest
+
+import password_generator
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs fork")
+def test_forked_child_does_not_reuse_the_buffer():
+    password_generator.random_password()  # fill the shared buffer
+    read_end, write_end = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        os.close(read_end)
+        os.write(write_end, password_generator.random_password(32).encode())
+        os._exit(0)
+    os.close(write_end)
+    child = os.read(read_end, 64).decode()
+    os.close(read_end)
+    os.waitpid(pid, 0)
+    assert len(child) == 32
+    assert child != password_generator.random_password(32)
+
+
+def test_explicit_wordlist_must_exist(workdir, capsys):
+    import cli
+    with pytest.raises(FileNotFoundError):
+        password_generator.load_wordlist('missing.txt')
+    (workdir / 'empty.txt').write_text('\n')
+    with pytest.raises(ValueError):
+        password_generator.load_wordlist('empty.txt')
+    assert cli.run(['generate', '--mode', 'diceware', '--wordlist', 'missing.txt']) == 1
+    assert 'missing.txt' in capsys.readouterr().err
+
+    (workdir / 'words.txt').write_text('11111 apple\n11112 berry\n')
+    assert password_generator.load_wordlist('words.txt') == ['apple', 'berry']
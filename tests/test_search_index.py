@@ -0,0 +1,34 @@
+from search_index import SearchIndex
+
+ENTRIES = [
+    {'id': 1, 'service': 'YouTube', 'username': 'bob'},
+    {'id': 2, 'service': 'GitHub', 'username': 'alice@example.com'},
+    {'id': 3, 'service': 'Tubby Toast', 'username': 'carol'},
+    {'id': 4, 'service': 'Netflix', 'username': 'bob@example.com'},
+]
+
+
+def test_prefix_then_fuzzy():
+    index = SearchIndex(ENTRIES)
+    assert index.search('git') == [2]
+    assert index.search('gthub') == [2]
+    assert set(index.search('example')) == {2, 4}
+
+
+def test_short_substring_finds_long_term():
+    # 'tub' shares a single trigram with 'youtube', under the fuzzy cutoff
+    index = SearchIndex(ENTRIES)
+    assert index.search('tub') == [3, 1]
+    assert index.search('utu') == [1]
+
+
+def test_add_and_remove_match_a_rebuild():
+    index = SearchIndex(ENTRIES[:2])
+    for entry in ENTRIES[2:]:
+        index.add(entry)
+    index.add({'id': 1, 'service': 'Vimeo', 'username': 'bob'})
+    index.remove(4)
+    rebuilt = SearchIndex([{'id': 1, 'service': 'Vimeo', 'username': 'bob'}] + ENTRIES[1:3])
+    for query in ('tub', 'vimeo', 'bob', 'example', 'net', 'alcie'):
+        assert index.search(query) == rebuilt.search(query)
+    assert index.search('youtube') == []
@@ -0,0 +1,182 @@
+import json
+import os
+
+import pytest
+from cryptography.fernet import Fernet
+
+import storage
+from entry import Entry
+from storage import BACKENDS, VaultConflictError
+
+TOKEN = Fernet(Fernet.generate_key()).encrypt(b'hunter2').decode()
+
+
+def make_entry(entry_id: int, **fields) -> dict:
+    entry = {'id': entry_id, 'service': f'service-{entry_id}', 'username': 'bob@example.com',
+             'password': TOKEN, 'created': '2024-01-01 10:00', 'strength': 'Strong'}
+    entry.update(fields)
+    return entry
+
+def as_dicts(entries) -> list:
+    return sorted((Entry.from_dict(entry).to_dict() for entry in entries), key=lambda entry: entry['id'])
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def backend_class(request, workdir):
+    return BACKENDS[request.param]
+
+def reopen(backend):
+    if hasattr(backend, 'close'):
+        backend.close()
+    return type(backend)()
+
+
+def test_round_trip(backend_class):
+    backend = backend_class()
+    entries = [make_entry(1), make_entry(2, service='Zürich Bank ✓', attachments=[{'id': 'a', 'name': 'x'}]),
+               make_entry(3, password='not a fernet token')]
+    backend.apply(entries, [], [])
+    backend.apply([make_entry(4)], [make_entry(1, username='alice')], [3])
+
+    expected = as_dicts([make_entry(1, username='alice'), entries[1], make_entry(4)])
+    backend = reopen(backend)
+    assert as_dicts(backend.load_all()) == expected
+    backend.checkpoint()
+    backend = reopen(backend)
+    assert as_dicts(backend.load_all()) == expected
+    assert backend.revision() == 2
+
+
+def test_ids_are_not_reused(backend_class):
+    backend = backend_class()
+    backend.apply([make_entry(1), make_entry(2)], [], [])
+    backend.delete(2)
+    backend = reopen(backend)
+    assert backend.next_id() == 3
+    backend.checkpoint()
+    assert reopen(backend).next_id() == 3
+
+
+def test_stale_revision_is_refused(backend_class):
+    backend = backend_class()
+    revision = backend.apply([make_entry(1)], [], [])
+    other = backend_class()
+    other.apply([], [make_entry(1, username='alice')], [], expected_revision=revision)
+    with pytest.raises(VaultConflictError):
+        backend.apply([], [make_entry(1, username='carol')], [], expected_revision=revision)
+    assert as_dicts(reopen(backend).load_all())[0]['username'] == 'alice'
+
+
+def test_binary_refuses_oversized_fields_before_committing(workdir):
+    backend = BACKENDS['binary']()
+    backend.apply([make_entry(1)], [], [])
+    with pytest.raises(ValueError):
+        backend.apply([make_entry(2, service='x' * 70000)], [], [])
+    with pytest.raises(ValueError):
+        backend.update(make_entry(1, created='x' * 300))
+    assert backend.revision() == 1
+    backend.checkpoint()  # would fail here if the bad entry had reached the journal
+    assert as_dicts(reopen(backend).load_all()) == as_dicts([make_entry(1)])
+
+
+@pytest.mark.parametrize('dest', ['binary', 'sqlite'])
+def test_migrate_and_export(workdir, dest):
+    entries = [make_entry(1), make_entry(2, notes='kept as an extra field'), make_entry(5)]
+    storage.get_backend().apply(entries, [], [])
+    storage.get_backend().delete(5)
+
+    assert storage.migrate(dest) == 2
+    assert storage.load_config()['storage_backend'] == dest
+    assert os.path.exists('data.json.bak') and not os.path.exists('data.json')
+    assert as_dicts(storage.load_entries()) == as_dicts(entries[:2])
+    assert storage.next_entry_id() == 6
+
+    assert storage.export_json('export.json') == 2
+    with open('export.json') as f:
+        exported = json.load(f)
+    assert exported['next_id'] == 6
+    assert as_dicts(exported['entries']) == as_dicts(entries[:2])
+
+
+def test_atomic_write_is_private_and_leaves_no_temp_files(workdir):
+    old_umask = os.umask(0o022)
+    try:
+        storage.atomic_write('config.json', b'{}')
+        storage.atomic_write('config.json', b'{"a": 1}')
+    finally:
+        os.umask(old_umask)
+    assert os.stat('config.json').st_mode & 0o777 == 0o600
+    assert storage.load_config() == {'a': 1}
+    with pytest.raises(RuntimeError):
+        with storage.atomic_file('config.json') as f:
+            f.write(b'partial')
+            raise RuntimeError
+    assert storage.load_config() == {'a': 1}
+    assert os.listdir('.') == ['config.json']
+
+
+def test_get_and_list_metadata_see_the_journal(backend_class):
+    backend = backend_class()
+    backend.apply([make_entry(1), make_entry(2), make_entry(3, notes='extra')], [], [])
+    backend.checkpoint()
+    backend.apply([make_entry(4)], [make_entry(2, username='alice')], [1])
+
+    backend = reopen(backend)
+    assert backend.get(1) is None
+    assert Entry.from_dict(backend.get(2)).to_dict() == make_entry(2, username='alice')
+    assert Entry.from_dict(backend.get(3)).to_dict() == make_entry(3, notes='extra')
+    assert backend.get(99) is None
+    expected = [Entry.from_dict(entry).metadata() for entry in as_dicts(backend.load_all())]
+    assert sorted(backend.list_metadata(), key=lambda entry: entry['id']) == expected
+
+
+def test_binary_header_does_not_copy_the_kdf(workdir):
+    import vault_file
+    storage.save_config({'kdf': {'name': 'pbkdf2'}})
+    backend = BACKENDS['binary']()
+    backend.apply([make_entry(1)], [], [])
+    backend.checkpoint()
+    assert 'kdf' not in vault_file.read_header('vault.pmv')
+    with vault_file.VaultFile('vault.pmv') as f:
+        assert f.ids() == [1] and f.find(2) is None
+        token = f.token(f.find(1))
+        assert Entry.from_dict(make_entry(1))._token == bytes(token)
+        token.release()
+
+
+@pytest.mark.parametrize('name', ['json', 'binary'])
+def test_torn_journal_tail_is_skipped_and_overwritten(workdir, name):
+    backend = BACKENDS[name]()
+    backend.apply([make_entry(1), make_entry(2)], [], [])
+    backend.apply([], [make_entry(1, username='alice')], [2])
+    with open(backend.journal_path, 'ab') as f:
+        f.write(b'{"upserts": [{"id": 3, "serv')  # crash in the middle of a write
+
+    expected = as_dicts([make_entry(1, username='alice')])
+    backend = reopen(backend)
+    assert as_dicts(backend.load_all()) == expected
+    assert backend.revision() == 2
+    backend.apply([make_entry(3)], [], [])
+    backend = reopen(backend)
+    assert as_dicts(backend.load_all()) == as_dicts([make_entry(1, username='alice'), make_entry(3)])
+    with open(backend.journal_path, 'rb') as f:
+        assert all(json.loads(line) for line in f)
+
+
+@pytest.mark.parametrize('name', ['json', 'binary'])
+def test_journal_left_behind_by_a_checkpoint_is_not_replayed(workdir, name):
+    backend = BACKENDS[name]()
+    backend.apply([make_entry(1), make_entry(2)], [], [])
+    backend.delete(2)
+    with open(backend.journal_path, 'rb') as f:
+        journal = f.read()
+    backend.checkpoint()
+    # crash after the new snapshot was renamed into place, before the journal was removed
+    with open(backend.journal_path, 'wb') as f:
+        f.write(journal)
+    backend.update(make_entry(1, username='alice'))
+
+    backend = reopen(backend)
+    assert as_dicts(backend.load_all()) == as_dicts([make_entry(1, username='alice')])
+    assert backend.revision() == 3
+    assert backend.next_id() == 3
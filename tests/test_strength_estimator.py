@@ -0,0 +1,87 @@
+import math
+import random
+import string
+import time
+
+import pytest
+
+import password_analyzer
+import strength_estimator
+from strength_estimator import estimate_guesses
+
+WORDS = ['password', '123456', 'dragon', 'monkey', 'letmein', 'sunshine', 'pass', 'trustno1']
+
+
+@pytest.fixture
+def wordlist(workdir, monkeypatch):
+    """A small common_passwords.txt in an empty directory, nothing cached"""
+    (workdir / 'common_passwords.txt').write_text('\n'.join(WORDS) + '\n')
+    monkeypatch.setattr(password_analyzer, '_common_index', None)
+    monkeypatch.setattr(strength_estimator, '_dictionaries', None)
+    return workdir
+
+
+def test_empty_password():
+    assert estimate_guesses('') == {'guesses': 1, 'guesses_log10': 0.0, 'sequence': []}
+
+
+def test_very_long_password_does_not_overflow(wordlist):
+    rng = random.Random(3)
+    password = ''.join(rng.choice(string.ascii_letters + string.digits + '#$%&') for _ in range(400))
+    result = estimate_guesses(password)
+    assert result['guesses_log10'] > 300
+    assert result['guesses'] == math.inf
+    assert password_analyzer.calculate_strength(password)  # the analyzer passes guesses on
+
+
+def test_common_words_are_cheap(wordlist):
+    assert estimate_guesses('dragon')['guesses'] < estimate_guesses('dqagrn')['guesses']
+    pieces = estimate_guesses('Dragon1999')['sequence']
+    assert [p.pattern for p in pieces] == ['dictionary', 'year']
+    assert estimate_guesses('l3tm31n')['sequence'][0].pattern == 'l33t'
+
+
+def test_index_and_text_wordlist_agree(wordlist, monkeypatch):
+    samples = ['password', 'P@ssw0rd', 'nimdrowssap', 'dragonmonkey', 'trustno1!', 'sunsh1ne2024',
+               'passpasspass', 'qwerty', '19/08/1987']
+    from_text = [estimate_guesses(p)['guesses_log10'] for p in samples]
+
+    password_analyzer.build_common_index()
+    monkeypatch.setattr(password_analyzer, '_common_index', None)
+    monkeypatch.setattr(strength_estimator, '_dictionaries', None)
+    assert password_analyzer.get_ranked_index() is not None
+    assert [estimate_guesses(p)['guesses_log10'] for p in samples] == pytest.approx(from_text)
+
+
+def test_version_one_index_still_loads(wordlist):
+    password_analyzer.build_common_index()
+    with open('common_passwords.idx', 'rb') as f:
+        f.read(len(password_analyzer.INDEX_MAGIC))
+        v1 = password_analyzer.INDEX_MAGIC_V1 + f.read(8)
+        count = int.from_bytes(v1[-8:], 'little')
+        v1 += f.read(8 * count)
+    with open('common_passwords.idx', 'wb') as f:
+        f.write(v1)
+    assert 'dragon' in password_analyzer.get_common_index()
+    assert password_analyzer.get_ranked_index() is None
+    assert estimate_guesses('dragon')['sequence'][0].pattern == 'dictionary'
+
+
+def test_long_digit_password_is_fast(wordlist):
+    rng = random.Random(7)
+    password = ''.join(rng.choice('0123456789') for _ in range(64))
+    estimate_guesses(password)
+    start = time.perf_counter()
+    for _ in range(10):
+        estimate_guesses(password)
+    # the target is well under a millisecond, this only catches a blow-up
+    assert (time.perf_counter() - start) / 10 < 0.02
+
+
+@pytest.mark.parametrize('password', ['İpassword', 'passwordİ', 'İ1dragonİ2', 'ǅp4ssw0rd'])
+def test_lowercase_that_changes_length(wordlist, password):
+    # 'İ'.lower() is two characters, match positions must still line up with the password
+    pieces = estimate_guesses(password)['sequence']
+    assert ''.join(piece.token for piece in pieces) == password
+    assert any(piece.pattern in ('dictionary', 'l33t') for piece in pieces)
+    assert password_analyzer.calculate_strength(password)['is_common'] is False
@@ -0,0 +1,64 @@
+import csv
+import json
+import os
+
+import pytest
+
+import storage
+from conftest import MASTER
+from transfer import export_entries, import_entries, read_rows
+from vault import Vault, init_master_password
+
+ROWS = [('github', 'me@example.com', 'hunter22'), ('Zürich Bank', 'ünï', 'pa,ss"word'),
+        ('mail', '', 'line\nbreak'), ('shop', 'bob', ' spaced ')]
+
+
+def decrypted(session) -> list:
+    return sorted((e.service, e.username, e.decrypt(session)) for e in Vault())
+
+
+@pytest.mark.parametrize('fmt', ['csv', 'jsonl', 'json'])
+@pytest.mark.parametrize('workers', [1, 2])
+def test_export_import_round_trip(session, tmp_path, monkeypatch, fmt, workers):
+    source = tmp_path / 'source.jsonl'
+    source.write_text(''.join(json.dumps({'service': s, 'username': u, 'password': p}) + '\n' for s, u, p in ROWS))
+    assert import_entries(str(source), session, workers=workers, batch_size=3) == len(ROWS)
+    before = decrypted(session)
+    # import strips whitespace around values, like the exports it reads
+    assert before == sorted((s, u, p.strip()) for s, u, p in ROWS)
+
+    out = tmp_path / f'export.{fmt}'
+    assert export_entries(str(out), session, workers=workers, batch_size=3) == len(ROWS)
+    assert os.stat(out).st_mode & 0o777 == 0o600
+
+    os.mkdir(tmp_path / 'fresh')
+    monkeypatch.chdir(tmp_path / 'fresh')
+    monkeypatch.setattr(storage, '_backend', None)
+    fresh = init_master_password(MASTER, 'pbkdf2', {'iterations': 1000})
+    assert import_entries(str(out), fresh, workers=workers, batch_size=3) == len(ROWS)
+    assert decrypted(fresh) == before
+    assert sorted(e.id for e in Vault()) == [1, 2, 3, 4]
+    fresh.lock()
+
+
+def test_foreign_export_columns(tmp_path):
+    chrome = tmp_path / 'chrome.csv'
+    with open(chrome, 'w', newline='', encoding='utf-8-sig') as f:
+        writer = csv.writer(f)
+        writer.writerow(['name', 'url', 'username', 'password'])
+        writer.writerow(['', 'https://www.example.com/login', 'me', 'pw1'])
+        writer.writerow(['Bank', 'https://bank.test', 'me', 'pw2'])
+        writer.writerow(['no password', 'https://x.test', 'me', ''])
+    rows = list(read_rows(str(chrome)))
+    assert [(r['service'], r['username'], r['password']) for r in rows] == [('example.com', 'me', 'pw1'),
+                                                                            ('Bank', 'me', 'pw2')]
+
+    bitwarden = tmp_path / 'bitwarden.json'
+    bitwarden.write_text(json.dumps({'items': [
+        {'name': 'GitHub', 'login': {'username': 'me', 'password': 'pw3', 'uris': [{'uri': 'https://github.com'}]}},
+        {'name': 'Secure note', 'login': None},
+    ]}))
+    assert [(r['service'], r['password']) for r in read_rows(str(bitwarden))] == [('GitHub', 'pw3')]
+
+    with pytest.raises(ValueError):
+        list(read_rows(str(tmp_path / 'vault.xml')))
@@ -0,0 +1,77 @@
+import pytest
+
+import ui
+from search_index import SearchIndex
+from ui import ListView
+
+STRENGTHS = ['Weak', 'Strong', 'Medium', 'Very Strong', 'Very Weak']
+
+
+def make_entries(count: int = 45) -> list:
+    return [{'id': i, 'service': f'{"Git" if i % 3 == 0 else "Mail"} {i:02d}', 'username': f'user{i % 4}',
+             'created': f'2024-01-{i % 28 + 1:02d}', 'strength': STRENGTHS[i % 5]} for i in range(1, count + 1)]
+
+
+def ids(rows) -> list:
+    return [row['id'] for row in rows]
+
+
+def test_substring_filter_keeps_the_sort_order():
+    view = ListView(make_entries(), page_size=10)
+    view.sort('service')
+    view.sort('service')  # same column again: descending
+    view.filter('  GIT ')
+    assert view.filter_text == 'GIT'
+    assert ids(view.rows) == sorted((i for i in range(1, 46) if i % 3 == 0), reverse=True)
+    assert view.page_count == 2
+
+    view.filter('user3')  # usernames match too
+    expected = sorted((e for e in make_entries() if e['username'] == 'user3'), key=lambda e: e['service'].lower())
+    assert ids(view.rows) == ids(expected[::-1])
+    view.filter('')
+    assert len(view.rows) == 45
+
+
+def test_filter_uses_the_search_index():
+    entries = make_entries()
+    index = SearchIndex(entries)
+    calls = []
+
+    def find_ids(text):
+        calls.append(text)
+        return index.prefix(text)
+
+    view = ListView(entries, find_ids)
+    view.filter('mail 1')
+    assert ids(view.rows) == [i for i in range(10, 20) if i % 3]
+    assert calls == ['mail 1']
+    view.filter('nothing like it')
+    assert view.rows == [] and view.page_count == 1
+    assert view.select(3)['service'] == 'Git 03'  # picking by id ignores the filter
+
+
+def test_sort_and_paging():
+    view = ListView(make_entries(), page_size=20)
+    view.sort('strength')
+    ranks = [ui.STRENGTH_ORDER[row['strength'].lower()] for row in view.rows]
+    assert ranks == sorted(ranks)
+    with pytest.raises(ValueError):
+        view.sort('password')
+
+    view.turn(5)
+    assert view.page == 2 and len(view.visible()) == 5
+    view.turn(-10)
+    assert view.page == 0
+    view.turn(1)
+    view.filter('git')
+    assert view.page == 0  # a new filter starts at the first page
+
+
+def test_render_shows_only_the_current_page():
+    view = ListView(make_entries(), page_size=5)
+    view.turn(1)
+    with ui.console.capture() as capture:
+        view.render()
+    output = capture.get()
+    assert 'page 2/9' in output and '45 entries' in output
+    assert 'Mail 07' in output and 'Mail 01' not in output and 'Mail 11' not in output
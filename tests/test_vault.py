@@ -0,0 +1,86 @@
+import multiprocessing
+import os
+
+import pytest
+
+from conftest import MASTER
+from storage import BACKENDS, VaultConflictError
+from vault import Vault, new_entry, open_session
+
+
+@pytest.fixture(params=sorted(BACKENDS))
+def two_vaults(request, session):
+    """Two views of one vault, each with its own backend (and lock), like two processes"""
+    backend_class = BACKENDS[request.param]
+    first = Vault(backend_class(), session)
+    for service in ('github', 'gitlab', 'mail'):
+        first.add(new_entry(service, 'me', 'hunter22', session))
+    first.flush()
+    return first, Vault(backend_class(), session)
+
+
+def test_rebase_keeps_both_writers_changes(session, two_vaults):
+    first, second = two_vaults
+    edited = second.get(2).to_dict()
+    edited['username'] = 'alice'
+    second.update(edited)
+    second.delete(3)
+    second.add(new_entry('bank', 'me', 'pw', session))
+    second.flush()
+
+    first.add(new_entry('shop', 'me', 'pw', session))  # took id 4 too, renumbered on flush
+    edited = first.get(1).to_dict()
+    edited['username'] = 'bob'
+    first.update(edited)
+    first.flush()
+
+    after = {entry.id: (entry.service, entry.username) for entry in Vault(type(first.backend)())}
+    assert after == {1: ('github', 'bob'), 2: ('gitlab', 'alice'), 4: ('bank', 'me'), 5: ('shop', 'me')}
+    assert first.get(5).service == 'shop'
+
+
+def test_same_entry_changed_on_both_sides_is_a_conflict(two_vaults):
+    first, second = two_vaults
+    for vault, username in ((second, 'alice'), (first, 'bob')):
+        edited = vault.get(1).to_dict()
+        edited['username'] = username
+        vault.update(edited)
+    second.flush()
+    with pytest.raises(VaultConflictError) as caught:
+        first.flush()
+    assert caught.value.ids == [1]
+
+    first.reload()
+    assert first.get(1).username == 'alice'
+    first.delete(1)
+    second.delete(1)
+    first.flush()
+    with pytest.raises(VaultConflictError):
+        second.flush()  # deleted on disk since we loaded it
+
+
+def _add_entries(name, worker, count, done):
+    session = open_session(MASTER)
+    vault = Vault(BACKENDS[name](), session)
+    for i in range(count):
+        vault.add(new_entry(f'w{worker}-{i}', 'me', 'pw', session))
+        vault.flush()
+    done.put(worker)
+
+
+@pytest.mark.skipif(not hasattr(os, 'fork'), reason="needs fork")
+@pytest.mark.parametrize('name', ['json', 'sqlite'])
+def test_concurrent_processes_lose_no_entries(session, name):
+    context = multiprocessing.get_context('fork')
+    done = context.Queue()
+    workers = [context.Process(target=_add_entries, args=(name, worker, 10, done)) for worker in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(60)
+    assert sorted(done.get(timeout=1) for _ in workers) == [0, 1, 2, 3]
+
+    entries = list(Vault(BACKENDS[name]()))
+    assert len(entries) == 40
+    assert sorted(entry.id for entry in entries) == list(range(1, 41))
+    assert {entry.service for entry in entries} == {f'w{w}-{i}' for w in range(4) for i in range(10)}
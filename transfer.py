@@ -0,0 +1,197 @@
+"""
+    Bulk import/export.
+
+    Rows are streamed through a generator pipeline:
+        read_rows -> batches -> encrypt/score in worker processes -> backend.apply
+    Only a few batches are in flight at once, so memory doesn't grow with the
+    size of the input file.
+"""
+
+import os
+import csv
+import json
+from datetime import datetime
+from itertools import islice
+from urllib.parse import urlparse
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+from cryptography.fernet import Fernet, MultiFernet
+
+from storage import get_backend
+
+BATCH_SIZE = 500
+
+# column names used by browser and password-manager CSV exports
+# (Chrome, Firefox, Bitwarden, LastPass, 1Password, KeePass, ours)
+SERVICE_COLUMNS = ('service', 'name', 'title', 'account')
+URL_COLUMNS = ('url', 'login_uri', 'web site', 'website', 'hostname', 'origin')
+USERNAME_COLUMNS = ('username', 'login_username', 'login name', 'login', 'user', 'email')
+PASSWORD_COLUMNS = ('password', 'login_password')
+
+
+def _pick(row: dict, columns) -> str:
+    for column in columns:
+        value = row.get(column)
+        if value:
+            return value.strip()
+    return ''
+
+def _service_from_url(url: str) -> str:
+    host = urlparse(url if '://' in url else f'//{url}').hostname or url
+    return host[4:] if host.startswith('www.') else host
+
+def normalize_row(row: dict) -> dict:
+    """Map an export row onto service/username/password, or None if unusable"""
+    row = {key.strip().lower(): value for key, value in row.items() if key and isinstance(value, str)}
+    password = _pick(row, PASSWORD_COLUMNS)
+    service = _pick(row, SERVICE_COLUMNS) or _service_from_url(_pick(row, URL_COLUMNS))
+    if not service or not password:
+        return None
+    return {
+        'service': service,
+        'username': _pick(row, USERNAME_COLUMNS),
+        'password': password,
+        'created': _pick(row, ('created',)) or datetime.now().strftime('%Y-%m-%d'),
+    }
+
+
+def _read_json(path: str):
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    # our own export, or Bitwarden's {"items": [{"name", "login": {...}}]}
+    for item in data.get('entries', []):
+        yield item
+    for item in data.get('items', []):
+        login = item.get('login') or {}
+        uris = login.get('uris') or [{}]
+        yield {'name': item.get('name'), 'username': login.get('username'),
+               'password': login.get('password'), 'url': uris[0].get('uri')}
+
+def _read_jsonl(path: str):
+    with open(path, 'r', encoding='utf-8') as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+def read_rows(path: str, fmt: str = None):
+    """Yield normalized rows from a CSV, JSON or JSON Lines file"""
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt == 'csv':
+        f = open(path, 'r', encoding='utf-8-sig', newline='')
+        rows = csv.DictReader(f)
+    elif fmt == 'jsonl':
+        f, rows = None, _read_jsonl(path)
+    elif fmt == 'json':
+        f, rows = None, _read_json(path)
+    else:
+        raise ValueError(f"Unsupported import format: {fmt}")
+    try:
+        for row in rows:
+            normalized = normalize_row({k: v if v is None or isinstance(v, str) else str(v) for k, v in row.items()})
+            if normalized:
+                yield normalized
+    finally:
+        if f:
+            f.close()
+
+
+def batched(iterable, size: int):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+"""     WORKER PROCESS BELOW       """
+_worker_fernet = None
+
+def _init_worker(keys: tuple):
+    global _worker_fernet
+    # current key first: encrypts with it, decrypts with whichever key fits
+    _worker_fernet = MultiFernet([Fernet(key) for key in keys])
+
+def _encrypt_batch(rows: list) -> list:
+    from password_analyzer import calculate_strength
+    for row in rows:
+        row['strength'] = calculate_strength(row['password'])['rating']
+        row['password'] = _worker_fernet.encrypt(row['password'].encode()).decode()
+    return rows
+
+def _decrypt_batch(entries: list) -> list:
+    for entry in entries:
+        entry['password'] = _worker_fernet.decrypt(entry['password'].encode()).decode()
+    return entries
+
+
+def run_pipeline(batches, func, keys: tuple, workers: int = None, initializer=_init_worker):
+    """Run func over batches in a process pool, keeping at most 2 batches per worker in flight.
+
+    initializer(keys) runs once in each worker. Results come back in input
+    order. workers=1 runs in-process.
+    """
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        initializer(keys)
+        for batch in batches:
+            yield func(batch)
+        return
+    with ProcessPoolExecutor(workers, initializer=initializer, initargs=(keys,)) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.submit(func, batch))
+            if len(pending) >= workers * 2:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
+
+def import_entries(path: str, session, fmt: str = None, workers: int = None, batch_size: int = BATCH_SIZE) -> int:
+    """Import a CSV/JSON export into the vault. Returns the number of entries added"""
+    from vault import refresh_data_key
+
+    backend = get_backend()
+    count = 0
+    with backend.bulk():
+        for rows in run_pipeline(batched(read_rows(path, fmt), batch_size), _encrypt_batch, session.keys, workers):
+            # take ids under the commit lock so a concurrent add can't get the same ones
+            with backend.lock.exclusive():
+                refresh_data_key(session, rows)
+                for next_id, row in enumerate(rows, backend.next_id()):
+                    row['id'] = next_id
+                backend.apply(rows, [], [])
+            count += len(rows)
+    return count
+
+
+def export_entries(path: str, session, fmt: str = None, workers: int = None, batch_size: int = BATCH_SIZE) -> int:
+    """Write decrypted entries to CSV or JSON Lines. The output file is plaintext"""
+    fmt = fmt or os.path.splitext(path)[1].lstrip('.').lower()
+    if fmt not in ('csv', 'jsonl', 'json'):
+        raise ValueError(f"Unsupported export format: {fmt}")
+    entries = get_backend().load_all()
+    fields = ('service', 'username', 'password', 'created', 'strength')
+
+    fd = os.open(path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    count = 0
+    with open(fd, 'w', encoding='utf-8', newline='') as f:
+        if fmt == 'csv':
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction='ignore')
+            writer.writeheader()
+        elif fmt == 'json':
+            f.write('{"entries": [')
+        batches = batched(({k: entry.get(k) for k in fields} for entry in entries), batch_size)
+        for rows in run_pipeline(batches, _decrypt_batch, session.keys, workers):
+            for row in rows:
+                if fmt == 'csv':
+                    writer.writerow(row)
+                elif fmt == 'json':
+                    f.write((',' if count else '') + '\n  ' + json.dumps(row))
+                else:
+                    f.write(json.dumps(row) + '\n')
+                count += 1
+        if fmt == 'json':
+            f.write('\n]}\n')
+    return count
@@ -5,6 +5,8 @@
 from rich.console import Console
 from rich.table import Table
 from rich.panel import Panel
+from rich.text import Text
+from rich.markup import escape
 from rich.progress import Progress
 from rich import box
 
@@ -30,49 +32,170 @@ def print_info(text: str):
     console.print(f"[cyan]{text}[/cyan]")
 
 """     PASSWORD LIST TABLE BELOW       """
-def display_password_list(entries: list, show_passwords: bool = False):
+PAGE_SIZE = 20
+SORT_COLUMNS = ('id', 'service', 'username', 'strength', 'created')
+STRENGTH_ORDER = {'very weak': 0, 'weak': 1, 'medium': 2, 'strong': 3, 'very strong': 4}
+
+# rating -> ready-made styled cell, so rows don't re-lowercase and compare the rating
+STRENGTH_STYLES = {'very strong': 'bold green', 'strong': 'green', 'medium': 'yellow'}
+_strength_cells = {}
+
+def strength_cell(rating: str) -> Text:
+    cell = _strength_cells.get(rating)
+    if cell is None:
+        style = STRENGTH_STYLES.get((rating or 'unknown').lower(), 'red')
+        cell = _strength_cells[rating] = Text((rating or 'unknown').upper(), style=style)
+    return cell
+
+def display_password_list(entries: list, show_passwords: bool = False, caption: str = None):
     """
     Display passwords in a beautiful table.
     
     Args:
-        entries: List of password entries
+        entries: List of password entries (only pass the rows that should be on screen)
         show_passwords: Whether to show actual passwords (default: hide)
     """
     if not entries:
         print_warning("No passwords stored yet!")
         return
     
-    table = Table(title="🔐 Stored Passwords", box=box.ROUNDED)
+    table = Table(title="🔐 Stored Passwords", box=box.ROUNDED, caption=caption)
     
-    table.add_column("#", style="cyan", width=4)
-    table.add_column("Service", style="magenta", width=20)
-    table.add_column("Username", style="blue", width=25)
-    table.add_column("Strength", style="yellow", width=12)
-    table.add_column("Created", style="green", width=12)
+    # no_wrap and plain Text cells: rich skips markup parsing and line wrapping per cell
+    table.add_column("ID", style="cyan", width=5, no_wrap=True)
+    table.add_column("Service", style="magenta", width=18, no_wrap=True)
+    table.add_column("Username", style="blue", width=20, no_wrap=True)
+    table.add_column("Strength", style="yellow", width=11, no_wrap=True)
+    table.add_column("Created", style="green", width=10, no_wrap=True)
     
-    for i, entry in enumerate(entries, 1):
-        strength = entry.get('strength', 'unknown').upper()
-        
-        # Color code strength
-        if 'very strong' in strength.lower():
-            strength_colored = f"[bold green]{strength}[/bold green]"
-        elif 'strong' in strength.lower():
-            strength_colored = f"[green]{strength}[/green]"
-        elif 'medium' in strength.lower():
-            strength_colored = f"[yellow]{strength}[/yellow]"
-        else:
-            strength_colored = f"[red]{strength}[/red]"
-        
+    for entry in entries:
         table.add_row(
-            str(i),
-            entry['service'],
-            entry['username'],
-            strength_colored,
-            entry['created']
+            Text(str(entry['id'])),
+            Text(entry['service']),
+            Text(entry['username']),
+            strength_cell(entry.get('strength', 'unknown')),
+            Text(entry['created'] or '')
         )
     
     console.print(table)
 
+
+class ListView:
+    """Sorted, filtered, paged window over the entries. Only the current page is rendered.
+
+    Sort orders are computed once per column and cached. Filtering asks
+    find_ids (e.g. Vault.index.prefix) for matching ids when one is given.
+    """
+
+    def __init__(self, entries: list, find_ids=None, page_size: int = PAGE_SIZE):
+        self.entries = list(entries)
+        self.find_ids = find_ids
+        self.page_size = page_size
+        self.page = 0
+        self.sort_column = 'id'
+        self.reverse = False
+        self.filter_text = ''
+        self._orders = {}
+        self._rows = None
+        self._by_id = {entry['id']: entry for entry in self.entries}
+
+    def _order(self, column: str) -> list:
+        order = self._orders.get(column)
+        if order is None:
+            if column == 'strength':
+                key = lambda e: STRENGTH_ORDER.get((e.get('strength') or '').lower(), -1)
+            elif column == 'id':
+                key = lambda e: e['id']
+            else:
+                key = lambda e: (e.get(column) or '').lower()
+            order = self._orders[column] = sorted(self.entries, key=key)
+        return order
+
+    @property
+    def rows(self) -> list:
+        if self._rows is None:
+            rows = self._order(self.sort_column)
+            if self.reverse:
+                rows = rows[::-1]
+            if self.filter_text:
+                if self.find_ids:
+                    wanted = set(self.find_ids(self.filter_text))
+                else:
+                    text = self.filter_text.lower()
+                    wanted = {e['id'] for e in self.entries
+                              if text in e['service'].lower() or text in e['username'].lower()}
+                rows = [e for e in rows if e['id'] in wanted]
+            self._rows = rows
+        return self._rows
+
+    @property
+    def page_count(self) -> int:
+        return max(1, -(-len(self.rows) // self.page_size))
+
+    def sort(self, column: str):
+        if column not in SORT_COLUMNS:
+            raise ValueError(f"Sort by one of: {', '.join(SORT_COLUMNS)}")
+        self.reverse = not self.reverse if column == self.sort_column else False
+        self.sort_column = column
+        self.page = 0
+        self._rows = None
+
+    def filter(self, text: str):
+        self.filter_text = text.strip()
+        self.page = 0
+        self._rows = None
+
+    def turn(self, pages: int):
+        self.page = min(max(self.page + pages, 0), self.page_count - 1)
+
+    def visible(self) -> list:
+        start = self.page * self.page_size
+        return self.rows[start:start + self.page_size]
+
+    def select(self, entry_id: int):
+        """Entry with the id shown in the table, or None"""
+        return self._by_id.get(entry_id)
+
+    def render(self):
+        caption = (f"page {self.page + 1}/{self.page_count} · {len(self.rows)} entries · "
+                   f"sorted by {self.sort_column}{' (desc)' if self.reverse else ''}")
+        if self.filter_text:
+            caption += f" · filter '{self.filter_text}'"
+        if not self.rows:
+            print_warning("No entries match" if self.filter_text else "No passwords stored yet!")
+            console.print(f"[dim]{caption}[/dim]")
+            return
+        display_password_list(self.visible(), caption=caption)
+
+
+def browse_entries(entries: list, find_ids=None, page_size: int = PAGE_SIZE):
+    """Page through entries until the user picks one. Returns the entry, or None to go back"""
+    view = ListView(entries, find_ids, page_size)
+    while True:
+        view.render()
+        command = console.input(
+            "[cyan]ID to select, n/p page, /text filter, s <column> sort, q back:[/cyan] ").strip()
+        if command in ('', 'q'):
+            return None
+        if command == 'n':
+            view.turn(1)
+        elif command == 'p':
+            view.turn(-1)
+        elif command.startswith('/'):
+            view.filter(command[1:])
+        elif command.startswith('s'):
+            try:
+                view.sort(command[1:].strip() or 'id')
+            except ValueError as e:
+                print_error(str(e))
+        elif command.isdigit():
+            entry = view.select(int(command))
+            if entry is not None:
+                return entry
+            print_error(f"No entry with id {command}")
+        else:
+            print_error("Unknown command")
+
 """     PASSWORD INFO BELOW       """
 
 def display_password_info(entry: dict, decrypted_password: str, strength_result: dict):
@@ -97,6 +220,10 @@ def display_password_info(entry: dict, decrypted_password: str, strength_result:
 [bold cyan]Created:[/bold cyan]  {entry['created']}
 [bold cyan]Strength:[/bold cyan] [{strength_color}]{rating} ({score}/100)[/{strength_color}]
 """
+    attachments = entry.get('attachments')
+    if attachments:
+        names = ', '.join(escape(ref['name']) for ref in attachments)
+        info_text += f"[bold cyan]Attached:[/bold cyan] {names} [dim](python main.py extract)[/dim]\n"
     
     panel = Panel(
         info_text.strip(),
@@ -148,7 +275,8 @@ def display_main_menu():
 [bold cyan]3.[/bold cyan] Update a password
 [bold cyan]4.[/bold cyan] Delete a password
 [bold cyan]5.[/bold cyan] Analyze password strength
-[bold cyan]6.[/bold cyan] Exit""",
+[bold cyan]6.[/bold cyan] Change master password
+[bold cyan]7.[/bold cyan] Exit""",
         title="🔐 PASSWORD MANAGER",
         border_style="green",
         box=box.DOUBLE
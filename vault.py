@@ -0,0 +1,543 @@
+"""
+    In-memory vault: entries are loaded once per session, changes are tracked
+    per id and only the changed records are written back on flush().
+
+    Entries are kept in a dict keyed by id, so get/update/delete by id are
+    O(1). New ids come from the backend's persisted counter and are never
+    reused after a delete.
+
+    flush() commits under the backend's exclusive lock, against the revision
+    we loaded. If another process committed in between, our changes are
+    replayed on top of theirs; only when both touched the same entry does it
+    raise VaultConflictError.
+"""
+
+import os
+import sys
+import hashlib
+import threading
+from datetime import datetime
+from contextlib import contextmanager
+
+from storage import (get_backend, load_config, save_config, save_kdf_header, VaultConflictError,
+                     BinaryStorage, DATA_FILE)
+from search_index import SearchIndex
+from entry import Entry
+
+
+def _stat(paths) -> tuple:
+    stats = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            stats.append((st.st_mtime_ns, st.st_size))
+        except FileNotFoundError:
+            stats.append(None)
+    return tuple(stats)
+
+def file_fingerprint(paths):
+    """(stat info, sha256 over contents) for a backend's files"""
+    digest = hashlib.sha256()
+    for path in paths:
+        try:
+            with open(path, 'rb') as f:
+                digest.update(f.read())
+        except FileNotFoundError:
+            digest.update(b'\0missing')
+    return (_stat(paths), digest.hexdigest())
+
+
+def new_entry(service: str, username: str, password: str, session) -> Entry:
+    """Build an entry with the password encrypted and rated"""
+    from crypto import encrypt_pass
+    from password_analyzer import calculate_strength
+
+    return Entry(
+        service=service,
+        username=username,
+        password=encrypt_pass(password, session),
+        created=datetime.now().strftime('%Y-%m-%d'),
+        strength=calculate_strength(password)['rating'],
+    )
+
+
+"""     MASTER PASSWORD / KDF HEADER BELOW       """
+REENCRYPT_BATCH = 500  # entries per commit while re-encrypting, keeps the lock short
+
+def init_master_password(master_pass: str, kdf_name: str = 'pbkdf2', params: dict = None):
+    """Create a fresh KDF header (random salt), verifier and data key for a new vault"""
+    from crypto import KeySession, new_kdf_header, make_verifier
+
+    session = KeySession(master_pass, new_kdf_header(kdf_name, params))
+    session.new_data_key()
+    save_kdf_header(session.kdf, make_verifier(session.master_key), session.wrapped_keys(), session.key_id)
+    config = load_config()
+    if 'storage_backend' not in config and not os.path.exists(DATA_FILE):
+        # brand new vault: use the compact binary format (old data.json vaults stay on JSON)
+        config['storage_backend'] = BinaryStorage.name
+        save_config(config)
+    return session
+
+def rekey_vault(old_session, new_session):
+    """Re-encrypt every entry under new_session, then make its header current.
+
+    Only needed when the old master key itself encrypted the entries (legacy
+    vaults); everything else changes keys with change_master_password or
+    rotate_data_key. The new header and data key are saved as pending first.
+    If we crash half way, the next login finds them, and rotate_token accepts
+    entries under either key, so the rekey simply runs again.
+    """
+    from crypto import make_verifier, rotate_token
+    from attachments import rotate_keys
+
+    config = load_config()
+    config['pending_kdf'] = new_session.kdf
+    config['pending_wrapped_keys'] = new_session.wrapped_keys()
+    save_config(config)
+
+    backend = get_backend()
+    with backend.lock.exclusive():
+        entries = backend.load_all()
+        for entry in entries:
+            entry['password'] = rotate_token(entry['password'], new_session, old_session)
+            rotate_keys(entry, new_session, old_session)
+        backend.replace_all(entries)
+    save_kdf_header(new_session.kdf, make_verifier(new_session.master_key), new_session.wrapped_keys(),
+                    new_session.key_id)
+
+def open_session(master_pass: str):
+    """Check the master password and return a KeySession, or None if it's wrong.
+
+    Vaults from before KDF headers (fixed salt, plain SHA-256 check) are
+    re-keyed to a random-salt header on the spot. Vaults from before data
+    keys get one, and reencrypt_vault moves their entries over.
+    """
+    from crypto import KeySession, KDF_VERSION, LEGACY_KDF, check_verifier, new_kdf_header, verify_master_password
+
+    config = load_config()
+    kdf = config.get('kdf')
+    if kdf:
+        session = KeySession(master_pass, kdf)
+        if not check_verifier(session.master_key, config.get('verifier', '')):
+            session.lock()
+            return None
+        if config.get('wrapped_keys'):
+            session.unwrap(config['wrapped_keys'])
+    else:
+        if not verify_master_password(master_pass, config.get('master_password_hash', '')):
+            return None
+        session = KeySession(master_pass, LEGACY_KDF)
+
+    pending = config.get('pending_kdf')
+    if pending or session.kdf['version'] < KDF_VERSION:
+        new_session = KeySession(master_pass, pending or new_kdf_header(), config.get('pending_wrapped_keys'))
+        if not new_session.enveloped:
+            new_session.new_data_key()
+        rekey_vault(session, new_session)
+        session.lock()
+        session = new_session
+    elif not session.enveloped:
+        rotate_data_key(session, only_if_missing=True)
+    return session
+
+
+"""     DATA KEYS BELOW       """
+@contextmanager
+def _key_config(session, backend=None):
+    """The config under the vault lock, with session's data keys brought up to date.
+
+    Saved again when the block exits, so two processes changing keys at
+    once can't lose each other's wrapped keys.
+    """
+    from crypto import check_verifier
+
+    backend = backend or get_backend()
+    with backend.lock.exclusive():
+        config = load_config()
+        if not check_verifier(session.master_key, config.get('verifier', '')):
+            raise ValueError("The master password was changed by another process, log in again")
+        if config.get('wrapped_keys'):
+            session.unwrap(config['wrapped_keys'])
+        yield config
+        save_config(config)
+
+def rotate_data_key(session, only_if_missing: bool = False):
+    """Start encrypting under a fresh data key; reencrypt_vault moves the existing entries over"""
+    with _key_config(session) as config:
+        if only_if_missing and session.enveloped:
+            return  # another process got there first
+        session.new_data_key()
+        config['wrapped_keys'] = session.wrapped_keys()
+        config['data_key_id'] = session.key_id
+        config['reencrypt_pending'] = True
+
+def change_master_password(session, new_password: str, kdf: dict = None):
+    """Re-wrap the data keys under a new master password, without touching the entries.
+
+    kdf defaults to the current KDF and parameters with a fresh salt. An
+    unfinished re-encryption is completed first, since entries still under
+    the old master key would be lost with it.
+    """
+    from crypto import derive_key, make_verifier, new_kdf_header
+
+    kdf = kdf or new_kdf_header(session.kdf['name'], session.kdf['params'])
+    if load_config().get('reencrypt_pending'):
+        reencrypt_vault(session)
+    master_key = derive_key(new_password, kdf)  # the slow part, outside the lock
+    with _key_config(session) as config:
+        session.change_master_key(master_key, kdf)
+        config['kdf'] = kdf
+        config['verifier'] = make_verifier(session.master_key)
+        config['wrapped_keys'] = session.wrapped_keys()
+        config['data_key_id'] = session.key_id
+        config.pop('pending_kdf', None)
+
+def refresh_data_key(session, entries):
+    """Catch up with a data key rotation done by another process. Call under the commit lock.
+
+    If the config's current data key isn't the one session encrypts with,
+    session takes the new keys and entries (dicts or Entry objects about to
+    be written) are re-encrypted under it, so nothing gets committed under a
+    key that the rotation is about to retire.
+    """
+    from crypto import key_index, rotate_token
+    from attachments import rotate_keys
+
+    config = load_config()
+    current = config.get('data_key_id')
+    if session is None or not current or current == session.key_id:
+        return
+    previous = session.copy()
+    try:
+        try:
+            session.unwrap(config['wrapped_keys'])
+        except ValueError:
+            raise ValueError("The master password was changed by another process, log in again") from None
+        for entry in entries:
+            if key_index(entry['password'], session) != 0:
+                entry['password'] = rotate_token(entry['password'], session, previous)
+            rotate_keys(entry, session, previous)
+    finally:
+        previous.lock()
+
+def _is_stale(entry, session) -> bool:
+    """True if the password or an attachment key is under an older key than the current one"""
+    from crypto import key_index
+    from attachments import list_attachments
+
+    tokens = [entry['password']] + [ref['key'] for ref in list_attachments(entry)]
+    return any(key_index(token, session) not in (0, None) for token in tokens)
+
+def reencrypt_vault(session, batch_size: int = REENCRYPT_BATCH, stop=None) -> int:
+    """Move every entry still under an older key to the current data key.
+
+    Works in batches through its own Vault, each batch a normal flush, so
+    the vault stays usable from other windows meanwhile. Once nothing is
+    left under an old key, those keys are dropped from the config. Setting
+    the threading.Event stop ends the pass after the current batch; it picks
+    up where it left off next time. Returns the number of entries moved.
+    """
+    from crypto import rotate_token
+    from attachments import rotate_keys
+
+    # a backend of our own: the cached one's lock depth would be shared with the menu's thread
+    vault = Vault(type(get_backend())(), session)
+    moved = 0
+    while True:
+        todo = [entry.id for entry in vault if _is_stale(entry, session)]
+        try:
+            for start in range(0, len(todo), batch_size):
+                if stop is not None and stop.is_set():
+                    return moved
+                count = 0
+                for entry_id in todo[start:start + batch_size]:
+                    entry = vault.get(entry_id)
+                    if entry is None or not _is_stale(entry, session):
+                        continue
+                    entry = Entry.from_dict(entry.to_dict())  # a copy, update() keeps the original as the base
+                    entry['password'] = rotate_token(entry['password'], session)
+                    rotate_keys(entry, session)
+                    vault.update(entry)
+                    count += 1
+                vault.flush()
+                moved += count
+        except VaultConflictError:
+            vault.reload()  # someone edited the same entries, look again
+            continue
+
+        with _key_config(session, vault.backend) as config:
+            vault.reload()
+            if any(_is_stale(entry, session) for entry in vault):
+                continue  # written under an old key while we worked
+            session.retire_old_keys()
+            config['wrapped_keys'] = session.wrapped_keys()
+            config['data_key_id'] = session.key_id
+            config.pop('reencrypt_pending', None)
+            return moved
+
+def reencrypt_in_background(session):
+    """Run reencrypt_vault in a daemon thread. Returns (thread, stop event); set and join before exiting"""
+    stop = threading.Event()
+
+    def run():
+        try:
+            reencrypt_vault(session, stop=stop)
+        except Exception as e:
+            print(f"Re-encryption stopped: {e}", file=sys.stderr)
+
+    thread = threading.Thread(target=run, name='reencrypt', daemon=True)
+    thread.start()
+    return thread, stop
+
+
+def _match(query: str, entries, search):
+    """The entry whose service is query, else the single hit of search(query). LookupError otherwise"""
+    if not query:
+        raise LookupError("Give a service name or an id")
+    wanted = query.strip().lower()
+    matches = [e for e in entries if e['service'].strip().lower() == wanted] or search(query)
+    if not matches:
+        raise LookupError(f"No entry matches '{query}'")
+    if len(matches) > 1:
+        options = ', '.join(f"#{e['id']} {e['service']} ({e['username']})" for e in matches[:10])
+        raise LookupError(f"'{query}' is ambiguous, use an id: {options}")
+    return matches[0]
+
+def find_entry(query: str = None, entry_id: int = None, backend=None) -> Entry:
+    """Vault.find() for a one-off lookup: matches on metadata only, then reads just that entry"""
+    backend = backend or get_backend()
+    if entry_id is None:
+        records = backend.list_metadata()
+        by_id = {record['id']: record for record in records}
+
+        def search(text):
+            return [by_id[i] for i in SearchIndex(records).search(text)]
+
+        entry_id = _match(query, records, search)['id']
+    entry = backend.get(entry_id)
+    if entry is None:
+        raise LookupError(f"No entry with id {entry_id}")
+    return Entry.from_dict(entry)
+
+
+class Vault:
+    def __init__(self, backend=None, session=None):
+        """session, when given, is kept in step with data key rotations by other processes on flush"""
+        self.backend = backend or get_backend()
+        self.session = session
+        self.reload()
+
+    def reload(self):
+        """Drop pending changes and re-read every entry from the backend"""
+        if self.session is None:
+            self._revision, entries = self.backend.snapshot()
+        else:
+            # entries another process rotated need the new key to decrypt; take it and
+            # read them under one lock so a rotation can't land in between
+            with self.backend.lock.exclusive():
+                refresh_data_key(self.session, [])
+                self._revision, entries = self.backend.snapshot()
+        self._entries = {entry.id: entry for entry in map(Entry.from_dict, entries)}
+        self._new = set()
+        self._dirty = set()
+        self._deleted = set()
+        self._base = {}  # id -> entry as loaded, for entries we changed or deleted
+        self._detached = set()  # ids whose attachments were removed on purpose
+        self._index = None
+        self._next_id = self.backend.next_id()
+        self._fingerprint = file_fingerprint(self.backend.paths)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __iter__(self):
+        return iter(self._entries.values())
+
+    def entries(self) -> list:
+        return list(self._entries.values())
+
+    def get(self, entry_id: int) -> Entry:
+        return self._entries.get(entry_id)
+
+    @property
+    def index(self) -> SearchIndex:
+        """Search index, built on first use and kept up to date afterwards"""
+        if self._index is None:
+            self._index = SearchIndex(self._entries.values())
+        return self._index
+
+    def search(self, query: str, limit: int = 20) -> list:
+        return [self._entries[entry_id] for entry_id in self.index.search(query, limit)]
+
+    def find(self, query: str = None, entry_id: int = None) -> Entry:
+        """Entry by id, exact service name, or a single unambiguous search hit.
+
+        Raises LookupError with a message fit for the user otherwise.
+        """
+        if entry_id is not None:
+            entry = self.get(entry_id)
+            if entry is None:
+                raise LookupError(f"No entry with id {entry_id}")
+            return entry
+        return _match(query, self, self.search)
+
+    @property
+    def has_changes(self) -> bool:
+        return bool(self._new or self._dirty or self._deleted)
+
+    def next_id(self) -> int:
+        return self._next_id
+
+    def add(self, entry) -> Entry:
+        """Add an entry (Entry or dict), assigning an id if it doesn't have one"""
+        entry = Entry.from_dict(entry)
+        if entry.id is None:
+            entry.id = self._next_id
+        self._next_id = max(self._next_id, entry.id + 1)
+        self._entries[entry.id] = entry
+        self._new.add(entry.id)
+        self._deleted.discard(entry.id)
+        if self._index is not None:
+            self._index.add(entry)
+        return entry
+
+    def _remember_base(self, entry_id: int):
+        if entry_id not in self._new and entry_id not in self._base and entry_id in self._entries:
+            self._base[entry_id] = self._entries[entry_id].to_dict()
+
+    def update(self, entry):
+        """Replace an entry. Leaving 'attachments' out keeps the current ones, an empty list removes them"""
+        entry = Entry.from_dict(entry)
+        current = self._entries.get(entry.id)
+        if 'attachments' not in entry and current is not None and current.get('attachments'):
+            entry['attachments'] = current['attachments']
+        if 'attachments' in entry and not entry['attachments']:
+            entry.pop('attachments')
+            self._detached.add(entry.id)
+        self._remember_base(entry.id)
+        self._entries[entry.id] = entry
+        if entry.id not in self._new:
+            self._dirty.add(entry.id)
+        if self._index is not None:
+            self._index.add(entry)
+
+    def delete(self, entry_id: int):
+        self._remember_base(entry_id)
+        self._entries.pop(entry_id, None)
+        self._dirty.discard(entry_id)
+        if self._index is not None:
+            self._index.remove(entry_id)
+        if entry_id in self._new:
+            self._new.discard(entry_id)
+        else:
+            self._deleted.add(entry_id)
+
+    def changed_on_disk(self) -> bool:
+        """True if another process has written the vault since we loaded it.
+
+        mtime and size are checked first, the content hash only when they
+        differ, so a plain touch doesn't count as a change.
+        """
+        if _stat(self.backend.paths) == self._fingerprint[0]:
+            return False
+        if self._fingerprint[1] is None:
+            return True
+        current = file_fingerprint(self.backend.paths)
+        if current[1] == self._fingerprint[1]:
+            self._fingerprint = current
+            return False
+        return True
+
+    def refresh(self) -> bool:
+        """Reload if the file changed externally and nothing is pending. Returns True if reloaded"""
+        if not self.has_changes and self.changed_on_disk():
+            self.reload()
+            return True
+        return False
+
+    def _claim_ids(self):
+        """Renumber new entries if another process took their ids since we loaded"""
+        if not self._new:
+            return
+        start = self.backend.next_id()
+        if min(self._new) >= start:
+            return
+        renumbered = [self._entries.pop(old_id) for old_id in sorted(self._new)]
+        self._new.clear()
+        for new_id, entry in enumerate(renumbered, start):
+            if self._index is not None:
+                self._index.remove(entry.id)
+            entry.id = new_id  # callers holding the entry see its final id
+            self._entries[new_id] = entry
+            self._new.add(new_id)
+            if self._index is not None:
+                self._index.add(entry)
+        self._next_id = start + len(renumbered)
+
+    def _rebase(self):
+        """Replay our pending changes on top of what is on disk now.
+
+        Raises VaultConflictError if someone else changed or deleted an entry
+        that we changed or deleted too.
+        """
+        revision, entries = self.backend.snapshot()
+        entries = [Entry.from_dict(entry) for entry in entries]
+        current = {entry.id: entry for entry in entries}
+        conflicts = sorted(i for i in self._dirty | self._deleted
+                           if (current[i].to_dict() if i in current else None) != self._base.get(i))
+        if conflicts:
+            raise VaultConflictError(
+                f"Entries {', '.join(f'#{i}' for i in conflicts)} were changed by another process, "
+                "reload and try again", conflicts)
+
+        mine = {i: self._entries[i] for i in self._new | self._dirty}
+        self._entries = current
+        for entry_id in self._deleted:
+            self._entries.pop(entry_id, None)
+        self._entries.update(mine)
+        self._revision = revision
+        self._index = None
+
+    def _drop_attachments(self):
+        """Delete attachment files that committed changes no longer reference"""
+        changed = []
+        for entry_id, before in self._base.items():
+            after = self._entries.get(entry_id)
+            # an entry that lost the field without an explicit detach keeps its files
+            if before.get('attachments') and (after is None or after.get('attachments')
+                                              or entry_id in self._detached):
+                changed.append((before, after))
+        if changed:
+            from attachments import delete_unreferenced
+            for before, after in changed:
+                delete_unreferenced(before, after)
+
+    def flush(self):
+        """Write only the records that changed since the last flush"""
+        if not self.has_changes:
+            return
+        # nobody else can commit while we hold the lock, so one rebase is enough
+        with self.backend.lock.exclusive():
+            if self.backend.revision() != self._revision:
+                self._rebase()
+            self._claim_ids()
+            refresh_data_key(self.session, [self._entries[i] for i in self._new | self._dirty])
+            self._revision = self.backend.apply(
+                [self._entries[i].to_dict() for i in sorted(self._new)],
+                [self._entries[i].to_dict() for i in sorted(self._dirty)],
+                sorted(self._deleted),
+                expected_revision=self._revision,
+            )
+        self._drop_attachments()
+        self._new.clear()
+        self._dirty.clear()
+        self._deleted.clear()
+        self._base.clear()
+        self._detached.clear()
+        # our own write; skip re-hashing the files until the stats move again
+        self._fingerprint = (_stat(self.backend.paths), None)
+
+    def close(self):
+        """Flush pending changes and let the backend compact its files"""
+        self.flush()
+        self.backend.checkpoint()
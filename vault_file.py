@@ -0,0 +1,228 @@
+"""
+    Binary vault container (vault.pmv), read through mmap.
+
+    File layout:
+        magic (4 bytes) | format version (2 bytes) | header length (4 bytes)
+        header: JSON object (generation, next_id, revision, count)
+        record table: count x (id: uint64, offset: uint64, length: uint32), sorted by id
+        records, each:
+            lengths: service, username (uint16) | created, strength (uint8)
+                     token kind (uint8: 0 raw Fernet bytes, 1 text kept as-is)
+                     token (uint16) | extra fields (uint32, 0 when there are none)
+            then the fields back to back: service, username, created, strength
+            (utf-8), token, extra (JSON)
+
+    All integers are little endian. Opening a vault reads the header and the
+    record table only. get() binary-searches the table and decodes one
+    record, metadata() decodes just the text fields of every record (no
+    token, no extra JSON), and token() hands back a zero-copy slice of the
+    mapping. Tokens are the raw bytes behind the base64 Fernet string, so the
+    file is about a third smaller than data.json and has no base64 or JSON to
+    parse per entry.
+"""
+
+import os
+import sys
+import json
+import mmap
+import struct
+
+from entry import Entry, METADATA_FIELDS
+
+MAGIC = b'PMVB'
+FORMAT_VERSION = 1
+PREAMBLE = struct.Struct('<4sHI')
+INDEX_ROW = struct.Struct('<QQI')
+LENGTHS = struct.Struct('<HHBBBHI')
+
+TOKEN_RAW = 0
+TOKEN_TEXT = 1
+
+
+def read_header(path: str) -> dict:
+    """Just the header, without mapping the file"""
+    with open(path, 'rb') as f:
+        preamble = f.read(PREAMBLE.size)
+        header_len = _check_preamble(preamble)
+        return json.loads(f.read(header_len))
+
+def _check_preamble(preamble: bytes) -> int:
+    if len(preamble) != PREAMBLE.size:
+        raise ValueError("file is truncated")
+    magic, version, header_len = PREAMBLE.unpack(preamble)
+    if magic != MAGIC:
+        raise ValueError("not a binary vault")
+    if version > FORMAT_VERSION:
+        raise ValueError(f"vault format {version} is newer than this version supports ({FORMAT_VERSION})")
+    return header_len
+
+
+class VaultFile:
+    """Read-only view of a vault.pmv file"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            size = os.fstat(f.fileno()).st_size
+            if size and sys.platform != 'win32':
+                self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            else:
+                # Windows can't rename over a mapped file, read it instead
+                self._map = f.read()
+        self._buf = memoryview(self._map)
+        header_len = _check_preamble(bytes(self._buf[:PREAMBLE.size]))
+        start = PREAMBLE.size + header_len
+        self.header = json.loads(bytes(self._buf[PREAMBLE.size:start]))
+        self.count = self.header.get('count', 0)
+        self._table = start
+        if start + self.count * INDEX_ROW.size > len(self._buf):
+            raise ValueError("record table is truncated")
+
+    def __len__(self) -> int:
+        return self.count
+
+    def _row(self, position: int):
+        return INDEX_ROW.unpack_from(self._buf, self._table + position * INDEX_ROW.size)
+
+    def _rows(self):
+        return INDEX_ROW.iter_unpack(self._buf[self._table:self._table + self.count * INDEX_ROW.size])
+
+    def ids(self) -> list:
+        return [row[0] for row in self._rows()]
+
+    def find(self, entry_id: int):
+        """Position of entry_id in the record table, or None"""
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            row_id = self._row(mid)[0]
+            if row_id < entry_id:
+                lo = mid + 1
+            elif row_id > entry_id:
+                hi = mid
+            else:
+                return mid
+        return None
+
+    def entry(self, position: int) -> Entry:
+        return _decode(self._map, *self._row(position))
+
+    def get(self, entry_id: int):
+        """One Entry, decoded on its own, or None"""
+        position = self.find(entry_id)
+        return None if position is None else self.entry(position)
+
+    def token(self, position: int) -> memoryview:
+        """Zero-copy slice holding the entry's raw Fernet token (release it before close())"""
+        entry_id, offset, length = self._row(position)
+        _, _, token_at, token, _ = _layout(self._map, entry_id, offset, length)
+        return self._buf[token_at:token_at + token]
+
+    def metadata(self) -> list:
+        """id, service, username, created and strength of every record, tokens left undecoded"""
+        data = self._map
+        return [dict(zip(METADATA_FIELDS, (row[0],) + _text_fields(data, *row))) for row in self._rows()]
+
+    def __iter__(self):
+        data = self._map
+        for row in self._rows():
+            yield _decode(data, *row)
+
+    def close(self):
+        self._buf.release()
+        if isinstance(self._map, mmap.mmap):
+            self._map.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def _layout(data, entry_id: int, offset: int, length: int):
+    """(field lengths, where the text starts, where the token starts, token length, token kind) of a record"""
+    try:
+        service, username, created, strength, kind, token, extra = LENGTHS.unpack_from(data, offset)
+    except struct.error:
+        raise ValueError(f"record {entry_id} runs past the end of the file") from None
+    pos = offset + LENGTHS.size
+    text_lengths = (service, username, created, strength)
+    token_at = pos + sum(text_lengths)
+    if token_at + token + extra != offset + length or offset + length > len(data):
+        raise ValueError(f"record {entry_id} is corrupt")
+    return text_lengths, pos, token_at, token, kind
+
+def _text_fields(data, entry_id: int, offset: int, length: int) -> tuple:
+    """service, username, created, strength of the record at data[offset:offset + length]"""
+    (service, username, created, strength), pos, token_at, _, _ = _layout(data, entry_id, offset, length)
+    text_length = token_at - pos
+    a = service + username
+    b = a + created
+    # one decode for all four text fields; slicing the str is only safe when it's all ascii
+    text = data[pos:token_at].decode('utf-8')
+    if len(text) == text_length:
+        return text[:service], text[service:a], text[a:b], text[b:]
+    raw = data[pos:token_at]
+    return tuple(raw[i:j].decode('utf-8') for i, j in ((0, service), (service, a), (a, b), (b, text_length)))
+
+def _decode(data, entry_id: int, offset: int, length: int) -> Entry:
+    """Build an Entry from the record at data[offset:offset + length]"""
+    fields = _text_fields(data, entry_id, offset, length)
+    _, _, pos, token, kind = _layout(data, entry_id, offset, length)
+    token_bytes = data[pos:pos + token]
+    pos += token
+    extra = offset + length - pos
+    extra_fields = json.loads(data[pos:pos + extra]) if extra else None
+    return Entry.from_record(entry_id, *fields, token_bytes if kind == TOKEN_RAW else token_bytes.decode('utf-8'),
+                             extra_fields)
+
+
+def _fields(entry: Entry):
+    """(token kind, service, username, created, strength, token, extra) as bytes, lengths checked"""
+    service = entry.service.encode('utf-8')
+    username = entry.username.encode('utf-8')
+    created = (entry.created or '').encode('utf-8')
+    strength = (entry.strength or '').encode('utf-8')
+    token = entry.token
+    if isinstance(token, bytes):
+        kind = TOKEN_RAW
+    else:
+        kind, token = TOKEN_TEXT, (token or '').encode('utf-8')
+    extra = json.dumps(entry.extra).encode('utf-8') if entry.extra else b''
+    if max(len(service), len(username), len(token)) > 0xFFFF or max(len(created), len(strength)) > 0xFF:
+        raise ValueError(f"Entry {entry.id} has a field too long for the binary format")
+    return kind, service, username, created, strength, token, extra
+
+def check_entry(entry):
+    """Raise ValueError if entry (an Entry or dict) can't be stored in the binary format"""
+    _fields(Entry.from_dict(entry))
+
+def _encode(entry: Entry) -> bytes:
+    kind, service, username, created, strength, token, extra = _fields(entry)
+    return b''.join((
+        LENGTHS.pack(len(service), len(username), len(created), len(strength), kind, len(token), len(extra)),
+        service, username, created, strength, token, extra,
+    ))
+
+
+def write_vault(f, entries, header: dict):
+    """Write entries (Entry objects or dicts) to binary file object f, which must be seekable"""
+    entries = sorted((Entry.from_dict(entry) for entry in entries), key=lambda entry: entry.id)
+    header = dict(header, count=len(entries))
+    header_bytes = json.dumps(header).encode()
+    f.write(PREAMBLE.pack(MAGIC, FORMAT_VERSION, len(header_bytes)))
+    f.write(header_bytes)
+
+    table_at = f.tell()
+    offset = table_at + len(entries) * INDEX_ROW.size
+    f.seek(offset)
+    table = bytearray()
+    for entry in entries:
+        body = _encode(entry)
+        table += INDEX_ROW.pack(entry.id, offset, len(body))
+        f.write(body)
+        offset += len(body)
+    f.seek(table_at)
+    f.write(table)
+    f.seek(offset)